@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 
+import os
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +48,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -85,6 +88,40 @@ DATABASES = {
     }
 }
 
+# User sharding (core.sharding). Rows of SHARDED_MODELS live on the shard
+# their user is pinned to, users, tokens and jobs stay in 'default'.
+# SHARD_COUNT adds local SQLite shards next to 'default'.
+SHARD_COUNT = int(os.environ.get('SHARD_COUNT', 1))
+for index in range(1, SHARD_COUNT):
+    DATABASES[f'shard_{index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db_shard_{index}.sqlite3',
+    }
+
+# shard alias -> weight on the consistent hash ring, new users are pinned
+# to the shard the ring picks, a weight of 0 drains a shard. Run
+# `manage.py rebalance_shards` after changing it.
+SHARD_MAP = {alias: 1 for alias in DATABASES}
+SHARD_VIRTUAL_NODES = 64
+# parents first, rows are copied in this order when moving a user
+SHARDED_MODELS = [
+    'core.Tag',
+    'core.Ingredient',
+    'core.Recipe',
+    'core.Recipe_tags',
+    'core.Recipe_ingredients',
+    'core.RecipeDocument',
+    'core.RecipeSignature',
+    'core.IdempotencyKey',
+]
+# ids reserved from the global sequence at a time per process
+SHARD_ID_BLOCK_SIZE = 1000
+# seconds a user's writes already in flight get to finish after their
+# writes are blocked and before their rows are copied to another shard
+SHARD_MOVE_GRACE = 5
+
+DATABASE_ROUTERS = ['core.sharding.ShardRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -125,6 +162,18 @@ MEDIA_URL = 'media/'
 
 STATIC_ROOT = 'files/static/'
 MEDIA_ROOT = 'files/media/'
+# uploads waiting on a background job (core.storage.upload_storage),
+# outside MEDIA_ROOT so they are never served
+UPLOAD_ROOT = 'files/uploads/'
+
+# Media serving (core.views.serve_media)
+# Set to 'X-Sendfile' (Apache, lighttpd) or 'X-Accel-Redirect' (nginx) to let
+# the front proxy send the files, the X-Accel-Redirect value is
+# MEDIA_ACCEL_REDIRECT_PREFIX + path and must map to an internal location.
+MEDIA_SENDFILE_HEADER = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+# max-age for media files not named after their content hash
+MEDIA_CACHE_MAX_AGE = 3600
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
@@ -132,3 +181,140 @@ MEDIA_ROOT = 'files/media/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User' # <app>.<User_model_name>
+
+
+# Django REST Framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.CompactJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.UserBucketThrottle',
+        'core.throttling.AuthTokenBucketThrottle',
+    ],
+    # token bucket capacity / refill period per endpoint class,
+    # views pick a class with throttle_scope, default is read or write
+    'DEFAULT_THROTTLE_RATES': {
+        'read': '600/min',
+        'write': '120/min',
+        'upload': '30/min',
+        'token': '10/min',
+    },
+}
+
+# binary formats for service to service calls, negotiated with
+# Accept / Content-Type: application/msgpack or application/cbor
+BINARY_FORMATS = [
+    ('msgpack', 'MessagePackRenderer', 'MessagePackParser'),
+    ('cbor2', 'CBORRenderer', 'CBORParser'),
+]
+for module, renderer, parser in BINARY_FORMATS:
+    if find_spec(module) is not None:
+        REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append(
+            f'core.renderers.{renderer}'
+        )
+        REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append(
+            f'core.parsers.{parser}'
+        )
+
+# Where token buckets live, MemoryBucketStore is per process, use
+# core.throttling.SQLiteBucketStore with OPTIONS {'path': ...} to share
+# the buckets between the worker processes of a host
+THROTTLE_BUCKET_STORE = {
+    'BACKEND': 'core.throttling.MemoryBucketStore',
+}
+
+# runs the tests without throttling
+TEST_RUNNER = 'core.testing.TestRunner'
+
+
+# Response compression (core.middleware.CompressionMiddleware)
+# br and zstd are used when the brotli / zstandard packages are installed
+
+COMPRESSION_ENCODINGS = ['zstd', 'br', 'gzip']
+COMPRESSION_LEVELS = {'zstd': 3, 'br': 4, 'gzip': 6}
+COMPRESSION_MIN_SIZE = 512
+# streamed bytes buffered by the compressor before a flush
+COMPRESSION_STREAM_FLUSH_SIZE = 16384
+COMPRESSION_CONTENT_TYPES = [
+    'application/json',
+    'application/x-ndjson',
+    'text/csv',
+    'text/html',
+    'text/plain',
+]
+
+
+# Background jobs (core.jobs), run with `manage.py run_jobs`
+
+JOB_WORKER_PROCESSES = 1
+JOB_MAX_ATTEMPTS = 3
+# retries wait JOB_RETRY_BACKOFF * 2 ** (attempt - 1) seconds, capped
+JOB_RETRY_BACKOFF = 10
+JOB_RETRY_BACKOFF_MAX = 3600
+# workers touch the updated_at of the job they run every
+# JOB_HEARTBEAT_INTERVAL seconds, running jobs without a heartbeat for
+# JOB_TIMEOUT seconds lost their worker and are requeued
+JOB_HEARTBEAT_INTERVAL = 30
+JOB_TIMEOUT = 300
+
+
+# Seconds a stored Idempotency-Key response is replayed for (core.idempotency)
+# expired keys are removed with `manage.py evict_idempotency_keys`
+IDEMPOTENCY_KEY_TTL = 86400
+
+# Seconds a pending Idempotency-Key holds off retries, a request that
+# crashed before filling its key in releases it after this deadline
+IDEMPOTENCY_LOCK_TIMEOUT = 300
+
+
+# Prepare URL resolvers, serializers and renderers when the WSGI
+# application is loaded (core.warmup) so the first request isn't slow
+WARM_UP_ON_BOOT = True
+
+
+# Recipe detail cache (recipe.cache), use a shared backend (memcached,
+# redis) in production so invalidation and single flight span processes
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+# number of processes serving the site, the recipe.E001 check requires a
+# shared cache backend above 1
+WORKER_PROCESSES = int(os.environ.get('WEB_CONCURRENCY', 1))
+RECIPE_CACHE_TIMEOUT = 300
+# cap of cache timeouts and index generations with a process local
+# backend, other processes never see its invalidations
+RECIPE_LOCAL_CACHE_TIMEOUT = 5
+# seconds a worker may hold the recompute lock of an entry
+RECIPE_CACHE_LOCK_TIMEOUT = 5
+# XFetch beta, > 1 refreshes earlier, 0 disables early refresh
+RECIPE_CACHE_EARLY_REFRESH_BETA = 1.0
+
+# Per-user in-memory recipe indexes (recipe.indexes), least recently used
+# users beyond this many are dropped from each process
+RECIPE_INDEX_MAX_USERS = 128
+# MinHash signature length and LSH bands of the similar recipes index
+# (recipe.similarity), changing them needs `manage.py
+# rebuild_recipe_signatures`. 16 bands of 4 rows find pairs with a
+# Jaccard similarity above ~0.5 with high probability.
+RECIPE_MINHASH_PERMUTATIONS = 64
+RECIPE_LSH_BANDS = 16
+
+# Recipe statistics (recipe.stats), histogram bins and number of tags and
+# ingredients listed in the breakdowns
+RECIPE_STATS_BINS = 10
+RECIPE_STATS_TOP = 100
+
+# Tag and ingredient name autocomplete (recipe.indexes.NameIndex), the
+# most names a completion returns
+RECIPE_AUTOCOMPLETE_SIZE = 20
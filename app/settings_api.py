@@ -0,0 +1,50 @@
+"""
+API only settings for app project, used by the API worker processes.
+
+Everything not needed to serve token authenticated API requests is left
+out (admin, sessions, messages, staticfiles, the browsable API and the
+matching middleware) which keeps worker boot time and per request
+middleware cost down. Select it with
+
+    DJANGO_SETTINGS_MODULE=app.settings_api
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK, TEMPLATES
+
+
+API_UNUSED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+]
+API_UNUSED_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    # token authentication is not vulnerable to CSRF
+    'django.middleware.csrf.CsrfViewMiddleware',
+    # needs sessions, DRF authenticates requests itself
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in API_UNUSED_APPS]
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if middleware not in API_UNUSED_MIDDLEWARE
+]
+
+TEMPLATES = [dict(TEMPLATES[0], OPTIONS={'context_processors': [
+    'django.template.context_processors.request',
+]})]
+
+REST_FRAMEWORK = dict(
+    REST_FRAMEWORK,
+    DEFAULT_AUTHENTICATION_CLASSES=[
+        'core.authentication.ShardTokenAuthentication',
+    ],
+    DEFAULT_RENDERER_CLASSES=[
+        renderer for renderer in REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']
+        if renderer != 'rest_framework.renderers.BrowsableAPIRenderer'
+    ],
+)
@@ -0,0 +1,75 @@
+'''
+Benchmark assigned_only tag listing for a heavy user.
+
+Seeds one user with 10k tags and 100k recipe/tag links, then compares the
+old JOIN + DISTINCT query with the EXISTS semi-join used by
+RecipeAttributesViewSets.
+
+    python benchmarks/bench_assigned_only.py
+'''
+import random
+
+from utils import setup_django, report
+
+
+TAGS = 10_000
+RECIPES = 20_000
+LINKS = 100_000
+
+
+def seed():
+    from django.contrib.auth import get_user_model
+    from core.models import Recipe, Tag
+
+    user = get_user_model().objects.create_user('bench@test.com', 'bench')
+    Tag.objects.bulk_create(
+        Tag(user=user, name=f'tag {i}') for i in range(TAGS)
+    )
+    Recipe.objects.bulk_create(
+        Recipe(user=user, title=f'recipe {i}') for i in range(RECIPES)
+    )
+
+    tag_ids = list(Tag.objects.values_list('id', flat=True))
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+    # only use half the tags so assigned_only actually filters something
+    used_tags = tag_ids[:TAGS // 2]
+    pairs = set()
+    rnd = random.Random(0)
+    while len(pairs) < LINKS:
+        pairs.add((rnd.choice(recipe_ids), rnd.choice(used_tags)))
+
+    through = Recipe.tags.through
+    through.objects.bulk_create(
+        (through(recipe_id=r, tag_id=t) for r, t in pairs),
+        batch_size=5000,
+    )
+
+    return user
+
+
+def main():
+    setup_django()
+
+    from django.db.models import Exists, OuterRef
+    from core.models import Tag
+
+    user = seed()
+
+    def join_distinct():
+        qs = Tag.objects.filter(recipes__isnull=False)
+        return list(qs.filter(user=user).distinct().values_list('id'))
+
+    def exists_semi_join():
+        assigned = Tag.recipes.through.objects.filter(tag=OuterRef('pk'))
+        qs = Tag.objects.filter(Exists(assigned))
+        return list(qs.filter(user=user).values_list('id'))
+
+    assert sorted(join_distinct()) == sorted(exists_semi_join())
+
+    print(f'{TAGS} tags, {LINKS} recipe links')
+    report('JOIN + DISTINCT', join_distinct)
+    report('EXISTS semi-join', exists_semi_join)
+
+
+if __name__ == '__main__':
+    main()
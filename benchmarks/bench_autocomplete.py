@@ -0,0 +1,67 @@
+'''
+Benchmark tag and ingredient name autocomplete for a heavy user.
+
+Seeds one user with 5000 ingredients used by 20k recipes, then times
+building the in-memory name index and completing short and long prefixes.
+
+    python benchmarks/bench_autocomplete.py
+'''
+import random
+
+from utils import setup_django, report
+
+
+INGREDIENTS = 5000
+RECIPES = 20_000
+PER_RECIPE = 8
+WORDS = ['salt', 'sugar', 'sage', 'saffron', 'flour', 'butter', 'basil',
+         'chili', 'cheese', 'chicken', 'egg', 'garlic', 'ginger', 'milk']
+
+
+def seed():
+    from django.contrib.auth import get_user_model
+    from core.models import Ingredient, Recipe
+
+    user = get_user_model().objects.create_user('bench@test.com', 'bench')
+    random.seed(0)
+    Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=f'{random.choice(WORDS)} {i}')
+        for i in range(INGREDIENTS)
+    )
+    Recipe.objects.bulk_create(
+        Recipe(user=user, title=f'recipe {i}') for i in range(RECIPES)
+    )
+
+    ingredient_ids = list(
+        Ingredient.objects.filter(user=user).values_list('id', flat=True)
+    )
+    through = Recipe.ingredients.through
+    through.objects.bulk_create(
+        through(recipe_id=recipe_id, ingredient_id=ingredient_id)
+        for recipe_id in Recipe.objects.values_list('id', flat=True)
+        for ingredient_id in random.sample(ingredient_ids, PER_RECIPE)
+    )
+
+    return user
+
+
+def main():
+    setup_django()
+
+    from core.models import Ingredient
+    from recipe.indexes import NameIndex
+
+    user = seed()
+    index = NameIndex.build(user.id)
+
+    report('build index', lambda: NameIndex.build(user.id), repeat=5)
+    report('complete "s"', lambda: index.complete(Ingredient, 's', 10))
+    report('complete "chi"', lambda: index.complete(Ingredient, 'chi', 10))
+    report(
+        'complete "chicken 12"',
+        lambda: index.complete(Ingredient, 'chicken 12', 10)
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+'''
+Benchmark the "what can I cook" query for a heavy user.
+
+Seeds one user with 20k recipes using 8 of 2000 ingredients each, then
+times building the in-memory pantry index and answering pantry queries.
+
+    python benchmarks/bench_pantry.py
+'''
+import random
+
+from utils import setup_django, report
+
+
+INGREDIENTS = 2000
+RECIPES = 20_000
+PER_RECIPE = 8
+PANTRY = 300
+
+
+def seed():
+    from django.contrib.auth import get_user_model
+    from core.models import Ingredient, Recipe
+
+    user = get_user_model().objects.create_user('bench@test.com', 'bench')
+    Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=f'ingredient {i}')
+        for i in range(INGREDIENTS)
+    )
+    Recipe.objects.bulk_create(
+        Recipe(user=user, title=f'recipe {i}') for i in range(RECIPES)
+    )
+
+    ingredient_ids = list(
+        Ingredient.objects.filter(user=user).values_list('id', flat=True)
+    )
+    through = Recipe.ingredients.through
+    random.seed(0)
+    through.objects.bulk_create(
+        through(recipe_id=recipe_id, ingredient_id=ingredient_id)
+        for recipe_id in Recipe.objects.values_list('id', flat=True)
+        for ingredient_id in random.sample(ingredient_ids, PER_RECIPE)
+    )
+
+    return user, ingredient_ids
+
+
+def main():
+    setup_django()
+
+    from recipe.indexes import PantryIndex
+
+    user, ingredient_ids = seed()
+    pantry = set(random.sample(ingredient_ids, PANTRY))
+    index = PantryIndex.build(user.id)
+
+    report('build index', lambda: PantryIndex.build(user.id), repeat=5)
+    report('cookable (max_missing=0)', lambda: index.cookable(pantry))
+    report('cookable (max_missing=2)', lambda: index.cookable(pantry, 2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+'''
+Benchmark response size and CPU cost of the JSON renderers and of the
+encodings CompressionMiddleware can negotiate, on a recipe list page.
+
+    python benchmarks/bench_renderers.py
+'''
+from decimal import Decimal
+
+from utils import setup_django, report
+
+
+RECIPES = 1000
+
+
+def payload():
+    return [
+        {
+            'id': i,
+            'title': f'recipe {i}',
+            'time_minutes': i % 90,
+            'price': Decimal(f'{i % 50}.{i % 100:02d}'),
+            'link': f'https://example.com/recipes/{i}',
+            'tags': list(range(i % 7)),
+            'ingredients': list(range(i % 11)),
+        }
+        for i in range(RECIPES)
+    ]
+
+
+def main():
+    setup_django()
+
+    from rest_framework.renderers import JSONRenderer
+    from core import middleware
+    from core.renderers import CompactJSONRenderer
+
+    data = payload()
+    renderers = [
+        ('JSONRenderer', JSONRenderer()),
+        ('CompactJSONRenderer', CompactJSONRenderer()),
+    ]
+
+    print(f'Rendering {RECIPES} recipes:')
+    for name, renderer in renderers:
+        size = len(renderer.render(data))
+        report(f'{name} ({size} bytes)', lambda: renderer.render(data))
+
+    body = CompactJSONRenderer().render(data)
+    levels = {'gzip': 6, 'br': 4, 'zstd': 3}
+
+    print(f'\nCompressing the compact body ({len(body)} bytes):')
+    for name, compressor_class in middleware.available_compressors().items():
+        def compress():
+            compressor = compressor_class(levels[name])
+            return compressor.compress(body) + compressor.finish()
+
+        report(f'{name} ({len(compress())} bytes)', compress)
+
+    missing = {'gzip', 'br', 'zstd'} - set(middleware.available_compressors())
+    if missing:
+        print(f'(not installed: {", ".join(sorted(missing))})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+'''
+Benchmark the similar recipes index for a heavy user.
+
+Seeds one user with 20k recipes of 8 ingredients each, stores their MinHash
+signatures, then times building the LSH index and answering queries.
+
+    python benchmarks/bench_similar.py
+'''
+import random
+
+import numpy as np
+
+from utils import setup_django, report
+
+
+RECIPES = 20_000
+INGREDIENTS = 2000
+PER_RECIPE = 8
+
+
+def seed():
+    from django.contrib.auth import get_user_model
+    from core.models import Recipe, RecipeSignature
+    from recipe.similarity import minhash
+
+    user = get_user_model().objects.create_user('bench@test.com', 'bench')
+    Recipe.objects.bulk_create(
+        Recipe(user=user, title=f'recipe {i}') for i in range(RECIPES)
+    )
+
+    random.seed(0)
+    RecipeSignature.objects.bulk_create(
+        RecipeSignature(
+            recipe_id=recipe_id,
+            user=user,
+            signature=minhash([
+                f'i{i}' for i in random.sample(range(INGREDIENTS), PER_RECIPE)
+            ]).tobytes(),
+        )
+        for recipe_id in Recipe.objects.values_list('id', flat=True)
+    )
+
+    return user
+
+
+def main():
+    setup_django()
+
+    from recipe.indexes import SimilarityIndex
+
+    user = seed()
+    index = SimilarityIndex.build(user.id)
+    recipe_ids = list(index.rows)
+    sample = random.sample(recipe_ids, 100)
+
+    def brute_force():
+        # what scoring every recipe pairwise per query would cost
+        for recipe_id in sample[:10]:
+            row = index.matrix[index.rows[recipe_id]]
+            np.argsort(-(index.matrix[:len(recipe_ids)] == row).mean(axis=1))
+
+    report('build index', lambda: SimilarityIndex.build(user.id), repeat=5)
+    report('similar x100 (LSH)',
+           lambda: [index.similar(recipe_id) for recipe_id in sample])
+    report('full scan x10', brute_force, repeat=5)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+'''
+Benchmark worker boot: loading the WSGI application (django.setup, the
+URLconf and the warm-up) with the full and the API only settings.
+
+Every boot runs in a fresh interpreter with -X importtime, the report lists
+the boot time and the modules with the highest cumulative import time.
+
+    python benchmarks/bench_startup.py [--top 15]
+'''
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from utils import BASE_DIR
+
+
+SETTINGS = ['app.settings', 'app.settings_api']
+BOOT = 'import app.wsgi'
+BOOTS = 5
+
+
+def boot(settings_module):
+    '''
+    Load the WSGI application in a new interpreter,
+    returns (wall time in ms, -X importtime report)
+    '''
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return (time.perf_counter() - start) * 1000, result.stderr
+
+
+def parse_importtime(report):
+    '''
+    Return [(cumulative us, self us, module)] from an -X importtime report
+    '''
+    rows = []
+    for line in report.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, module = line[12:].split('|')
+        rows.append((int(cumulative_us), int(self_us), module.strip()))
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    for settings_module in SETTINGS:
+        timings, report = [], ''
+        for _ in range(BOOTS):
+            elapsed, report = boot(settings_module)
+            timings.append(elapsed)
+
+        rows = parse_importtime(report)
+        print(f'{settings_module}: boot median '
+              f'{statistics.median(timings):.1f} ms, best '
+              f'{min(timings):.1f} ms, {len(rows)} modules, '
+              f'{sum(row[1] for row in rows) / 1000:.1f} ms importing')
+
+        for cumulative, self_time, module in sorted(rows, reverse=True)[
+            :args.top
+        ]:
+            print(f'  {cumulative / 1000:8.1f} ms {self_time / 1000:8.1f} ms'
+                  f'  {module}')
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+'''
+Benchmark the per request cost of the token bucket stores.
+
+    python benchmarks/bench_throttle.py
+'''
+import os
+import tempfile
+import time
+
+from utils import setup_django, report
+
+
+REQUESTS = 1000
+
+
+def main():
+    setup_django()
+
+    from core.throttling import MemoryBucketStore, SQLiteBucketStore
+
+    path = os.path.join(tempfile.mkdtemp(), 'throttle.sqlite3')
+    stores = [
+        ('MemoryBucketStore', MemoryBucketStore()),
+        ('SQLiteBucketStore', SQLiteBucketStore(path)),
+    ]
+
+    print(f'{REQUESTS} consume() calls over 100 keys '
+          f'(total ms for {REQUESTS} calls = microseconds per call):')
+    for name, store in stores:
+        def consume():
+            for i in range(REQUESTS):
+                store.consume(f'user:read:{i % 100}', 600, 10, time.time())
+
+        # report the whole batch and divide, so timer overhead is amortized
+        report(f'{name} (x{REQUESTS})', consume, repeat=5)
+
+
+if __name__ == '__main__':
+    main()
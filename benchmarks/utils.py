@@ -0,0 +1,40 @@
+import os
+import sys
+import time
+import statistics
+from pathlib import Path
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    '''
+    Configure django and create a throwaway test database
+    '''
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+    import django
+    django.setup()
+
+    from django.db import connection
+    connection.creation.create_test_db(verbosity=0)
+
+
+def measure(func, repeat=20):
+    '''
+    Run func repeatedly and return (median, best) in milliseconds
+    '''
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return statistics.median(timings), min(timings)
+
+
+def report(name, func, repeat=20):
+    median, best = measure(func, repeat)
+    print(f'{name:<40} median {median:9.3f} ms   best {best:9.3f} ms')
@@ -1,13 +1,247 @@
+from django.conf import settings
 from django.contrib import admin
 from . import models
+from django.contrib.admin.widgets import AutocompleteMixin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import (DEFAULT_DB_ALIAS, DatabaseError, connections,
+                       transaction)
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils.http import urlencode
 from django.utils.translation import gettext as _
+from core.sharding import current_shard, is_sharded, shard_aliases, use_shard
 
 
-class UserAdmin(BaseUserAdmin):
+class EstimatedCountPaginator(Paginator):
+    '''
+    Paginator that uses the database's table statistics instead of
+    COUNT(*) for unfiltered querysets of large tables
+    '''
+    # below this many estimated rows an exact count is cheap enough
+    estimate_threshold = 10000
+
+    def estimate(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        table = queryset.model._meta.db_table
+        queries = {
+            'postgresql': 'SELECT reltuples FROM pg_class WHERE relname = %s',
+            'sqlite': 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+            'mysql': 'SELECT table_rows FROM information_schema.tables '
+                     'WHERE table_schema = DATABASE() AND table_name = %s',
+        }
+
+        if connection.vendor not in queries:
+            return None
+
+        try:
+            # statistics tables may not exist yet (sqlite before ANALYZE)
+            with transaction.atomic(using=queryset.db), \
+                    connection.cursor() as cursor:
+                cursor.execute(queries[connection.vendor], [table])
+                row = cursor.fetchone()
+        except DatabaseError:
+            return None
+
+        if row is None or row[0] is None:
+            return None
+
+        # sqlite_stat1.stat starts with the number of rows
+        return int(float(str(row[0]).split()[0]))
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = self.estimate()
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+
+        return super().count
+
+
+class LowerPrefixSearchMixin:
+    '''
+    Case insensitive prefix search for search_fields of the form
+    field__lower__prefix, the term is lowercased so a Lower(field) index
+    answers the search as a range (see core.models.Prefix)
+    '''
+
+    def get_search_results(self, request, queryset, search_term):
+        return super().get_search_results(
+            request, queryset, search_term.lower()
+        )
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    '''
+    Changelist filter picking the shard whose rows are listed,
+    a changelist can't span databases
+    '''
+    title = _('shard')
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in shard_aliases()]
+
+    def queryset(self, request, queryset):
+        # ShardedAdminMixin runs the whole view on the shard
+        return queryset
+
+    def choices(self, changelist):
+        selected = self.value() or DEFAULT_DB_ALIAS
+
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': alias == selected,
+                'query_string': changelist.get_query_string(
+                    {self.parameter_name: alias}
+                ),
+                'display': title,
+            }
+
+
+class ShardedAdminMixin:
+    '''
+    Admin for sharded models (core.sharding), every view runs on one
+    shard: the changelist on the one picked with ShardListFilter, the
+    change and delete views on the one holding the object. With several
+    shards rows are only added through the API, which knows the shard of
+    their user.
+    '''
+
+    def view_shard(self, request, object_id=None):
+        if object_id is not None:
+            for alias in shard_aliases():
+                rows = self.model._base_manager.using(alias)
+                try:
+                    if rows.filter(pk=object_id).exists():
+                        return alias
+                except (ValidationError, ValueError):
+                    break
+
+        alias = request.GET.get(ShardListFilter.parameter_name)
+        return alias if alias in settings.SHARD_MAP else DEFAULT_DB_ALIAS
+
+    def run_on_shard(self, alias, view, *args, **kwargs):
+        with use_shard(alias):
+            response = view(*args, **kwargs)
+            # template responses query lazily, render them on the shard
+            if hasattr(response, 'render'):
+                response.render()
+
+        return response
+
+    def changelist_view(self, request, extra_context=None):
+        return self.run_on_shard(
+            self.view_shard(request), super().changelist_view,
+            request, extra_context
+        )
+
+    def changeform_view(self, request, object_id=None, form_url='',
+                        extra_context=None):
+        return self.run_on_shard(
+            self.view_shard(request, object_id), super().changeform_view,
+            request, object_id, form_url, extra_context
+        )
+
+    def delete_view(self, request, object_id, extra_context=None):
+        return self.run_on_shard(
+            self.view_shard(request, object_id), super().delete_view,
+            request, object_id, extra_context
+        )
+
+    def history_view(self, request, object_id, extra_context=None):
+        return self.run_on_shard(
+            self.view_shard(request, object_id), super().history_view,
+            request, object_id, extra_context
+        )
+
+    def has_add_permission(self, request):
+        if len(settings.SHARD_MAP) > 1:
+            return False
+
+        return super().has_add_permission(request)
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        if len(settings.SHARD_MAP) < 2:
+            return list_filter
+
+        return [ShardListFilter, *list_filter]
+
+    def get_list_select_related(self, request):
+        # users live in the default database only, shards can't join them
+        if current_shard() != DEFAULT_DB_ALIAS:
+            return []
+
+        return super().get_list_select_related(request)
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+
+        # autocomplete requests name the shard of the edited object
+        alias = request.GET.get(ShardListFilter.parameter_name)
+        if alias in settings.SHARD_MAP:
+            queryset = queryset.using(alias)
+
+        if queryset.db != DEFAULT_DB_ALIAS:
+            queryset = queryset.prefetch_related('user')
+
+        return queryset
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        return self.shard_formfield(
+            db_field, super().formfield_for_foreignkey,
+            request, **kwargs
+        )
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        return self.shard_formfield(
+            db_field, super().formfield_for_manytomany,
+            request, **kwargs
+        )
+
+    def shard_formfield(self, db_field, formfield_for, request, **kwargs):
+        # choices of sharded relations come from the shard of the object,
+        # users from the default database
+        if not is_sharded(db_field.related_model):
+            return formfield_for(db_field, request, **kwargs)
+
+        kwargs.setdefault('using', current_shard())
+        formfield = formfield_for(db_field, request, **kwargs)
+
+        # the autocomplete view has to search the same shard
+        if formfield is not None and \
+                isinstance(formfield.widget, AutocompleteMixin):
+            formfield.widget.attrs['data-ajax--url'] = '{}?{}'.format(
+                reverse(f'{self.admin_site.name}:autocomplete'),
+                urlencode({ShardListFilter.parameter_name: current_shard()}),
+            )
+
+        return formfield
+
+
+class LargeTableAdmin(ShardedAdminMixin, LowerPrefixSearchMixin,
+                      admin.ModelAdmin):
+    '''
+    Admin for tables with millions of rows, skips the full result count,
+    estimates unfiltered counts and joins the owning user in the same query
+    '''
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_select_related = ['user']
+    raw_id_fields = ['user']
+
+
+class UserAdmin(LowerPrefixSearchMixin, BaseUserAdmin):
 
     ordering = ['id']
     list_display = ['email', 'name']
+    search_fields = ['email__lower__prefix']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     # this is for user change view
     # I should see the effect 
@@ -29,7 +263,43 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class TagAdmin(LargeTableAdmin):
+
+    list_display = ['name', 'user']
+    search_fields = ['name__lower__prefix']
+
+
+class IngredientAdmin(LargeTableAdmin):
+
+    list_display = ['name', 'user']
+    search_fields = ['name__lower__prefix']
+    autocomplete_fields = ['canonical']
+
+
+class CanonicalIngredientAdmin(admin.ModelAdmin):
+
+    list_display = ['name', 'key']
+    search_fields = ['key__prefix']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # keys are lowercase, so the search is case insensitive
+        return super().get_search_results(
+            request, queryset, models.name_key(search_term)
+        )
+
+
+class RecipeAdmin(LargeTableAdmin):
+
+    list_display = ['title', 'user', 'time_minutes', 'price']
+    search_fields = ['title__lower__prefix']
+    # the default select widgets would load every tag and ingredient
+    autocomplete_fields = ['tags', 'ingredients']
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
-admin.site.register(models.Recipe)
\ No newline at end of file
+admin.site.register(models.Tag, TagAdmin)
+admin.site.register(models.Ingredient, IngredientAdmin)
+admin.site.register(models.CanonicalIngredient, CanonicalIngredientAdmin)
+admin.site.register(models.Recipe, RecipeAdmin)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.core.signals import request_finished, request_started
+
+        from core import jobs, sharding
+        jobs.autodiscover()
+        request_started.connect(sharding.clear_shard)
+        request_finished.connect(sharding.clear_shard)
@@ -0,0 +1,48 @@
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+
+from core.sharding import select_shard, user_shard
+
+
+class ShardTokenAuthentication(TokenAuthentication):
+    '''
+    Token authentication that routes the rest of the request to the
+    authenticated user's shard, see core.sharding
+    '''
+
+    def authenticate_credentials(self, key):
+        user, token = super().authenticate_credentials(key)
+        select_shard(user_shard(user))
+
+        return user, token
+
+
+class UserMigrating(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Your data is being moved, try again shortly.'
+    default_code = 'user_migrating'
+    # seconds sent as Retry-After
+    wait = 30
+
+
+class UserShardMixin:
+    '''
+    View mixin that routes the request to the shard of its user whichever
+    authentication class authenticated them (sessions, force_authenticate
+    in tests), ShardTokenAuthentication only covers token requests.
+    Writes of a user whose rows are being moved to another shard are
+    refused, they would be lost with the source rows.
+    '''
+
+    def perform_authentication(self, request):
+        super().perform_authentication(request)
+
+        if not request.user.is_authenticated:
+            return
+
+        if request.user.migrating and request.method not in SAFE_METHODS:
+            raise UserMigrating()
+
+        select_shard(user_shard(request.user))
@@ -0,0 +1,131 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from core import sharding
+from core.models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+def expiry_cutoff():
+    return timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+
+def request_fingerprint(request):
+    '''
+    Hash of what identifies a request besides its key,
+    a key reused for a different request is rejected
+    '''
+    body = json.dumps(
+        request.data, sort_keys=True, cls=DjangoJSONEncoder, default=str
+    )
+    content = f'{request.method} {request.path}\n{body}'
+
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def reserve_key(user, key, fingerprint):
+    '''
+    Insert a pending row for key, None when a live row already holds it
+    '''
+    now = timezone.now()
+    try:
+        with sharding.atomic():
+            # an expired row, or a pending one whose request crashed,
+            # may still hold the key
+            expired = Q(created_at__lt=expiry_cutoff())
+            crashed = Q(status_code__isnull=True, locked_until__lt=now)
+            IdempotencyKey.objects.filter(
+                expired | crashed, user=user, key=key
+            ).delete()
+            return IdempotencyKey.objects.create(
+                user=user, key=key, fingerprint=fingerprint,
+                locked_until=now + timedelta(
+                    seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT
+                ),
+            )
+    except IntegrityError:
+        return None
+
+
+class IdempotentCreateMixin:
+    '''
+    Honor the Idempotency-Key header on create, the key is reserved
+    under its unique constraint before the create runs and filled in
+    with the response, retries with the same key are answered from it
+    with one indexed lookup instead of running the create again
+    '''
+
+    def create(self, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return super().create(request, *args, **kwargs)
+
+        if len(key) > 255:
+            return Response(
+                {'detail': 'Idempotency-Key must be at most 255 characters.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fingerprint = request_fingerprint(request)
+        reserved = reserve_key(request.user, key, fingerprint)
+
+        if reserved is None:
+            return self.replay(request, key, fingerprint)
+
+        try:
+            response = super().create(request, *args, **kwargs)
+        except Exception:
+            reserved.delete()
+            raise
+
+        if response.status_code >= 500:
+            # let the client retry the create with the same key
+            reserved.delete()
+        else:
+            # by pk, a retry that took over the key after the deadline
+            # holds a row of its own
+            IdempotencyKey.objects.filter(pk=reserved.pk).update(
+                status_code=response.status_code,
+                response=response.data,
+            )
+
+        return response
+
+    def replay(self, request, key, fingerprint):
+        stored = IdempotencyKey.objects.filter(
+            user=request.user, key=key
+        ).first()
+
+        if stored is not None and stored.fingerprint != fingerprint:
+            return Response(
+                {'detail': 'Idempotency-Key was already used '
+                           'for a different request.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+
+        # the first request is still running, or failed and released
+        # the key since the reservation, either way the client retries
+        if stored is None or stored.status_code is None:
+            return Response(
+                {'detail': 'A request with this Idempotency-Key '
+                           'is still in progress.'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        return Response(
+            stored.response,
+            status=stored.status_code,
+            headers={REPLAYED_HEADER: 'true'}
+        )
@@ -0,0 +1,250 @@
+import logging
+import signal
+import threading
+import time
+import traceback
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from core.models import Job
+from core.sharding import use_shard, user_shard
+
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+_failure_hooks = {}
+
+
+def job(name, on_failure=None):
+    '''
+    Register the decorated function as the job called name,
+    it is called with the job payload as keyword arguments and
+    its return value is stored as the job result. on_failure is called
+    with the payload once the job failed its last attempt.
+    '''
+    def decorator(func):
+        _registry[name] = func
+        if on_failure is not None:
+            _failure_hooks[name] = on_failure
+        return func
+
+    return decorator
+
+
+def autodiscover():
+    '''
+    Import the tasks module of every installed app, called by
+    CoreConfig.ready so every process knows all jobs
+    '''
+    autodiscover_modules('tasks')
+
+
+def enqueue(name, user=None, max_attempts=None, run_at=None, **payload):
+    '''
+    Queue the job called name with payload, returns the Job
+    '''
+    return Job.objects.create(
+        name=name,
+        user=user,
+        payload=payload,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_at=run_at or timezone.now(),
+    )
+
+
+def retry_delay(attempts):
+    '''
+    Exponential backoff before the next attempt, in seconds
+    '''
+    return min(
+        settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1),
+        settings.JOB_RETRY_BACKOFF_MAX
+    )
+
+
+def claim():
+    '''
+    Atomically take the next due job off the queue, returns None when
+    there is nothing to run. Workers race on a conditional UPDATE, so no
+    row locks (which SQLite doesn't have) are needed.
+    '''
+    while True:
+        now = timezone.now()
+        job_id = Job.objects.filter(
+            status=Job.QUEUED, run_at__lte=now
+        ).order_by('run_at', 'id').values_list('id', flat=True).first()
+
+        if job_id is None:
+            return None
+
+        claimed = Job.objects.filter(id=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+
+
+def job_shard(job):
+    '''
+    Jobs of a user run against the user's shard
+    '''
+    return use_shard(user_shard(job.user)) if job.user else nullcontext()
+
+
+def run_job(job):
+    '''
+    Run a claimed job and record its outcome
+    '''
+    func = _registry.get(job.name)
+
+    try:
+        if func is None:
+            raise LookupError(f'No job registered as "{job.name}".')
+        with job_shard(job):
+            result = func(**job.payload)
+    except Exception:
+        logger.exception('Job %s (%s) failed', job.id, job.name)
+        job.error = traceback.format_exc()
+
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(
+                seconds=retry_delay(job.attempts)
+            )
+        else:
+            job.status = Job.FAILED
+            run_failure_hook(job)
+
+        job.save(update_fields=['status', 'error', 'run_at', 'updated_at'])
+        return job
+
+    job.status = Job.SUCCEEDED
+    job.result = result
+    job.error = ''
+    job.save(update_fields=['status', 'result', 'error', 'updated_at'])
+
+    return job
+
+
+def run_failure_hook(job):
+    '''
+    Let the job clean up after its last failed attempt
+    '''
+    hook = _failure_hooks.get(job.name)
+    if hook is None:
+        return
+
+    try:
+        with job_shard(job):
+            hook(**job.payload)
+    except Exception:
+        logger.exception('Failure hook of job %s (%s) failed',
+                         job.id, job.name)
+
+
+def requeue_stale():
+    '''
+    Put back jobs whose worker died while running them, the worker
+    running a job touches it every JOB_HEARTBEAT_INTERVAL seconds
+    '''
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_TIMEOUT)
+
+    return Job.objects.filter(
+        status=Job.RUNNING, updated_at__lt=cutoff
+    ).update(status=Job.QUEUED, run_at=timezone.now())
+
+
+def run_pending(limit=None):
+    '''
+    Run due jobs in this process until the queue is empty,
+    returns the number of jobs run
+    '''
+    count = 0
+
+    while limit is None or count < limit:
+        job = claim()
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+
+    return count
+
+
+class Heartbeat:
+    '''
+    Touch the updated_at of a running job from a thread while the job
+    runs, so long jobs aren't mistaken for jobs of a dead worker
+    '''
+
+    def __init__(self, job, interval=None):
+        self.job = job
+        self.interval = interval or settings.JOB_HEARTBEAT_INTERVAL
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.beat, daemon=True)
+
+    def beat(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    Job.objects.filter(
+                        id=self.job.id, status=Job.RUNNING
+                    ).update(updated_at=timezone.now())
+                except Exception:
+                    logger.exception('Heartbeat of job %s failed',
+                                     self.job.id)
+        finally:
+            # the thread's own connections
+            connections.close_all()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+class Worker:
+    '''
+    Poll the queue and run jobs until stopped by SIGTERM/SIGINT
+    '''
+
+    def __init__(self, poll_interval=1.0, burst=False):
+        self.poll_interval = poll_interval
+        self.burst = burst
+        self.stopped = False
+
+    def stop(self, *args):
+        self.stopped = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        last_requeue = 0
+
+        while not self.stopped:
+            close_old_connections()
+
+            if time.monotonic() - last_requeue > settings.JOB_TIMEOUT / 10:
+                requeue_stale()
+                last_requeue = time.monotonic()
+
+            job = claim()
+            if job is not None:
+                with Heartbeat(job):
+                    run_job(job)
+            elif self.burst:
+                break
+            else:
+                time.sleep(self.poll_interval)
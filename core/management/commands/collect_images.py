@@ -0,0 +1,83 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models import RECIPE_IMAGE_DIR, Recipe
+from core.sharding import shard_aliases
+from core.storage import recipe_image_storage
+
+
+class Command(BaseCommand):
+    help = 'Delete recipe image files that no recipe references anymore, ' \
+           'the only place image files are deleted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=3600,
+            help='Only collect files older than this many seconds, '
+                 'protects uploads that are still being saved'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of files checked against the database per query'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report the orphaned files'
+        )
+
+    def collect(self, names, cutoff, dry_run):
+        referenced = set()
+        for alias in shard_aliases():
+            referenced.update(
+                Recipe.objects.using(alias).filter(image__in=names)
+                .values_list('image', flat=True)
+            )
+        orphans = [name for name in names if name not in referenced]
+        if dry_run:
+            for name in orphans:
+                self.stdout.write(name, self.style.WARNING)
+            return len(orphans)
+
+        collected = 0
+        for name in orphans:
+            # spares files an upload reused since they were listed
+            if recipe_image_storage.collect(name, cutoff):
+                self.stdout.write(name, self.style.WARNING)
+                collected += 1
+
+        return collected
+
+    def handle(self, *args, **options):
+        if not recipe_image_storage.exists(RECIPE_IMAGE_DIR):
+            return
+
+        cutoff = time.time() - options['min_age']
+        _, files = recipe_image_storage.listdir(RECIPE_IMAGE_DIR)
+        collected = 0
+        batch = []
+
+        for filename in files:
+            name = os.path.join(RECIPE_IMAGE_DIR, filename)
+            if os.path.getmtime(recipe_image_storage.path(name)) > cutoff:
+                continue
+
+            batch.append(name)
+            if len(batch) >= options['batch_size']:
+                collected += self.collect(
+                    batch, cutoff, options['dry_run']
+                )
+                batch = []
+
+        if batch:
+            collected += self.collect(batch, cutoff, options['dry_run'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Collected {collected} orphaned images.'
+        ))
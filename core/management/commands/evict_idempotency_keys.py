@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from core.idempotency import expiry_cutoff
+from core.models import IdempotencyKey
+from core.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    help = 'Delete idempotency keys older than IDEMPOTENCY_KEY_TTL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of keys deleted per query'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = expiry_cutoff()
+        evicted = 0
+
+        for alias in shard_aliases():
+            keys = IdempotencyKey.objects.using(alias)
+            expired = keys.filter(created_at__lt=cutoff)
+
+            while True:
+                ids = list(expired.values_list('id', flat=True)[
+                    :options['batch_size']
+                ])
+                if not ids:
+                    break
+                evicted += keys.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Evicted {evicted} idempotency keys.'
+        ))
@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core.sharding import get_ring, locate_user, move_user
+
+
+class Command(BaseCommand):
+    help = 'Move users to the shard SHARD_MAP assigns them, run after ' \
+           'adding, removing or reweighting shards'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows copied per insert'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report the users that would move'
+        )
+
+    def handle(self, *args, **options):
+        ring = get_ring()
+        users = get_user_model().objects.order_by('id').only(
+            'id', 'email', 'shard'
+        )
+        moved = 0
+        rows = 0
+
+        for user in users.iterator():
+            target = ring.get(user.pk)
+            source = user.shard or locate_user(user.pk) or target
+            if source == target:
+                if not user.shard and not options['dry_run']:
+                    user.shard = target
+                    user.save(update_fields=['shard'])
+                continue
+
+            self.stdout.write(f'{user.email}: {source} -> {target}')
+            moved += 1
+            if not options['dry_run']:
+                rows += move_user(user, target, options['batch_size'])
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'{moved} users would move.'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Moved {moved} users ({rows} rows).'
+            ))
@@ -0,0 +1,191 @@
+import re
+import zlib
+
+from django.conf import settings
+from django.http import FileResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+
+ACCEPT_ENCODING = re.compile(
+    r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*'
+)
+
+
+class GzipCompressor:
+
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        # sync flush, so the buffered data reaches the client right away
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+class ZstdCompressor:
+
+    def __init__(self, level):
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+def available_compressors():
+    compressors = {'gzip': GzipCompressor}
+    if brotli is not None:
+        compressors['br'] = BrotliCompressor
+    if zstandard is not None:
+        compressors['zstd'] = ZstdCompressor
+
+    return compressors
+
+
+def negotiate_encoding(header, preference):
+    '''
+    Pick the first encoding of preference the client accepts
+    '''
+    accepted = {}
+    for part in header.lower().split(','):
+        match = ACCEPT_ENCODING.fullmatch(part)
+        if match:
+            try:
+                accepted[match.group(1)] = float(match.group(2) or 1)
+            except ValueError:
+                continue
+
+    for encoding in preference:
+        quality = accepted.get(encoding, accepted.get('*', 0))
+        if quality > 0:
+            return encoding
+
+    return None
+
+
+def compress_stream(compressor, stream):
+    '''
+    Compress a streaming response, flushing once every
+    COMPRESSION_STREAM_FLUSH_SIZE input bytes instead of every chunk,
+    exporters yield one row per chunk and a flush per row would barely
+    compress
+    '''
+    flush_size = settings.COMPRESSION_STREAM_FLUSH_SIZE
+    pending = 0
+
+    for chunk in stream:
+        data = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_size:
+            data += compressor.flush()
+            pending = 0
+        if data:
+            yield data
+
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    '''
+    Compress responses with zstd, brotli or gzip as negotiated through
+    Accept-Encoding, in the order of COMPRESSION_ENCODINGS (encodings
+    whose module is not installed are skipped).
+
+    Responses smaller than COMPRESSION_MIN_SIZE, already encoded, partial
+    or file responses and content types outside COMPRESSION_CONTENT_TYPES
+    are left alone. Streaming responses are compressed as they stream,
+    flushed every COMPRESSION_STREAM_FLUSH_SIZE bytes.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def should_compress(self, response):
+        if response.has_header('Content-Encoding') or \
+                response.status_code != 200 or \
+                isinstance(response, FileResponse):
+            return False
+
+        content_type = response.get('Content-Type', '').split(';')[0]
+        return content_type.strip() in settings.COMPRESSION_CONTENT_TYPES
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if not self.should_compress(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressors = available_compressors()
+        encoding = negotiate_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''),
+            [name for name in settings.COMPRESSION_ENCODINGS
+             if name in compressors]
+        )
+        if encoding is None:
+            return response
+
+        compressor = compressors[encoding](
+            settings.COMPRESSION_LEVELS[encoding]
+        )
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                compressor, response.streaming_content
+            )
+            del response['Content-Length']
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+                return response
+
+            content = compressor.compress(response.content) + \
+                compressor.finish()
+            if len(content) >= len(response.content):
+                return response
+
+            response.content = content
+            response['Content-Length'] = str(len(content))
+
+        # the compressed body is not byte-identical anymore
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+
+        response['Content-Encoding'] = encoding
+
+        return response
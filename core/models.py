@@ -2,18 +2,99 @@ from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
 from django.conf import settings
-import uuid
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.functions import Lower
+from django.utils import timezone
+from core.sharding import get_ring, next_id
+from core.storage import recipe_image_storage
+import hashlib
 import os
+import sys
+
+
+RECIPE_IMAGE_DIR = 'uploads/recipe/'
+
+# field__lower=Lower(Value(value)) compares case insensitively as
+# LOWER(field) = LOWER(value), which the Lower() unique indexes below serve
+# (unlike __iexact, a LIKE on SQLite)
+models.CharField.register_lookup(Lower)
+
+
+def prefix_upper_bound(prefix):
+    '''
+    Smallest string greater than every string starting with prefix,
+    None if there is none
+    '''
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+
+    upper = ord(prefix[-1]) + 1
+    if upper == 0xD800:
+        # surrogates can not be stored
+        upper = 0xE000
+
+    return prefix[:-1] + chr(upper)
+
+
+@models.CharField.register_lookup
+class Prefix(models.Lookup):
+    '''
+    field__prefix=value matches values starting with value, case
+    sensitively, as the range value <= field < upper bound, which a plain
+    index on field serves on every backend (unlike __startswith, a LIKE
+    that SQLite only serves with case_sensitive_like).
+    field__lower__prefix=value.lower() is the case insensitive form,
+    served by a Lower(field) index.
+
+    The range only holds exactly the values starting with value under
+    a binary (code point) collation, SQLite's default and PostgreSQL's
+    "C". Columns with a linguistic collation order e.g. 'a-b' around
+    'ab', there '^field' (istartswith, an unindexed scan) is the correct
+    search.
+    '''
+    lookup_name = 'prefix'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        lhs_params = list(lhs_params)
+        upper = prefix_upper_bound(self.rhs)
+
+        if upper is None:
+            return f'{lhs} >= %s', lhs_params + [self.rhs]
+
+        return f'({lhs} >= %s AND {lhs} < %s)', \
+            lhs_params + [self.rhs] + lhs_params + [upper]
+
+
+def normalize_name(name):
+    '''
+    Collapse runs of whitespace, tag and ingredient names are stored
+    this way
+    '''
+    return ' '.join(name.split())
+
+
+def name_key(name):
+    '''
+    Case insensitive key of a name, equal for names the Lower() unique
+    constraints treat as duplicates
+    '''
+    return normalize_name(name).lower()
 
 
 def recipe_image_field_url(instance, filename):
     '''
-    Generate url for the recipe image field
+    Generate url for the recipe image field from the sha256 of its content,
+    so identical uploads map to the same file
     '''
-    ext = filename.split('.')[-1]
-    filename = f'{uuid.uuid4()}.{ext}'
+    ext = filename.split('.')[-1].lower()
+    digest = hashlib.sha256()
 
-    return os.path.join('uploads/recipe/', filename)
+    for chunk in instance.image.chunks():
+        digest.update(chunk)
+
+    return os.path.join(RECIPE_IMAGE_DIR, f'{digest.hexdigest()}.{ext}')
 
 
 class UserManager(BaseUserManager):
@@ -33,9 +114,20 @@ class UserManager(BaseUserManager):
 
         # not necessary, but good practice
         user.save(using=self._db)  # supporting multiple databases
+        # pin the user to a shard, their data stays there until
+        # `manage.py rebalance_shards` moves it
+        user.shard = get_ring().get(user.pk)
+        user.save(using=self._db, update_fields=['shard'])
 
         return user
 
+    def get_by_natural_key(self, email):
+        '''
+        Look the user up by email regardless of case, used by
+        authenticate()
+        '''
+        return self.get(email__lower=Lower(models.Value(email)))
+
     def create_superuser(self, email, password):
         '''
         Creates and saves a new super user
@@ -62,6 +154,11 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # database alias holding the user's data, see core.sharding
+    shard = models.CharField(max_length=64, blank=True)
+    # set while core.sharding.move_user copies the user's rows,
+    # their writes are refused meanwhile
+    migrating = models.BooleanField(default=False)
 
     objects = UserManager()  # what is this exactly?
     # This makes it so that we can say objects.create_user
@@ -69,28 +166,89 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD = 'email'  # this makes our user model custom
 
+    class Meta:
+        constraints = [
+            # logins look emails up case insensitively
+            models.UniqueConstraint(
+                Lower('email'),
+                name='unique_user_email_lower',
+            ),
+        ]
+
 
 class Tag(models.Model):
 
-    name = models.CharField(max_length=30)
+    # ids are unique across shards, see core.sharding.next_id
+    id = models.BigAutoField(primary_key=True, default=next_id)
+    name = models.CharField(max_length=30, db_index=True)
+    # users live in the default database, sharded rows can't have a
+    # foreign key constraint on them
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name='tags',
+        db_constraint=False,
         )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                models.F('user'),
+                Lower('name'),
+                name='unique_tag_name_per_user',
+            ),
+        ]
+        # case insensitive name search across users (name__lower__prefix)
+        indexes = [models.Index(Lower('name'), name='tag_name_lower')]
+
+    def __str__(self):
+        return self.name
+
+
+class CanonicalIngredient(models.Model):
+    '''
+    Shared dictionary entry every user's spelling of an ingredient points
+    to, interned by name key (see recipe.canonical). Not sharded.
+    '''
+    key = models.CharField(max_length=255, unique=True)
+    # first spelling seen, whitespace collapsed
+    name = models.CharField(max_length=255)
+
     def __str__(self):
         return self.name
 
 
 class Ingredient(models.Model):
 
-    name = models.CharField(max_length=255)
+    id = models.BigAutoField(primary_key=True, default=next_id)
+    name = models.CharField(max_length=255, db_index=True)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name='ingredients',
+        db_constraint=False,
     )
+    # the user's name is their alias of the canonical ingredient,
+    # set on create and by `manage.py backfill_canonical_ingredients`
+    canonical = models.ForeignKey(
+        CanonicalIngredient,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        db_constraint=False,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                models.F('user'),
+                Lower('name'),
+                name='unique_ingredient_name_per_user',
+            ),
+        ]
+        # case insensitive name search across users (name__lower__prefix)
+        indexes = [models.Index(Lower('name'), name='ingredient_name_lower')]
 
     def __str__(self):
         return self.name
@@ -98,16 +256,25 @@ class Ingredient(models.Model):
 
 class Recipe(models.Model):
 
-    title = models.CharField(max_length=255)
+    id = models.BigAutoField(primary_key=True, default=next_id)
+    title = models.CharField(max_length=255, db_index=True)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name='recipes',
+        db_constraint=False,
     )
     time_minutes = models.IntegerField(default=10)
     price = models.DecimalField(max_digits=5, decimal_places=2, default=999)
     link = models.CharField(max_length=255, blank=True)
-    image = models.ImageField(null=True, upload_to=recipe_image_field_url)
+    # indexed since the number of recipes referencing an image
+    # is what decides if its file can be reclaimed
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_field_url,
+        storage=recipe_image_storage,
+        db_index=True,
+    )
 
     # using string for the manytomany model instead of the model itself
     # makes it so we don't have to order them correctly
@@ -122,5 +289,151 @@ class Recipe(models.Model):
         related_name='recipes'
     )
 
+    class Meta:
+        # case insensitive title search (title__lower__prefix)
+        indexes = [models.Index(Lower('title'), name='recipe_title_lower')]
+
+    def __str__(self):
+        return self.title
+
+
+class Job(models.Model):
+    '''
+    Unit of background work, see core.jobs
+    '''
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict)
+    # jobs outlive the users they were started for (account deletion)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='jobs',
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # the queue is polled by status and due time
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
+
+
+class IdempotencyKey(models.Model):
+    '''
+    Stored response of a create request made with an Idempotency-Key,
+    see core.idempotency
+    '''
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys',
+        db_constraint=False,
+    )
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    # null while the first request with the key is still running
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(encoder=DjangoJSONEncoder, null=True)
+    # a pending row past its deadline was left by a crashed request,
+    # the next request with the key takes it over
+    locked_until = models.DateTimeField(null=True)
+    # expired keys are evicted by created_at
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'key'],
+                name='unique_idempotency_key_per_user',
+            ),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+class RecipeDocument(models.Model):
+    '''
+    Denormalized read model of a recipe, its detail representation with
+    tag and ingredient names, rebuilt on every change by recipe.documents
+    '''
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='document',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_index=False,
+        db_constraint=False,
+    )
+    document = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        # list pages are a range scan of one user's documents by recipe id
+        indexes = [models.Index(fields=['user', 'recipe'])]
+
+    def __str__(self):
+        return str(self.recipe_id)
+
+
+class RecipeSignature(models.Model):
+    '''
+    MinHash signature of a recipe's ingredient and tag set, packed
+    uint32 values, see recipe.similarity
+    '''
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='signature',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_constraint=False,
+    )
+    signature = models.BinaryField()
+
+    def __str__(self):
+        return str(self.recipe_id)
+
+
+class IdSequence(models.Model):
+    '''
+    Global id sequence of the sharded models, reserved in blocks by
+    core.sharding.next_id
+    '''
+    name = models.CharField(max_length=64, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return f'{self.name} ({self.value})'
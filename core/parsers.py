@@ -0,0 +1,38 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+try:
+    import msgpack
+except ImportError:  # optional, MessagePackParser is disabled
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # optional, CBORParser is disabled
+    cbor2 = None
+
+
+class MessagePackParser(BaseParser):
+    '''
+    Parse MessagePack request bodies, requires the msgpack package
+    '''
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
+
+
+class CBORParser(BaseParser):
+    '''
+    Parse CBOR request bodies, requires the cbor2 package
+    '''
+    media_type = 'application/cbor'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return cbor2.loads(stream.read())
+        except (ValueError, cbor2.CBORDecodeError) as exc:
+            raise ParseError(f'CBOR parse error - {exc}')
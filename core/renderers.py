@@ -0,0 +1,132 @@
+from decimal import Decimal
+
+from django.utils.functional import Promise
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the json module
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional, MessagePackRenderer is disabled
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # optional, CBORRenderer is disabled
+    cbor2 = None
+
+
+LINE_SEPARATORS = [
+    ('\u2028'.encode(), b'\\u2028'),
+    ('\u2029'.encode(), b'\\u2029'),
+]
+
+
+class CompactJSONEncoder(JSONEncoder):
+    '''
+    DRF encoder that keeps Decimal values exact instead of
+    going through float
+    '''
+
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return str(obj)
+
+        return super().default(obj)
+
+
+def encode_default(obj):
+    '''
+    Fallback for values the binary and orjson encoders don't know,
+    gives the same result as the JSON renderers
+    '''
+    if isinstance(obj, (Decimal, Promise)):
+        return str(obj)
+
+    # the DRF encoder knows querysets, generators, uuids, dates, ...
+    return CompactJSONEncoder().default(obj)
+
+
+class CompactJSONRenderer(JSONRenderer):
+    '''
+    JSON renderer without any whitespace that uses orjson when installed,
+    an explicit indent (e.g. from the browsable API) still pretty prints
+    '''
+    encoder_class = CompactJSONEncoder
+    compact = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=encode_default)
+
+        # same javascript subset escaping as JSONRenderer
+        for separator, escaped in LINE_SEPARATORS:
+            if separator in ret:
+                ret = ret.replace(separator, escaped)
+
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    '''
+    Render data as MessagePack, requires the msgpack package
+    '''
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
+
+
+def decimals_to_str(data):
+    '''
+    Copy of data with its decimals as strings, cbor2 encodes decimals
+    itself so encode_default never sees them
+    '''
+    if isinstance(data, Decimal):
+        return str(data)
+    if isinstance(data, dict):
+        return {key: decimals_to_str(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [decimals_to_str(value) for value in data]
+
+    return data
+
+
+class CBORRenderer(BaseRenderer):
+    '''
+    Render data as CBOR, requires the cbor2 package. Decimals are sent
+    as strings like the JSON and MessagePack renderers do, not as cbor2's
+    decimal fractions (tag 4), encode_default covers the types cbor2
+    doesn't know (lazy strings, querysets, ...)
+    '''
+    media_type = 'application/cbor'
+    format = 'cbor'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        return cbor2.dumps(
+            decimals_to_str(data),
+            default=lambda encoder, obj: encoder.encode(
+                decimals_to_str(encode_default(obj))
+            )
+        )
@@ -0,0 +1,375 @@
+import bisect
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F, Max
+
+
+# database of the user whose request (or job) is being served
+_current_shard = ContextVar('current_shard', default=None)
+
+ID_SEQUENCE = 'sharded'
+
+
+def _hash(value):
+    return int.from_bytes(
+        hashlib.md5(value.encode()).digest()[:8], 'big'
+    )
+
+
+class HashRing:
+    '''
+    Consistent hash ring over database aliases. Every alias owns
+    virtual_nodes points per unit of weight, so adding a shard only moves
+    the users falling on its points and a weight of 0 drains a shard.
+    '''
+
+    def __init__(self, weights, virtual_nodes):
+        points = sorted(
+            (_hash(f'{alias}:{index}'), alias)
+            for alias, weight in weights.items()
+            for index in range(weight * virtual_nodes)
+        )
+        if not points:
+            raise ValueError('At least one shard needs a positive weight.')
+
+        self._hashes = [point for point, _ in points]
+        self._aliases = [alias for _, alias in points]
+
+    def get(self, user_id):
+        '''
+        Return the alias user_id hashes to
+        '''
+        index = bisect.bisect(self._hashes, _hash(str(user_id)))
+        return self._aliases[index % len(self._aliases)]
+
+
+@lru_cache(maxsize=None)
+def get_ring():
+    '''
+    Return the ring configured by SHARD_MAP
+    '''
+    return HashRing(settings.SHARD_MAP, settings.SHARD_VIRTUAL_NODES)
+
+
+@lru_cache(maxsize=None)
+def sharded_labels():
+    return {label.lower() for label in settings.SHARDED_MODELS}
+
+
+def reset_sharding(*, setting, **kwargs):
+    if setting in ('SHARD_MAP', 'SHARD_VIRTUAL_NODES'):
+        get_ring.cache_clear()
+    elif setting == 'SHARDED_MODELS':
+        sharded_labels.cache_clear()
+
+
+setting_changed.connect(reset_sharding)
+
+
+def shard_aliases():
+    '''
+    Return every shard, drained ones (weight 0) included
+    '''
+    return list(settings.SHARD_MAP)
+
+
+def is_sharded(model):
+    return model._meta.label_lower in sharded_labels()
+
+
+def sharded_models():
+    '''
+    Return the sharded models in SHARDED_MODELS order, parents first
+    '''
+    return [apps.get_model(label) for label in settings.SHARDED_MODELS]
+
+
+def user_shard(user):
+    '''
+    Return the alias holding the user's data, the shard they are pinned to
+    or the one the ring assigns for users created before pinning
+    '''
+    return user.shard or get_ring().get(user.pk)
+
+
+def current_shard():
+    '''
+    Return the shard selected for this request or job,
+    DEFAULT_DB_ALIAS outside of one
+    '''
+    return _current_shard.get() or DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_shard(alias):
+    '''
+    Route sharded queries without an instance to alias inside the block
+    '''
+    token = _current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_shard.reset(token)
+
+
+def select_shard(alias):
+    '''
+    Route sharded queries to alias until the request finishes
+    '''
+    _current_shard.set(alias)
+
+
+def clear_shard(**kwargs):
+    '''
+    request_started and request_finished receiver, streamed bodies
+    can't rely on the shard of the request and bind their own
+    '''
+    _current_shard.set(None)
+
+
+def atomic(**kwargs):
+    '''
+    transaction.atomic on the current shard
+    '''
+    return transaction.atomic(using=current_shard(), **kwargs)
+
+
+def on_commit(func):
+    '''
+    transaction.on_commit on the current shard
+    '''
+    transaction.on_commit(func, using=current_shard())
+
+
+def in_atomic_block():
+    return transaction.get_connection(current_shard()).in_atomic_block
+
+
+class ShardRouter:
+    '''
+    Route sharded models (SHARDED_MODELS) to the database of their user,
+    everything else (users, tokens, jobs) lives in the default database.
+
+    Queries follow the shard of the instance they start from, a user
+    instance routes to that user's shard and anything else to the shard
+    selected for the request by core.authentication.
+    '''
+
+    def db_for_read(self, model, instance=None, **hints):
+        if not is_sharded(model):
+            # not None, Django would fall back to the database of the
+            # instance, a sharded row's user is only in the default one
+            return DEFAULT_DB_ALIAS
+
+        if instance is not None:
+            if isinstance(instance, get_user_model()):
+                return user_shard(instance)
+            if is_sharded(type(instance)) and instance._state.db:
+                return instance._state.db
+
+        return current_shard()
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        sharded = is_sharded(type(obj1)), is_sharded(type(obj2))
+
+        if all(sharded):
+            return obj1._state.db == obj2._state.db
+        if any(sharded):
+            # sharded rows point at their user across databases
+            return True
+
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if model_name is None:
+            return None
+
+        if f'{app_label}.{model_name}' in sharded_labels():
+            # the default database always has the (possibly empty) tables
+            # so deleting a user there finds nothing left to cascade to
+            return db == DEFAULT_DB_ALIAS or db in settings.SHARD_MAP
+
+        return db == DEFAULT_DB_ALIAS
+
+
+_id_lock = threading.Lock()
+_id_block = {'next': 0, 'end': 0}
+
+
+def max_sharded_id():
+    '''
+    Return the largest id handed out on any shard, where the global
+    sequence starts when sharding is turned on
+    '''
+    return max(
+        model._base_manager.using(alias).aggregate(
+            max_id=Max('pk')
+        )['max_id'] or 0
+        for alias in shard_aliases()
+        for model in sharded_models()
+        if model._meta.pk.default is next_id
+    )
+
+
+def reserve_ids(count):
+    '''
+    Reserve count ids of the global sequence, returns the first one
+    '''
+    sequences = apps.get_model('core', 'IdSequence').objects.using(
+        DEFAULT_DB_ALIAS
+    )
+
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        updated = sequences.filter(name=ID_SEQUENCE).update(
+            value=F('value') + count
+        )
+        if not updated:
+            sequences.get_or_create(
+                name=ID_SEQUENCE, defaults={'value': max_sharded_id()}
+            )
+            sequences.filter(name=ID_SEQUENCE).update(
+                value=F('value') + count
+            )
+        end = sequences.values_list('value', flat=True).get(name=ID_SEQUENCE)
+
+    return end - count + 1
+
+
+def next_id():
+    '''
+    Primary key default of models whose ids are public (recipes, tags,
+    ingredients). With a single shard the database assigns ids as before,
+    with several they come from blocks of the sequence in the default
+    database, so ids are unique across shards and rows keep them when
+    moved to another one.
+    '''
+    if len(settings.SHARD_MAP) < 2:
+        return None
+
+    with _id_lock:
+        if _id_block['next'] >= _id_block['end']:
+            size = settings.SHARD_ID_BLOCK_SIZE
+            _id_block['next'] = reserve_ids(size)
+            _id_block['end'] = _id_block['next'] + size
+
+        value = _id_block['next']
+        _id_block['next'] += 1
+
+    return value
+
+
+def owner_filter(model, user_id):
+    '''
+    Return the lookup selecting the rows of model that belong to user_id
+    '''
+    if any(field.name == 'user' for field in model._meta.fields):
+        return {'user_id': user_id}
+
+    # m2m through tables belong to the user of their recipe
+    return {'recipe__user_id': user_id}
+
+
+def locate_user(user_id):
+    '''
+    Return the shard holding rows of user_id, None if they have none
+    '''
+    for alias in shard_aliases():
+        for model in sharded_models():
+            rows = model._base_manager.using(alias).filter(
+                **owner_filter(model, user_id)
+            )
+            if rows.exists():
+                return alias
+
+    return None
+
+
+def copy_user_data(user_id, source, target, batch_size):
+    '''
+    Copy the rows of user_id from source to target in one transaction on
+    target. Public ids (and the recipe keyed documents) are kept, rows
+    with shard local ids get new ones. Returns the number of rows copied.
+    '''
+    copied = 0
+
+    with transaction.atomic(using=target):
+        for model in sharded_models():
+            keep_pk = not model._meta.pk.auto_created
+            rows = model._base_manager.using(source).filter(
+                **owner_filter(model, user_id)
+            ).order_by('pk')
+
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                if not keep_pk:
+                    row.pk = None
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    model._base_manager.using(target).bulk_create(batch)
+                    copied += len(batch)
+                    batch = []
+
+            model._base_manager.using(target).bulk_create(batch)
+            copied += len(batch)
+
+    return copied
+
+
+def purge_user_data(user_id, alias):
+    '''
+    Delete every sharded row of user_id from alias, children first
+    '''
+    with transaction.atomic(using=alias):
+        for model in reversed(sharded_models()):
+            rows = model._base_manager.using(alias).filter(
+                **owner_filter(model, user_id)
+            )
+            # same fast path the deletion collector uses for leaf tables
+            rows._raw_delete(alias)
+
+
+def move_user(user, target, batch_size=1000):
+    '''
+    Move the user's rows to target: copy them, pin the user to target and
+    only then delete the source rows, so a failure at any step leaves a
+    complete copy the user is pinned to. The user is flagged as migrating
+    for the move, which refuses their API writes (core.authentication),
+    and writes already running get SHARD_MOVE_GRACE seconds to finish
+    before the copy. Returns the number of rows moved.
+    '''
+    source = user.shard or locate_user(user.pk)
+    copied = 0
+
+    if source is None or source == target:
+        user.shard = target
+        user.save(update_fields=['shard'])
+        return copied
+
+    user.migrating = True
+    user.save(update_fields=['migrating'])
+
+    try:
+        time.sleep(settings.SHARD_MOVE_GRACE)
+        copied = copy_user_data(user.pk, source, target, batch_size)
+
+        user.shard = target
+        user.save(update_fields=['shard'])
+
+        purge_user_data(user.pk, source)
+    finally:
+        user.migrating = False
+        user.save(update_fields=['migrating'])
+
+    return copied
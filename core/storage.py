@@ -0,0 +1,65 @@
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    '''
+    File system storage for files named after their content hash.
+
+    Saving a name that already exists only renews its mtime since the
+    content is identical, so uploads of the same file share a single copy
+    on disk. Files are only deleted by collect, which spares files saved
+    after its cutoff.
+    '''
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        try:
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            pass
+
+        # write to a private temporary name first and atomically move it
+        # into place, concurrent uploads of the same content can't clash
+        tmp_name = f'{name}.{uuid.uuid4().hex}.tmp'
+        tmp_name = super()._save(tmp_name, content)
+        os.replace(self.path(tmp_name), self.path(name))
+
+        return name
+
+    def collect(self, name, cutoff):
+        '''
+        Delete name unless it was saved since the cutoff timestamp,
+        return whether it was deleted
+        '''
+        path = self.path(name)
+        # a save of name either renewed the mtime before the move, or
+        # finds no file afterwards and writes a new copy
+        collected = f'{path}.{uuid.uuid4().hex}.collect'
+        try:
+            os.rename(path, collected)
+        except FileNotFoundError:
+            return False
+
+        if os.path.getmtime(collected) > cutoff:
+            os.replace(collected, path)
+            return False
+
+        os.remove(collected)
+        return True
+
+
+recipe_image_storage = ContentAddressedStorage()
+
+
+def upload_storage():
+    '''
+    Private storage for uploads waiting on a background job
+    '''
+    return FileSystemStorage(location=settings.UPLOAD_ROOT)
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    '''
+    Test runner that turns throttling off, the bucket store outlives
+    single tests and test databases reuse user ids, so real rates would
+    make unrelated tests share buckets. Throttling tests set their own
+    rates with override_settings.
+    '''
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.unthrottled = override_settings(REST_FRAMEWORK=dict(
+            settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={}
+        ))
+        self.unthrottled.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.unthrottled.disable()
+        super().teardown_test_environment(**kwargs)
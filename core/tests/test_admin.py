@@ -1,9 +1,16 @@
+from unittest.mock import patch
+
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from core import models
+from core.admin import EstimatedCountPaginator
 
 
 class TestAdmin(TestCase):
+    databases = '__all__'
 
     def setUp(self):
         '''
@@ -48,3 +55,117 @@ class TestAdmin(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+    def test_admin_recipe_changelist_queries(self):
+        '''
+        Test the recipe changelist does not query per row
+        '''
+        url = reverse('admin:core_recipe_changelist')
+
+        def changelist_queries(recipes):
+            for i in range(recipes):
+                user = get_user_model().objects.create_user(
+                    email=f'{recipes}-{i}@test.com', password='test123'
+                )
+                models.Recipe.objects.create(title=f'recipe {i}', user=user)
+
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(url)
+            self.assertContains(res, f'{recipes}-0@test.com')
+
+            return len(queries)
+
+        self.assertEqual(changelist_queries(1), changelist_queries(5))
+
+    def test_admin_recipe_change_uses_autocomplete(self):
+        '''
+        Test the recipe change view does not render every tag
+        '''
+        tag = models.Tag.objects.create(name='unused tag', user=self.user)
+        recipe = models.Recipe.objects.create(title='recipe', user=self.user)
+        url = reverse('admin:core_recipe_change', args=[recipe.id])
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotContains(res, tag.name)
+
+    def test_admin_tag_and_ingredient_search(self):
+        '''
+        Test tag and ingredient changelists can be searched
+        '''
+        models.Tag.objects.create(name='vegan', user=self.user)
+        models.Ingredient.objects.create(name='salt', user=self.user)
+
+        res = self.client.get(
+            reverse('admin:core_tag_changelist'), {'q': 'veg'}
+        )
+        self.assertContains(res, 'vegan')
+
+        res = self.client.get(
+            reverse('admin:core_ingredient_changelist'), {'q': 'SA'}
+        )
+        self.assertContains(res, 'salt')
+
+        res = self.client.get(
+            reverse('admin:core_user_changelist'), {'q': 'User@'}
+        )
+        self.assertContains(res, 'user@test.com')
+
+    def test_admin_search_uses_index(self):
+        '''
+        Test prefix searches ignore case and are answered from the
+        Lower() index
+        '''
+        models.Recipe.objects.create(title='Soup', user=self.user)
+        models.Recipe.objects.create(title='salad', user=self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                reverse('admin:core_recipe_changelist'), {'q': 'sO'}
+            )
+        self.assertContains(res, 'Soup')
+        self.assertNotContains(res, 'salad')
+
+        sql = next(
+            query['sql'] for query in queries
+            if 'FROM "core_recipe"' in query['sql']
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('SEARCH core_recipe USING INDEX recipe_title_lower',
+                      plan)
+
+    def test_admin_canonical_ingredient_search(self):
+        '''
+        Test canonical ingredients are searched regardless of case
+        '''
+        models.CanonicalIngredient.objects.create(
+            key='sea salt', name='Sea Salt'
+        )
+
+        res = self.client.get(
+            reverse('admin:core_canonicalingredient_changelist'),
+            {'q': 'SEA'}
+        )
+        self.assertContains(res, 'Sea Salt')
+
+    def test_estimated_count_paginator(self):
+        '''
+        Test unfiltered querysets use the table statistics
+        '''
+        for i in range(3):
+            models.Tag.objects.create(name=f'tag {i}', user=self.user)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        models.Tag.objects.create(name='not analyzed', user=self.user)
+
+        with patch.object(EstimatedCountPaginator, 'estimate_threshold', 1):
+            unfiltered = EstimatedCountPaginator(models.Tag.objects.all(), 10)
+            filtered = EstimatedCountPaginator(
+                models.Tag.objects.filter(name__startswith='tag'), 10
+            )
+
+            self.assertEqual(unfiltered.count, 3)
+            self.assertEqual(filtered.count, 3)
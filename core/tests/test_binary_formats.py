@@ -0,0 +1,186 @@
+import unittest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import parsers, renderers
+from core.models import Recipe, Tag
+from recipe.serializers import RecipeDetailSerializer
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+BULK_UPDATE_URL = reverse('recipe:recipe-bulk-update')
+CREATE_TOKEN_URL = reverse('user:token')
+
+FORMATS = [
+    ('application/msgpack', renderers.msgpack,
+     lambda data: renderers.msgpack.packb(data),
+     lambda body: renderers.msgpack.unpackb(body)),
+    ('application/cbor', renderers.cbor2,
+     lambda data: renderers.cbor2.dumps(data),
+     lambda body: renderers.cbor2.loads(body)),
+]
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class BinaryFormatTests(TestCase):
+    '''
+    Round trip the recipe and user endpoints through every installed
+    binary format
+    '''
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='vegan')
+
+    def formats(self):
+        if all(module is None for _, module, _, _ in FORMATS):
+            self.skipTest('neither msgpack nor cbor2 is installed')
+
+        for media_type, module, dumps, loads in FORMATS:
+            if module is None:
+                continue
+            with self.subTest(media_type=media_type):
+                yield media_type, dumps, loads
+
+    def test_create_and_retrieve_recipe(self):
+        '''Test posting and reading a recipe in a binary format'''
+        for media_type, dumps, loads in self.formats():
+            payload = {
+                'title': f'soup {media_type}',
+                'tags': [self.tag.id],
+                'ingredients': [],
+                'time_minutes': 5,
+                'price': '3.20',
+            }
+            res = self.client.post(
+                RECIPES_URL, dumps(payload),
+                content_type=media_type, HTTP_ACCEPT=media_type
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(res['Content-Type'], media_type)
+            created = loads(res.content)
+            recipe = Recipe.objects.get(id=created['id'])
+            self.assertEqual(recipe.price, Decimal('3.20'))
+
+            res = self.client.get(
+                detail_url(recipe.id), HTTP_ACCEPT=media_type
+            )
+
+            self.assertEqual(
+                loads(res.content), RecipeDetailSerializer(recipe).data
+            )
+
+    def test_bulk_update(self):
+        '''Test a bulk payload in a binary format'''
+        recipe = Recipe.objects.create(user=self.user, title='stew')
+
+        for media_type, dumps, loads in self.formats():
+            payload = [{'id': recipe.id, 'add_tags': [self.tag.id]}]
+            res = self.client.patch(
+                BULK_UPDATE_URL, dumps(payload),
+                content_type=media_type, HTTP_ACCEPT=media_type
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                loads(res.content), [{'id': recipe.id, 'status': 'updated'}]
+            )
+            self.assertIn(self.tag, recipe.tags.all())
+
+    def test_validation_errors(self):
+        '''Test error details render in a binary format'''
+        for media_type, dumps, loads in self.formats():
+            res = self.client.post(
+                RECIPES_URL, dumps({'title': ''}),
+                content_type=media_type, HTTP_ACCEPT=media_type
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('title', loads(res.content))
+
+    def test_malformed_body(self):
+        '''Test an undecodable body is a 400'''
+        for media_type, dumps, loads in self.formats():
+            res = self.client.post(
+                RECIPES_URL, b'\xc1\xff', content_type=media_type
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_token(self):
+        '''Test the token endpoint accepts binary formats'''
+        for media_type, dumps, loads in self.formats():
+            payload = {'email': 'test@test.com', 'password': 'test123'}
+            res = APIClient().post(
+                CREATE_TOKEN_URL, dumps(payload),
+                content_type=media_type, HTTP_ACCEPT=media_type
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertIn('token', loads(res.content))
+
+
+class BinaryRendererTests(unittest.TestCase):
+
+    @unittest.skipIf(renderers.msgpack is None, 'msgpack is not installed')
+    def test_msgpack_round_trip(self):
+        '''Test decimals render like the JSON renderer'''
+        body = renderers.MessagePackRenderer().render(
+            {'price': Decimal('1.50'), 'tags': [1]}
+        )
+
+        self.assertEqual(
+            parsers.MessagePackParser().parse(_Stream(body)),
+            {'price': '1.50', 'tags': [1]}
+        )
+
+    @unittest.skipIf(renderers.cbor2 is None, 'cbor2 is not installed')
+    def test_cbor_round_trip(self):
+        '''Test decimals render like the JSON renderer'''
+        body = renderers.CBORRenderer().render(
+            {'price': Decimal('1.50'), 'tags': [(1, Decimal('NaN'))]}
+        )
+
+        self.assertEqual(
+            parsers.CBORParser().parse(_Stream(body)),
+            {'price': '1.50', 'tags': [[1, 'NaN']]}
+        )
+
+    @unittest.skipIf(renderers.msgpack is None or renderers.cbor2 is None,
+                     'msgpack and cbor2 are not both installed')
+    def test_formats_encode_decimals_alike(self):
+        '''Test MessagePack and CBOR send decimals the same way'''
+        data = {'price': Decimal('1.50'), 'total': [Decimal('-0.01')]}
+
+        self.assertEqual(
+            parsers.MessagePackParser().parse(
+                _Stream(renderers.MessagePackRenderer().render(data))
+            ),
+            parsers.CBORParser().parse(
+                _Stream(renderers.CBORRenderer().render(data))
+            ),
+        )
+
+
+class _Stream:
+
+    def __init__(self, body):
+        self.body = body
+
+    def read(self):
+        return self.body
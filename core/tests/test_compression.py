@@ -0,0 +1,145 @@
+import gzip
+import json
+import zlib
+from decimal import Decimal
+from unittest import mock
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import renderers
+from core.middleware import CompressionMiddleware, negotiate_encoding
+from core.renderers import CompactJSONRenderer
+
+
+PAYLOAD = json.dumps([{'title': f'recipe {i}'} for i in range(100)])
+
+
+def get_response(content=PAYLOAD, content_type='application/json', **kw):
+    def view(request):
+        return HttpResponse(content, content_type=content_type, **kw)
+    return view
+
+
+class CompactJSONRendererTests(SimpleTestCase):
+
+    def test_render_compact(self):
+        '''Test rendering has no whitespace and keeps decimals exact'''
+        data = {'title': 'Soup', 'price': Decimal('5.10'), 'tags': [1, 2]}
+        res = CompactJSONRenderer().render(data)
+
+        self.assertEqual(res, b'{"title":"Soup","price":"5.10","tags":[1,2]}')
+
+    def test_render_without_orjson(self):
+        '''Test the json module fallback renders the same bytes'''
+        data = {'title': 'Soup', 'price': Decimal('5.10'), 'tags': [1, 2]}
+        expected = CompactJSONRenderer().render(data)
+
+        with mock.patch.object(renderers, 'orjson', None):
+            res = CompactJSONRenderer().render(data)
+
+        self.assertEqual(res, expected)
+
+    def test_render_escapes_line_separators(self):
+        '''Test U+2028 and U+2029 are escaped like JSONRenderer does'''
+        res = CompactJSONRenderer().render({'title': 'a b c'})
+
+        self.assertIn(b'a\\u2028b\\u2029c', res)
+
+    def test_render_indent(self):
+        '''Test an explicit indent still pretty prints'''
+        res = CompactJSONRenderer().render(
+            {'a': 1}, 'application/json; indent=2'
+        )
+
+        self.assertEqual(res, b'{\n  "a": 1\n}')
+
+
+class NegotiateEncodingTests(SimpleTestCase):
+
+    def test_negotiate_encoding(self):
+        '''Test the first preferred encoding the client accepts wins'''
+        preference = ['zstd', 'br', 'gzip']
+
+        self.assertEqual(
+            negotiate_encoding('gzip, deflate, br', preference), 'br'
+        )
+        self.assertEqual(negotiate_encoding('gzip;q=0.5', preference), 'gzip')
+        self.assertEqual(
+            negotiate_encoding('br;q=0, gzip', preference), 'gzip'
+        )
+        self.assertEqual(negotiate_encoding('*', preference), 'zstd')
+        self.assertIsNone(negotiate_encoding('identity', preference))
+        self.assertIsNone(negotiate_encoding('', preference))
+
+
+@override_settings(COMPRESSION_ENCODINGS=['gzip'], COMPRESSION_MIN_SIZE=200)
+class CompressionMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def request(self, view, encoding='gzip'):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING=encoding)
+        return CompressionMiddleware(view)(request)
+
+    def test_compress_json(self):
+        '''Test json responses are gzipped when the client accepts it'''
+        res = self.request(get_response(headers={'ETag': '"abc"'}))
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+        self.assertEqual(res['ETag'], 'W/"abc"')
+        self.assertEqual(int(res['Content-Length']), len(res.content))
+        self.assertEqual(gzip.decompress(res.content).decode(), PAYLOAD)
+
+    def test_not_accepted(self):
+        '''Test the response is untouched without Accept-Encoding'''
+        res = self.request(get_response(), encoding='')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+        self.assertEqual(res.content.decode(), PAYLOAD)
+
+    def test_small_response(self):
+        '''Test responses below COMPRESSION_MIN_SIZE are not compressed'''
+        res = self.request(get_response('{"a":1}'))
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.content, b'{"a":1}')
+
+    def test_skipped_responses(self):
+        '''Test binary, partial and already encoded responses are skipped'''
+        views = [
+            get_response(content_type='image/jpeg'),
+            get_response(status=206),
+            get_response(headers={'Content-Encoding': 'identity'}),
+        ]
+
+        for view in views:
+            res = self.request(view)
+            self.assertEqual(res.content.decode(), PAYLOAD)
+            self.assertNotEqual(res.get('Content-Encoding'), 'gzip')
+
+    @override_settings(COMPRESSION_STREAM_FLUSH_SIZE=256)
+    def test_compress_streaming(self):
+        '''
+        Test streaming responses are compressed as they stream and
+        flushed once per COMPRESSION_STREAM_FLUSH_SIZE bytes, not per chunk
+        '''
+        chunks = [f'{{"line": {i}}}\n'.encode() for i in range(50)]
+
+        def view(request):
+            return StreamingHttpResponse(
+                iter(chunks), content_type='application/x-ndjson'
+            )
+
+        res = self.request(view)
+        body = list(res.streaming_content)
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertGreater(len(body), 1)
+        self.assertLess(len(body), len(chunks) // 5)
+        self.assertEqual(
+            zlib.decompress(b''.join(body), 31), b''.join(chunks)
+        )
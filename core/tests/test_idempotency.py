@@ -0,0 +1,179 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import IdempotencyKey, Recipe, Tag
+from recipe.views import TagAPIViewSets
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class IdempotencyKeyTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_retry_replays_stored_response(self):
+        '''
+        Test retrying a create with the same key returns the first
+        response without creating again
+        '''
+        payload = {'title': 'recipe', 'ingredients': [], 'tags': []}
+
+        res_1 = self.client.post(
+            RECIPE_URL, payload, format='json', HTTP_IDEMPOTENCY_KEY='abc'
+        )
+        res_2 = self.client.post(
+            RECIPE_URL, payload, format='json', HTTP_IDEMPOTENCY_KEY='abc'
+        )
+
+        self.assertEqual(res_1.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res_2.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res_1.data, res_2.data)
+        self.assertEqual(res_2['Idempotent-Replayed'], 'true')
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 1)
+
+    def test_tag_retry_does_not_hit_duplicate_check(self):
+        '''
+        Test retried tag creates are answered from storage
+        '''
+        for _ in range(2):
+            res = self.client.post(
+                TAGS_URL, {'name': 'tag'}, HTTP_IDEMPOTENCY_KEY='tag-key'
+            )
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_key_in_progress_conflict(self):
+        '''
+        Test a retry arriving while the first request still runs is
+        answered with a conflict without creating
+        '''
+        self.client.post(TAGS_URL, {'name': 'tag'},
+                         HTTP_IDEMPOTENCY_KEY='key')
+        # back to the state while the first create runs
+        IdempotencyKey.objects.update(status_code=None, response=None)
+        Tag.objects.all().delete()
+
+        res = self.client.post(TAGS_URL, {'name': 'tag'},
+                               HTTP_IDEMPOTENCY_KEY='key')
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Tag.objects.exists())
+
+    def test_crashed_key_taken_over(self):
+        '''
+        Test a pending key past its lock deadline is taken over by
+        the retry instead of conflicting until it expires
+        '''
+        self.client.post(TAGS_URL, {'name': 'tag'},
+                         HTTP_IDEMPOTENCY_KEY='key')
+        # left pending by a request that crashed before filling it in
+        IdempotencyKey.objects.update(
+            status_code=None, response=None,
+            locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        Tag.objects.all().delete()
+
+        res = self.client.post(TAGS_URL, {'name': 'tag'},
+                               HTTP_IDEMPOTENCY_KEY='key')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', res)
+        self.assertEqual(
+            IdempotencyKey.objects.get().status_code,
+            status.HTTP_201_CREATED
+        )
+
+        res = self.client.post(TAGS_URL, {'name': 'tag'},
+                               HTTP_IDEMPOTENCY_KEY='key')
+
+        self.assertEqual(res['Idempotent-Replayed'], 'true')
+        self.assertEqual(Tag.objects.count(), 1)
+
+    def test_failed_create_releases_key(self):
+        '''
+        Test a create that raises frees its key for the retry
+        '''
+        with patch.object(
+            TagAPIViewSets, 'perform_create', side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.client.post(TAGS_URL, {'name': 'tag'},
+                                 HTTP_IDEMPOTENCY_KEY='key')
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        res = self.client.post(TAGS_URL, {'name': 'tag'},
+                               HTTP_IDEMPOTENCY_KEY='key')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', res)
+
+    def test_key_reused_for_other_request_fail(self):
+        '''
+        Test reusing a key with a different body is rejected
+        '''
+        self.client.post(TAGS_URL, {'name': 'tag 1'},
+                         HTTP_IDEMPOTENCY_KEY='key')
+
+        res = self.client.post(TAGS_URL, {'name': 'tag 2'},
+                               HTTP_IDEMPOTENCY_KEY='key')
+
+        self.assertEqual(
+            res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_keys_are_per_user(self):
+        '''
+        Test the same key of another user is independent
+        '''
+        self.client.post(TAGS_URL, {'name': 'tag'},
+                         HTTP_IDEMPOTENCY_KEY='key')
+        other = APIClient()
+        other.force_authenticate(get_user_model().objects.create_user(
+            email='other@test.com',
+            password='test123',
+        ))
+
+        res = other.post(TAGS_URL, {'name': 'tag'},
+                         HTTP_IDEMPOTENCY_KEY='key')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', res)
+
+    def test_expired_keys_evicted(self):
+        '''
+        Test expired keys are not replayed and are evicted
+        '''
+        self.client.post(TAGS_URL, {'name': 'tag'},
+                         HTTP_IDEMPOTENCY_KEY='key')
+        IdempotencyKey.objects.update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+
+        res = self.client.post(TAGS_URL, {'name': 'tag 2'},
+                               HTTP_IDEMPOTENCY_KEY='key')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        IdempotencyKey.objects.update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+        call_command('evict_idempotency_keys', stdout=StringIO())
+
+        self.assertFalse(IdempotencyKey.objects.exists())
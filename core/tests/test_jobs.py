@@ -0,0 +1,123 @@
+import time
+from datetime import timedelta
+from unittest.mock import Mock
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from core import jobs
+from core.models import Job
+
+
+succeed = Mock(return_value={'ok': True})
+fail = Mock(side_effect=RuntimeError('boom'))
+cleanup = Mock()
+jobs.job('test.succeed')(succeed)
+jobs.job('test.fail', on_failure=cleanup)(fail)
+
+
+@override_settings(JOB_RETRY_BACKOFF=10, JOB_RETRY_BACKOFF_MAX=15)
+class JobQueueTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        succeed.reset_mock()
+        fail.reset_mock()
+        cleanup.reset_mock()
+
+    def test_run_job_success(self):
+        '''
+        Test running a job passes the payload and stores the result
+        '''
+        job = jobs.enqueue('test.succeed', value=1)
+
+        self.assertEqual(jobs.run_pending(), 1)
+
+        job.refresh_from_db()
+        succeed.assert_called_once_with(value=1)
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result, {'ok': True})
+        self.assertEqual(job.attempts, 1)
+
+    def test_failed_job_retried_with_backoff(self):
+        '''
+        Test failing jobs are requeued with exponential backoff
+        and fail for good after max_attempts
+        '''
+        job = jobs.enqueue('test.fail', max_attempts=3, value=1)
+
+        for attempt, delay in [(1, 10), (2, 15)]:
+            before = timezone.now()
+            jobs.run_pending()
+            job.refresh_from_db()
+
+            self.assertEqual(job.status, Job.QUEUED)
+            self.assertEqual(job.attempts, attempt)
+            self.assertIn('boom', job.error)
+            self.assertGreaterEqual(
+                job.run_at, before + timedelta(seconds=delay)
+            )
+            # not due yet
+            self.assertEqual(jobs.run_pending(), 0)
+            cleanup.assert_not_called()
+            Job.objects.filter(id=job.id).update(run_at=timezone.now())
+
+        jobs.run_pending()
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(fail.call_count, 3)
+        cleanup.assert_called_once_with(value=1)
+
+    def test_claim_is_exclusive(self):
+        '''
+        Test a job is only claimed once
+        '''
+        jobs.enqueue('test.succeed')
+
+        self.assertIsNotNone(jobs.claim())
+        self.assertIsNone(jobs.claim())
+
+    def test_unknown_job_fails(self):
+        '''
+        Test jobs without a registered function fail
+        '''
+        job = jobs.enqueue('test.unknown', max_attempts=1)
+
+        jobs.run_pending()
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, Job.FAILED)
+
+    @override_settings(JOB_TIMEOUT=60)
+    def test_requeue_stale_jobs(self):
+        '''
+        Test running jobs of dead workers are put back in the queue
+        '''
+        job = jobs.enqueue('test.succeed')
+        jobs.claim()
+        Job.objects.filter(id=job.id).update(
+            updated_at=timezone.now() - timedelta(seconds=120)
+        )
+
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.run_pending(), 1)
+
+
+class HeartbeatTests(TransactionTestCase):
+    databases = '__all__'
+
+    @override_settings(JOB_TIMEOUT=60)
+    def test_heartbeat_keeps_running_job(self):
+        '''
+        Test the heartbeat of a running job keeps it from being requeued
+        '''
+        job = jobs.enqueue('test.succeed')
+        jobs.claim()
+        stale = timezone.now() - timedelta(seconds=120)
+        Job.objects.filter(id=job.id).update(updated_at=stale)
+
+        with jobs.Heartbeat(job, interval=0.01):
+            time.sleep(0.1)
+
+        job.refresh_from_db()
+        self.assertGreater(job.updated_at, stale)
+        self.assertEqual(jobs.requeue_stale(), 0)
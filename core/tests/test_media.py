@@ -0,0 +1,141 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+CONTENT = b'0123456789' * 10
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+
+
+def media_url(path):
+    return reverse('media', args=[path])
+
+
+def response_content(res):
+    if res.streaming:
+        return b''.join(res.streaming_content)
+    return res.content
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class MediaServingTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(MEDIA_ROOT, 'uploads/recipe'), exist_ok=True)
+        os.makedirs(os.path.join(MEDIA_ROOT, 'imports'), exist_ok=True)
+        for name in [f'uploads/recipe/{DIGEST}.jpg',
+                     'uploads/recipe/plain.jpg', 'imports/upload.ndjson']:
+            with open(os.path.join(MEDIA_ROOT, name), 'wb') as f:
+                f.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_serve_immutable_file(self):
+        '''
+        Test content addressed files are cached forever with a strong ETag
+        '''
+        res = self.client.get(media_url(f'uploads/recipe/{DIGEST}.jpg'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(response_content(res), CONTENT)
+        self.assertEqual(res['ETag'], f'"{DIGEST}"')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+
+    def test_serve_plain_file_short_cache(self):
+        '''
+        Test other files get a limited max-age
+        '''
+        res = self.client.get(media_url('uploads/recipe/plain.jpg'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('immutable', res['Cache-Control'])
+
+    def test_if_none_match_not_modified(self):
+        '''
+        Test a matching If-None-Match returns 304
+        '''
+        res = self.client.get(
+            media_url(f'uploads/recipe/{DIGEST}.jpg'),
+            HTTP_IF_NONE_MATCH=f'"{DIGEST}"'
+        )
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_range_requests(self):
+        '''
+        Test bounded, open ended and suffix byte ranges
+        '''
+        url = media_url(f'uploads/recipe/{DIGEST}.jpg')
+        cases = [
+            ('bytes=10-19', 10, 19),
+            ('bytes=95-', 95, 99),
+            ('bytes=-5', 95, 99),
+        ]
+
+        for header, start, end in cases:
+            res = self.client.get(url, HTTP_RANGE=header)
+
+            self.assertEqual(res.status_code, 206)
+            self.assertEqual(response_content(res), CONTENT[start:end + 1])
+            self.assertEqual(res['Content-Range'], f'bytes {start}-{end}/100')
+            self.assertEqual(res['Content-Length'], str(end - start + 1))
+
+    def test_invalid_range_ignored(self):
+        '''
+        Test a range ending before its start sends the whole file
+        '''
+        res = self.client.get(
+            media_url(f'uploads/recipe/{DIGEST}.jpg'),
+            HTTP_RANGE='bytes=20-10'
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(response_content(res), CONTENT)
+
+    def test_unsatisfiable_range(self):
+        '''
+        Test ranges past the end of the file return 416
+        '''
+        res = self.client.get(
+            media_url(f'uploads/recipe/{DIGEST}.jpg'),
+            HTTP_RANGE='bytes=200-'
+        )
+
+        self.assertEqual(res.status_code, 416)
+
+    @override_settings(MEDIA_SENDFILE_HEADER='X-Accel-Redirect')
+    def test_accel_redirect_offload(self):
+        '''
+        Test serving is handed to the proxy when configured
+        '''
+        res = self.client.get(media_url('uploads/recipe/plain.jpg'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            res['X-Accel-Redirect'],
+            '/protected-media/uploads/recipe/plain.jpg'
+        )
+        self.assertEqual(res.content, b'')
+
+    def test_missing_and_traversal_not_found(self):
+        '''
+        Test missing files and paths outside the recipe images
+        return 404
+        '''
+        for path in ['uploads/recipe/missing.jpg', '../settings.py',
+                     'imports/upload.ndjson',
+                     'uploads/recipe/../../imports/upload.ndjson']:
+            res = self.client.get(media_url(path))
+
+            self.assertEqual(res.status_code, 404)
@@ -1,5 +1,7 @@
-from unittest.mock import patch
+import hashlib
 
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from core import models
@@ -13,6 +15,7 @@ def sample_user(email='test@test.com', password='test123'):
 
 
 class ModelTests(TestCase):
+    databases = '__all__'
 
     def test_create_user_with_email_successfully(self):
         '''
@@ -120,15 +123,58 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(recipe), recipe.title)
 
-    @patch('uuid.uuid4')
-    def test_recipe_image_field_url(self, mock_function):
+    def test_recipe_image_field_url(self):
         '''
-        Test url generator for the image field
+        Test url generator for the image field uses the content hash
         '''
-        uuid_return = 'test-image'
-        mock_function.return_value = uuid_return
+        content = b'test image content'
+        recipe = models.Recipe(
+            image=SimpleUploadedFile('mytestimage.JPG', content)
+        )
+
+        url = models.recipe_image_field_url(recipe, 'mytestimage.JPG')
+        exp_url = f'uploads/recipe/{hashlib.sha256(content).hexdigest()}.jpg'
+
+        self.assertEqual(url, exp_url)
+
+    def test_names_unique_regardless_of_case(self):
+        '''
+        Test a user can't have tags or ingredients differing only in case
+        '''
+        user = sample_user()
+        models.Tag.objects.create(user=user, name='Vegan')
+        models.Tag.objects.create(user=sample_user('other@test.com'),
+                                  name='vegan')
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='VEGAN')
 
-        url = models.recipe_image_field_url(None, 'mytestimage.jpg')
-        exp_url = f'uploads/recipe/{uuid_return}.jpg'
+    def test_prefix_lookup(self):
+        '''
+        Test the prefix lookup matches values starting with the prefix
+        '''
+        user = sample_user()
+        for title in ['sa', 'salt', 'sb', 'Salt', 'sa\U0010ffff']:
+            models.Recipe.objects.create(user=user, title=title)
+
+        self.assertEqual(
+            sorted(models.Recipe.objects.filter(
+                title__prefix='sa'
+            ).values_list('title', flat=True)),
+            ['sa', 'salt', 'sa\U0010ffff']
+        )
+        self.assertEqual(models.prefix_upper_bound('sa'), 'sb')
+        self.assertIsNone(models.prefix_upper_bound('\U0010ffff'))
 
-        self.assertEqual(url, exp_url)
\ No newline at end of file
+    def test_email_unique_regardless_of_case(self):
+        '''
+        Test emails differing only in case belong to the same user
+        '''
+        user = sample_user('Test@test.com')
+
+        self.assertEqual(
+            get_user_model().objects.get_by_natural_key('test@TEST.com'),
+            user
+        )
+        with self.assertRaises(IntegrityError):
+            sample_user('TEST@test.com')
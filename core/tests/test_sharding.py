@@ -0,0 +1,317 @@
+from collections import Counter
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from core.models import Recipe, RecipeDocument, Tag
+from core.sharding import (HashRing, clear_shard, move_user, shard_aliases,
+                           user_shard)
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class HashRingTests(SimpleTestCase):
+
+    def test_users_spread_over_shards(self):
+        '''
+        Test every shard gets a fair share of the users
+        '''
+        ring = HashRing({'a': 1, 'b': 1, 'c': 1}, 64)
+
+        counts = Counter(ring.get(user_id) for user_id in range(3000))
+
+        self.assertEqual(set(counts), {'a', 'b', 'c'})
+        for count in counts.values():
+            self.assertGreater(count, 600)
+
+    def test_adding_shard_moves_only_its_share(self):
+        '''
+        Test a new shard only takes users over from the existing ones
+        '''
+        before = HashRing({'a': 1, 'b': 1, 'c': 1}, 64)
+        after = HashRing({'a': 1, 'b': 1, 'c': 1, 'd': 1}, 64)
+
+        moved = [
+            user_id for user_id in range(4000)
+            if before.get(user_id) != after.get(user_id)
+        ]
+
+        self.assertTrue(all(after.get(user_id) == 'd' for user_id in moved))
+        self.assertLess(len(moved), 4000 * 0.35)
+
+    def test_zero_weight_drains_shard(self):
+        '''
+        Test no user maps to a shard with a weight of 0
+        '''
+        ring = HashRing({'a': 1, 'b': 0}, 64)
+
+        self.assertEqual({ring.get(user_id) for user_id in range(500)}, {'a'})
+
+    def test_no_weight_fail(self):
+        '''
+        Test a ring needs a shard with a positive weight
+        '''
+        with self.assertRaises(ValueError):
+            HashRing({'a': 0}, 64)
+
+
+@skipUnless(
+    len(settings.SHARD_MAP) > 1,
+    'needs several shards, run with SHARD_COUNT=3'
+)
+class ShardedApiTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        # one user per shard
+        self.users = {}
+        index = 0
+        while len(self.users) < len(shard_aliases()):
+            user = get_user_model().objects.create_user(
+                email=f'user{index}@test.com', password='test123'
+            )
+            self.users.setdefault(user_shard(user), user)
+            index += 1
+
+    def client_for(self, user):
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def create_recipe(self, user, title='recipe'):
+        res = self.client_for(user).post(
+            RECIPE_URL,
+            {'title': title, 'ingredients': [], 'tags': []},
+            format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data['id']
+
+    def test_rows_stored_on_user_shard(self):
+        '''
+        Test recipes and their documents are written to the shard of
+        their user only
+        '''
+        for alias, user in self.users.items():
+            recipe_id = self.create_recipe(user)
+
+            for other in shard_aliases():
+                self.assertEqual(
+                    Recipe.objects.using(other).filter(id=recipe_id).exists(),
+                    other == alias
+                )
+            self.assertTrue(
+                RecipeDocument.objects.using(alias).filter(
+                    recipe_id=recipe_id
+                ).exists()
+            )
+
+    def test_force_authenticated_user_routed(self):
+        '''
+        Test requests authenticated without a token reach the shard of
+        their user too
+        '''
+        for alias, user in self.users.items():
+            client = APIClient()
+            client.force_authenticate(user)
+            res = client.post(
+                RECIPE_URL,
+                {'title': 'forced', 'ingredients': [], 'tags': []},
+                format='json'
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            self.assertTrue(
+                Recipe.objects.using(alias).filter(id=res.data['id']).exists()
+            )
+
+    def test_ids_unique_across_shards(self):
+        '''
+        Test recipes created on different shards never share an id
+        '''
+        ids = [
+            self.create_recipe(user, f'recipe {index}')
+            for user in self.users.values()
+            for index in range(3)
+        ]
+
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_users_only_read_their_shard(self):
+        '''
+        Test listing and retrieving recipes is limited to the user's rows
+        '''
+        recipe_ids = {
+            alias: self.create_recipe(user, f'recipe {alias}')
+            for alias, user in self.users.items()
+        }
+
+        for alias, user in self.users.items():
+            client = self.client_for(user)
+            res = client.get(RECIPE_URL)
+
+            self.assertEqual(
+                [recipe['id'] for recipe in res.data], [recipe_ids[alias]]
+            )
+            for other, recipe_id in recipe_ids.items():
+                res = client.get(detail_url(recipe_id))
+                self.assertEqual(
+                    res.status_code,
+                    status.HTTP_200_OK if other == alias
+                    else status.HTTP_404_NOT_FOUND
+                )
+
+    @override_settings(SHARD_MOVE_GRACE=0)
+    def test_rebalance_moves_user_data(self):
+        '''
+        Test draining a shard moves its users' rows, ids and
+        relations to the shard the ring assigns
+        '''
+        source, user = next(iter(self.users.items()))
+        client = self.client_for(user)
+        tag = client.post(reverse('recipe:tag-list'), {'name': 'tag'}).data
+        res = client.post(
+            RECIPE_URL,
+            {'title': 'moved', 'ingredients': [], 'tags': [tag['id']]},
+            format='json'
+        )
+        recipe_id = res.data['id']
+
+        shard_map = dict(settings.SHARD_MAP, **{source: 0})
+        with override_settings(SHARD_MAP=shard_map):
+            call_command('rebalance_shards', stdout=StringIO())
+
+        user.refresh_from_db()
+        self.assertNotEqual(user.shard, source)
+        self.assertFalse(user.migrating)
+        self.assertFalse(
+            Recipe.objects.using(source).filter(user=user).exists()
+        )
+        self.assertFalse(Tag.objects.using(source).filter(user=user).exists())
+        recipe = Recipe.objects.using(user.shard).get(id=recipe_id)
+        self.assertEqual(
+            list(recipe.tags.values_list('id', flat=True)), [tag['id']]
+        )
+
+        res = client.get(detail_url(recipe_id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['title'], 'moved')
+
+    def test_admin_edits_rows_on_their_shard(self):
+        '''
+        Test the admin lists, shows and saves rows on the shard of
+        their user
+        '''
+        admin = Client()
+        admin.force_login(get_user_model().objects.create_superuser(
+            email='admin@test.com', password='test123'
+        ))
+
+        for alias, user in self.users.items():
+            tag_id = self.client_for(user).post(
+                reverse('recipe:tag-list'), {'name': f'tag {alias}'}
+            ).data['id']
+            change_url = reverse('admin:core_tag_change', args=[tag_id])
+
+            res = admin.get(reverse('admin:core_tag_changelist'),
+                            {'shard': alias})
+            self.assertContains(res, f'tag {alias}')
+            self.assertContains(res, user.email)
+
+            res = admin.get(change_url)
+            self.assertContains(res, f'tag {alias}')
+
+            res = admin.post(
+                change_url, {'name': f'renamed {alias}', 'user': user.id}
+            )
+            self.assertEqual(res.status_code, status.HTTP_302_FOUND)
+            self.assertEqual(
+                Tag.objects.using(alias).get(id=tag_id).name,
+                f'renamed {alias}'
+            )
+
+        res = admin.get(reverse('admin:core_tag_add'))
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_binds_user_shard(self):
+        '''
+        Test a streamed export reads the shard of its user even when the
+        body is consumed outside of the request's shard
+        '''
+        for alias, user in self.users.items():
+            self.create_recipe(user, f'recipe {alias}')
+
+            res = self.client_for(user).get(reverse('recipe:recipe-export'))
+            clear_shard()
+            body = b''.join(res.streaming_content).decode()
+
+            self.assertIn(f'recipe {alias}', body)
+
+
+class UserMigratingTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com', password='test123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_writes_refused_while_migrating(self):
+        '''
+        Test a user being moved to another shard can read but not write
+        '''
+        self.user.migrating = True
+        self.user.save()
+
+        res = self.client.post(
+            RECIPE_URL, {'title': 'recipe', 'ingredients': [], 'tags': []},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', res)
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(
+            self.client.get(RECIPE_URL).status_code, status.HTTP_200_OK
+        )
+
+    @override_settings(SHARD_MOVE_GRACE=0)
+    def test_move_flags_user_while_copying(self):
+        '''
+        Test the user is flagged as migrating during the copy only
+        '''
+        targets = [
+            alias for alias in shard_aliases()
+            if alias != user_shard(self.user)
+        ]
+        if not targets:
+            self.skipTest('needs several shards, run with SHARD_COUNT=3')
+
+        def copy_user_data(user_id, *args):
+            flags.append(get_user_model().objects.get(id=user_id).migrating)
+            return 0
+
+        flags = []
+        with patch('core.sharding.copy_user_data', copy_user_data), \
+                patch('core.sharding.purge_user_data'):
+            move_user(self.user, targets[0])
+
+        self.user.refresh_from_db()
+        self.assertEqual(flags, [True])
+        self.assertFalse(self.user.migrating)
+        self.assertEqual(self.user.shard, targets[0])
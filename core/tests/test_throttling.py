@@ -0,0 +1,140 @@
+import os
+import tempfile
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.throttling import (MemoryBucketStore, SQLiteBucketStore,
+                             get_bucket_store)
+
+
+TAGS_URL = reverse('recipe:tag-list')
+TOKEN_URL = reverse('user:token')
+THROTTLED_SETTINGS = {
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.UserBucketThrottle',
+        'core.throttling.AuthTokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'read': '2/min',
+        'write': '1/min',
+        'token': '1/min',
+    },
+}
+
+
+class BucketStoreTests(TestCase):
+    databases = '__all__'
+
+    def check_store(self, store):
+        # capacity 2, one token per second
+        self.assertTrue(store.consume('key', 2, 1, 100)[0])
+        self.assertTrue(store.consume('key', 2, 1, 100)[0])
+
+        allowed, wait = store.consume('key', 2, 1, 100)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 1)
+
+        self.assertTrue(store.consume('other key', 2, 1, 100)[0])
+        self.assertTrue(store.consume('key', 2, 1, 101)[0])
+        self.assertFalse(store.consume('key', 2, 1, 101)[0])
+
+    def test_memory_store(self):
+        '''
+        Test token bucket accounting of the memory store
+        '''
+        self.check_store(MemoryBucketStore())
+
+    def test_memory_store_evicts_least_recently_used(self):
+        '''
+        Test the memory store drops the least recently used bucket
+        once it holds more than max_keys
+        '''
+        store = MemoryBucketStore()
+        store.max_keys = 2
+        store.consume('a', 1, 1, 100)
+        store.consume('b', 1, 1, 100)
+        store.consume('a', 1, 1, 100)
+
+        store.consume('c', 1, 1, 100)
+
+        self.assertFalse(store.consume('a', 1, 1, 100)[0])
+        self.assertTrue(store.consume('b', 1, 1, 100)[0])
+
+    def test_sqlite_store_shared(self):
+        '''
+        Test the sqlite store is shared between store instances
+        '''
+        path = os.path.join(tempfile.mkdtemp(), 'throttle.sqlite3')
+        self.check_store(SQLiteBucketStore(path))
+
+        self.assertFalse(SQLiteBucketStore(path).consume('key', 2, 1, 101)[0])
+
+
+@override_settings(REST_FRAMEWORK=THROTTLED_SETTINGS)
+class ThrottlingAPITests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        get_bucket_store().clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        get_bucket_store().clear()
+
+    def test_reads_throttled_per_user(self):
+        '''
+        Test reads past the bucket capacity are rejected with 429
+        '''
+        for _ in range(2):
+            res = self.client.get(TAGS_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+
+        other = APIClient()
+        other.force_authenticate(get_user_model().objects.create_user(
+            email='other@test.com',
+            password='test123',
+        ))
+        self.assertEqual(other.get(TAGS_URL).status_code, status.HTTP_200_OK)
+
+    def test_reads_and_writes_use_separate_buckets(self):
+        '''
+        Test writes are limited independently of reads
+        '''
+        self.assertEqual(
+            self.client.post(TAGS_URL, {'name': 'tag 1'}).status_code,
+            status.HTTP_201_CREATED
+        )
+        self.assertEqual(
+            self.client.post(TAGS_URL, {'name': 'tag 2'}).status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertEqual(
+            self.client.get(TAGS_URL).status_code, status.HTTP_200_OK
+        )
+
+    def test_token_endpoint_throttled(self):
+        '''
+        Test the token endpoint has its own scope
+        '''
+        client = APIClient()
+        payload = {'email': 'test@test.com', 'password': 'test123'}
+
+        self.assertEqual(
+            client.post(TOKEN_URL, payload).status_code, status.HTTP_200_OK
+        )
+        self.assertEqual(
+            client.post(TOKEN_URL, payload).status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS
+        )
@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from app import settings_api
+from core.warmup import iter_views, serializer_classes, warm_up
+from recipe.serializers import RecipeDetailSerializer, RecipeSerializer
+from recipe.views import RecipeViewSets
+
+
+class WarmUpTests(TestCase):
+    databases = '__all__'
+
+    def test_serializer_classes(self):
+        '''Test the serializers of every viewset action are found'''
+        found = serializer_classes(RecipeViewSets, {'list', 'retrieve'})
+
+        self.assertEqual(found, {RecipeSerializer, RecipeDetailSerializer})
+
+    def test_warm_up(self):
+        '''Test warming up visits the API views and their serializers'''
+        from django.urls import get_resolver
+
+        view_classes = {
+            view_class
+            for view_class, _ in iter_views(get_resolver().url_patterns)
+        }
+
+        self.assertIn(RecipeViewSets, view_classes)
+        self.assertGreater(warm_up(), 5)
+
+
+@override_settings(
+    MIDDLEWARE=settings_api.MIDDLEWARE,
+    REST_FRAMEWORK=settings_api.REST_FRAMEWORK,
+)
+class APISettingsTests(TestCase):
+    databases = '__all__'
+
+    def test_unused_apps_removed(self):
+        '''Test the API profile leaves admin, sessions and messages out'''
+        for app in settings_api.API_UNUSED_APPS:
+            self.assertNotIn(app, settings_api.INSTALLED_APPS)
+        self.assertIn('rest_framework.authtoken', settings_api.INSTALLED_APPS)
+
+    def test_token_requests(self):
+        '''Test token authenticated requests work without sessions/CSRF'''
+        user = get_user_model().objects.create_user(
+            email='test@test.com', password='test123'
+        )
+        token = Token.objects.create(user=user)
+        client = APIClient(enforce_csrf_checks=True)
+
+        res = client.post(
+            reverse('recipe:recipe-list'),
+            {'title': 'soup', 'tags': [], 'ingredients': []},
+            format='json', HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res = client.get(reverse('recipe:recipe-list'))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,209 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.utils.module_loading import import_string
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    '''
+    Parse a DRF style rate like "100/min" into (capacity, seconds)
+    '''
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+class MemoryBucketStore:
+    '''
+    Process local token bucket store, the least recently used buckets
+    are evicted once there are more than max_keys
+    '''
+    max_keys = 100_000
+
+    def __init__(self):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate, now):
+        '''
+        Take a token from the bucket, returns (allowed, seconds to wait)
+        '''
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / refill_rate
+
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                # the oldest bucket has refilled the longest
+                self._buckets.popitem(last=False)
+
+        return wait == 0, wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBucketStore:
+    '''
+    Token bucket store in a SQLite file shared by all worker processes
+    on the same host
+    '''
+
+    def __init__(self, path, timeout=1):
+        self.path = str(path)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        conn = getattr(self._local, 'connection', None)
+
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS throttle_bucket ('
+                'key TEXT PRIMARY KEY, tokens REAL, updated REAL'
+                ') WITHOUT ROWID'
+            )
+            self._local.connection = conn
+
+        return conn
+
+    def consume(self, key, capacity, refill_rate, now):
+        '''
+        Take a token from the bucket, returns (allowed, seconds to wait)
+        '''
+        conn = self.connection
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT tokens, updated FROM throttle_bucket WHERE key = ?',
+                (key,)
+            ).fetchone()
+            tokens, updated = row or (capacity, now)
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / refill_rate
+
+            conn.execute(
+                'INSERT OR REPLACE INTO throttle_bucket VALUES (?, ?, ?)',
+                (key, tokens, now)
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+        return wait == 0, wait
+
+    def clear(self):
+        self.connection.execute('DELETE FROM throttle_bucket')
+
+
+@lru_cache(maxsize=None)
+def get_bucket_store():
+    '''
+    Return the store configured by THROTTLE_BUCKET_STORE
+    '''
+    config = settings.THROTTLE_BUCKET_STORE
+    store_class = import_string(config['BACKEND'])
+
+    return store_class(**config.get('OPTIONS', {}))
+
+
+def reset_bucket_store(*, setting, **kwargs):
+    if setting == 'THROTTLE_BUCKET_STORE':
+        get_bucket_store.cache_clear()
+
+
+setting_changed.connect(reset_bucket_store)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    '''
+    Token bucket throttle, the bucket is picked by the view's
+    throttle_scope (falling back to "read" or "write" by request method)
+    and the identity returned by get_ident_key, rates come from
+    DEFAULT_THROTTLE_RATES
+    '''
+    prefix = None
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope:
+            return scope
+
+        return 'read' if request.method in SAFE_METHODS else 'write'
+
+    def get_ident_key(self, request):
+        raise NotImplementedError('.get_ident_key() must be overridden')
+
+    def allow_request(self, request, view):
+        self.wait_time = None
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        ident = self.get_ident_key(request)
+
+        if rate is None or ident is None:
+            return True
+
+        capacity, period = parse_rate(rate)
+        key = f'{self.prefix}:{scope}:{ident}'
+        allowed, self.wait_time = get_bucket_store().consume(
+            key, capacity, capacity / period, time.time()
+        )
+
+        return allowed
+
+    def wait(self):
+        return self.wait_time
+
+
+class UserBucketThrottle(TokenBucketThrottle):
+    '''
+    Throttle per authenticated user, or per client address for anonymous
+    requests
+    '''
+    prefix = 'user'
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+
+        return f'anon-{self.get_ident(request)}'
+
+
+class AuthTokenBucketThrottle(TokenBucketThrottle):
+    '''
+    Throttle per auth token, requests without a token are not limited here
+    '''
+    prefix = 'token'
+
+    def get_ident_key(self, request):
+        return getattr(request.auth, 'key', None)
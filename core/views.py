@@ -0,0 +1,174 @@
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified, StreamingHttpResponse)
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from core.models import RECIPE_IMAGE_DIR
+
+
+# content addressed files (see core.storage) never change under a name
+IMMUTABLE_NAME = re.compile(r'^(?P<digest>[0-9a-f]{64})\.\w+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+RANGE_HEADER = re.compile(r'^bytes=(?P<start>\d*)-(?P<end>\d*)$')
+CHUNK_SIZE = 64 * 1024
+# the only public part of MEDIA_ROOT
+SERVED_DIRS = (RECIPE_IMAGE_DIR,)
+
+
+def parse_range(header, size):
+    '''
+    Parse a single byte range header into an inclusive (start, end) tuple,
+    returns None when the whole file should be sent (no range, or an
+    invalid one, which RFC 9110 says to ignore) and raises ValueError
+    for unsatisfiable ranges
+    '''
+    match = RANGE_HEADER.match(header or '')
+    if not match:
+        return None
+
+    start, end = match.group('start'), match.group('end')
+    if not start and not end:
+        return None
+
+    if not start:
+        # suffix range, the last n bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError('Unsatisfiable range')
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    if end and int(end) < start:
+        return None
+
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size:
+        raise ValueError('Unsatisfiable range')
+
+    return start, end
+
+
+def iter_file_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def etag_matches(header, etag):
+    return header.strip() == '*' or etag in [
+        tag.strip() for tag in header.split(',')
+    ]
+
+
+@require_safe
+def serve_media(request, path):
+    '''
+    Serve a file below SERVED_DIRS of MEDIA_ROOT with strong ETags, cache
+    headers and single byte range support, other media (e.g. pending
+    imports) is never served.
+
+    With MEDIA_SENDFILE_HEADER set the file transfer is handed to the front
+    proxy (X-Sendfile or X-Accel-Redirect), otherwise full responses go
+    through FileResponse so the WSGI server's file_wrapper can use sendfile.
+    '''
+    path = posixpath.normpath(path).lstrip('/')
+    if not path.startswith(SERVED_DIRS):
+        raise Http404('File does not exist.')
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('File does not exist.')
+
+    try:
+        file_stat = os.stat(full_path)
+    except OSError:
+        raise Http404('File does not exist.')
+
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404('File does not exist.')
+
+    immutable = IMMUTABLE_NAME.match(os.path.basename(path))
+    if immutable:
+        etag = f'"{immutable.group("digest")}"'
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        etag = f'"{file_stat.st_mtime_ns:x}-{file_stat.st_size:x}"'
+        cache_control = f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+    headers = {
+        'ETag': etag,
+        'Cache-Control': cache_control,
+        'Last-Modified': http_date(file_stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+    }
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and etag_matches(if_none_match, etag):
+        return HttpResponseNotModified(headers=headers)
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    sendfile_header = settings.MEDIA_SENDFILE_HEADER
+    if sendfile_header:
+        # the proxy takes care of the body and of range requests
+        if sendfile_header == 'X-Accel-Redirect':
+            headers[sendfile_header] = \
+                settings.MEDIA_ACCEL_REDIRECT_PREFIX + path
+        else:
+            headers[sendfile_header] = full_path
+        return HttpResponse(content_type=content_type, headers=headers)
+
+    size = file_stat.st_size
+    if_range = request.META.get('HTTP_IF_RANGE')
+    byte_range = None
+    if not if_range or if_range == etag:
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            headers['Content-Range'] = f'bytes */{size}'
+            return HttpResponse(status=416, headers=headers)
+
+    if byte_range is None:
+        response = FileResponse(
+            open(full_path, 'rb'), content_type=content_type
+        )
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        if end == size - 1:
+            # open ended ranges can still use the file_wrapper fast path
+            f = open(full_path, 'rb')
+            f.seek(start)
+            response = FileResponse(f, content_type=content_type)
+        else:
+            response = StreamingHttpResponse(
+                iter_file_range(full_path, start, length),
+                content_type=content_type
+            )
+        response.status_code = 206
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+
+    for key, value in headers.items():
+        response[key] = value
+
+    return response
@@ -0,0 +1,68 @@
+import logging
+
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.settings import api_settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def iter_views(patterns):
+    '''
+    Yield (view class, viewset actions) for the DRF views behind
+    the URL patterns
+    '''
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_views(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            view_class = getattr(pattern.callback, 'cls', None)
+            if view_class is not None:
+                actions = getattr(pattern.callback, 'actions', None) or {}
+                yield view_class, set(actions.values())
+
+
+def serializer_classes(view_class, actions):
+    '''
+    Return the serializer classes get_serializer_class picks for the
+    actions of a view
+    '''
+    if not hasattr(view_class, 'get_serializer_class'):
+        return set()
+
+    found = set()
+    for action in actions or [None]:
+        view = view_class(action=action, request=None, format_kwarg=None)
+        try:
+            found.add(view.get_serializer_class())
+        except Exception:
+            logger.debug('No serializer for %s.%s', view_class, action)
+
+    return found
+
+
+def warm_up():
+    '''
+    Do the work the first request would otherwise pay for: populate the
+    URL resolver caches, build the fields of every serializer the views
+    use once and load the renderer and parser classes.
+    Returns the number of serializers warmed up.
+    '''
+    resolver = get_resolver()
+    # populates the lookup tables used by reverse() for all patterns
+    resolver.reverse_dict
+
+    serializers = set()
+    for view_class, actions in iter_views(resolver.url_patterns):
+        serializers |= serializer_classes(view_class, actions)
+
+    for serializer_class in serializers:
+        try:
+            serializer_class().fields
+        except Exception:
+            logger.exception('Could not warm up %s', serializer_class)
+
+    api_settings.DEFAULT_RENDERER_CLASSES
+    api_settings.DEFAULT_PARSER_CLASSES
+
+    return len(serializers)
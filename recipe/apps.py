@@ -4,3 +4,19 @@ from django.apps import AppConfig
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from core import models
+        from recipe import cache, documents, indexes, signals, similarity
+        from recipe import checks  # noqa: F401, registers the checks
+        # receivers run in this order, signatures are read from documents
+        signals.recipes_changed.connect(documents.rebuild_recipes_changed)
+        signals.recipes_changed.connect(similarity.rebuild_recipes_changed)
+        signals.recipes_changed.connect(cache.invalidate_recipes_changed)
+        signals.recipes_changed.connect(indexes.update_recipes_changed)
+
+        for model in (models.Tag, models.Ingredient):
+            post_save.connect(indexes.update_names_changed, sender=model)
+            post_delete.connect(indexes.update_names_changed, sender=model)
@@ -0,0 +1,256 @@
+from collections import defaultdict
+
+from django.db.models import Count
+
+from core import models, sharding
+from recipe.signals import send_recipes_changed
+
+
+# recipe relation -> (related model, through table column)
+RELATIONS = {
+    'tags': (models.Tag, 'tag_id'),
+    'ingredients': (models.Ingredient, 'ingredient_id'),
+}
+SCALAR_FIELDS = ['title', 'time_minutes', 'price', 'link']
+DELETE_BATCH_SIZE = 500
+
+
+def _existing_pairs(relation, pairs):
+    '''
+    Return {(recipe id, related id): through row id} for the given pairs
+    that are already in the through table
+    '''
+    through = getattr(models.Recipe, relation).through
+    column = RELATIONS[relation][1]
+
+    rows = through.objects.filter(
+        recipe_id__in={recipe_id for recipe_id, _ in pairs},
+        **{f'{column}__in': {related_id for _, related_id in pairs}}
+    ).values_list('id', 'recipe_id', column)
+
+    pairs = set(pairs)
+    return {
+        (recipe_id, related_id): row_id
+        for row_id, recipe_id, related_id in rows
+        if (recipe_id, related_id) in pairs
+    }
+
+
+def add_relations(relation, pairs):
+    '''
+    Insert the (recipe id, related id) pairs missing from the through table
+    of relation with one bulk insert, returns the inserted pairs.
+    Callers send recipes_changed.
+    '''
+    if not pairs:
+        return []
+
+    through = getattr(models.Recipe, relation).through
+    column = RELATIONS[relation][1]
+    existing = _existing_pairs(relation, pairs)
+    added = [pair for pair in dict.fromkeys(pairs) if pair not in existing]
+
+    # a concurrent add of the same pair may insert it first
+    through.objects.bulk_create(
+        (through(recipe_id=recipe_id, **{column: related_id})
+         for recipe_id, related_id in added),
+        ignore_conflicts=True
+    )
+
+    return added
+
+
+def remove_relations(relation, pairs):
+    '''
+    Delete the (recipe id, related id) pairs from the through table of
+    relation with one delete, returns the removed pairs.
+    Callers send recipes_changed.
+    '''
+    if not pairs:
+        return []
+
+    through = getattr(models.Recipe, relation).through
+    existing = _existing_pairs(relation, pairs)
+    through.objects.filter(id__in=existing.values()).delete()
+
+    return list(existing)
+
+
+def owned_ids(model, user, ids):
+    '''
+    Return the subset of ids of model rows owned by the user
+    '''
+    if not ids:
+        return set()
+
+    return set(
+        model.objects.filter(user=user, id__in=ids).values_list(
+            'id', flat=True
+        )
+    )
+
+
+def shopping_list(recipe_ids):
+    '''
+    Return the distinct ingredients of recipe_ids with the number of those
+    recipes using each, grouped in one query over the through table
+    '''
+    through = models.Recipe.ingredients.through
+
+    return list(
+        through.objects.filter(recipe_id__in=recipe_ids)
+        .values('ingredient_id', 'ingredient__name')
+        .annotate(recipes=Count('recipe_id'))
+        .order_by('ingredient__name', 'ingredient_id')
+        .values_list('ingredient_id', 'ingredient__name', 'recipes')
+    )
+
+
+def bulk_update_recipes(user, items):
+    '''
+    Apply partial updates to many recipes of the user.
+
+    Each item holds an id, any scalar fields and add_/remove_ lists of tag
+    and ingredient ids. Ownership is checked with one query per model,
+    scalar fields are written with bulk_update grouped by changed fields
+    and relation deltas with batched through table inserts and deletes.
+    Returns a {'id', 'status'} result per item.
+    '''
+    recipes = {
+        recipe.id: recipe
+        for recipe in models.Recipe.objects.filter(
+            user=user, id__in={item['id'] for item in items}
+        )
+    }
+    allowed = {
+        relation: owned_ids(model, user, {
+            related_id
+            for item in items
+            for key in (f'add_{relation}', f'remove_{relation}')
+            for related_id in item.get(key, [])
+        })
+        for relation, (model, _) in RELATIONS.items()
+    }
+
+    results = []
+    fields_to_recipes = defaultdict(list)
+    deltas = defaultdict(list)
+
+    for item in items:
+        recipe = recipes.get(item['id'])
+        if recipe is None:
+            results.append({'id': item['id'], 'status': 'not_found'})
+            continue
+
+        invalid = {
+            key: sorted(set(item[key]) - allowed[relation])
+            for relation in RELATIONS
+            for key in (f'add_{relation}', f'remove_{relation}')
+            if set(item.get(key, [])) - allowed[relation]
+        }
+        if invalid:
+            results.append({
+                'id': recipe.id, 'status': 'invalid', 'errors': invalid
+            })
+            continue
+
+        fields = tuple(field for field in SCALAR_FIELDS if field in item)
+        for field in fields:
+            setattr(recipe, field, item[field])
+        if fields:
+            fields_to_recipes[fields].append(recipe)
+
+        for relation in RELATIONS:
+            for action in ('add', 'remove'):
+                deltas[action, relation].extend(
+                    (recipe.id, related_id)
+                    for related_id in item.get(f'{action}_{relation}', [])
+                )
+
+        results.append({'id': recipe.id, 'status': 'updated'})
+
+    with sharding.atomic():
+        for fields, changed in fields_to_recipes.items():
+            models.Recipe.objects.bulk_update(changed, fields)
+
+        for (action, relation), pairs in deltas.items():
+            if action == 'add':
+                add_relations(relation, pairs)
+            else:
+                remove_relations(relation, pairs)
+
+        send_recipes_changed(
+            (result['id'] for result in results
+             if result['status'] == 'updated'),
+            [user.id]
+        )
+
+    return results
+
+
+def raw_delete(queryset):
+    '''
+    Delete the rows of queryset with a single DELETE statement, skipping
+    the collector (no cascades, no signals), callers remove dependent rows
+    and send recipes_changed
+    '''
+    # same fast path the deletion collector uses for leaf tables
+    return queryset._raw_delete(queryset.db)
+
+
+def delete_recipes(queryset, batch_size=DELETE_BATCH_SIZE):
+    '''
+    Delete the recipes of queryset in bounded batches, each batch removes
+    its through table rows and recipes in one short transaction without
+    loading model instances. Returns the deleted ids.
+    '''
+    deleted = []
+
+    while True:
+        rows = list(queryset.order_by('id').values_list('id', 'user_id')[
+            :batch_size
+        ])
+        if not rows:
+            break
+        ids = [recipe_id for recipe_id, _ in rows]
+
+        with sharding.atomic():
+            for relation in RELATIONS:
+                through = getattr(models.Recipe, relation).through
+                raw_delete(through.objects.filter(recipe_id__in=ids))
+            raw_delete(models.Recipe.objects.filter(id__in=ids))
+            send_recipes_changed(ids, {user_id for _, user_id in rows})
+
+        deleted.extend(ids)
+
+    return deleted
+
+
+def delete_related(model, queryset, batch_size=DELETE_BATCH_SIZE):
+    '''
+    Delete tags or ingredients of queryset in bounded batches together
+    with their recipe links
+    '''
+    relation, column = next(
+        (relation, column)
+        for relation, (related, column) in RELATIONS.items()
+        if related is model
+    )
+    through = getattr(models.Recipe, relation).through
+
+    while True:
+        rows = list(queryset.order_by('id').values_list('id', 'user_id')[
+            :batch_size
+        ])
+        if not rows:
+            break
+        ids = [related_id for related_id, _ in rows]
+
+        links = through.objects.filter(**{f'{column}__in': ids})
+        with sharding.atomic():
+            recipe_ids = list(links.values_list('recipe_id', flat=True))
+            raw_delete(links)
+            raw_delete(model.objects.filter(id__in=ids))
+            send_recipes_changed(
+                recipe_ids, {user_id for _, user_id in rows}
+            )
@@ -0,0 +1,166 @@
+import math
+import random
+import threading
+import time
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import sharding
+
+
+# in-process single flight, a key always maps to the same lock
+LOCK_STRIPES = [threading.Lock() for _ in range(64)]
+
+# backends whose entries and invalidations stay in one process
+PROCESS_LOCAL_BACKENDS = [
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+]
+
+
+def is_process_local():
+    return settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_BACKENDS
+
+
+def local_timeout(timeout):
+    '''
+    Cap timeout (None is forever) at RECIPE_LOCAL_CACHE_TIMEOUT when the
+    cache is process local, so other processes serve stale values for a
+    few seconds at most
+    '''
+    if not is_process_local():
+        return timeout
+
+    if timeout is None:
+        return settings.RECIPE_LOCAL_CACHE_TIMEOUT
+
+    return min(timeout, settings.RECIPE_LOCAL_CACHE_TIMEOUT)
+
+
+def version_key(recipe_id):
+    return f'recipe-version:{recipe_id}'
+
+
+def detail_key(recipe_id, version):
+    return f'recipe-detail:{recipe_id}:{version}'
+
+
+def stats_version_key(user_id):
+    return f'recipe-stats-version:{user_id}'
+
+
+def stats_key(user_id, version):
+    return f'recipe-stats:{user_id}:{version}'
+
+
+def current_version(key):
+    '''
+    Return the version stored under key. A missing (invalidated or
+    evicted) version is replaced with a new unique one, so entries cached
+    under an older version are never read again.
+    '''
+    version = cache.get(key)
+
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+
+    return version
+
+
+def get_version(recipe_id):
+    '''
+    Return the current cache version of a recipe
+    '''
+    return current_version(version_key(recipe_id))
+
+
+def get_stats_version(user_id):
+    '''
+    Return the current cache version of the user's recipe statistics
+    '''
+    return current_version(stats_version_key(user_id))
+
+
+def invalidate(keys):
+    '''
+    Delete the version keys, again once the surrounding transaction
+    commits so a reader racing the write can't keep a stale copy cached
+    '''
+    cache.delete_many(keys)
+
+    if sharding.in_atomic_block():
+        sharding.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_recipes(recipe_ids):
+    '''
+    Drop the cached details of recipe_ids
+    '''
+    invalidate([version_key(recipe_id) for recipe_id in recipe_ids])
+
+
+def invalidate_recipes_changed(sender, recipe_ids, user_ids, **kwargs):
+    keys = [version_key(recipe_id) for recipe_id in recipe_ids]
+    keys.extend(stats_version_key(user_id) for user_id in user_ids)
+    invalidate(keys)
+
+
+def should_refresh(entry, now, beta):
+    '''
+    Probabilistic early expiration (XFetch), the closer the entry is to
+    expiring and the longer it took to compute, the more likely a reader
+    refreshes it ahead of time
+    '''
+    value, delta, expires_at = entry
+    return now - delta * beta * math.log(1 - random.random()) >= expires_at
+
+
+def get_or_compute(key, compute, timeout=None):
+    '''
+    Read through cache with stampede protection, concurrent misses in a
+    process wait for one computation and across processes a cache lock
+    lets one worker compute while the others serve the stale entry or
+    wait for the fresh one
+    '''
+    timeout = local_timeout(timeout or settings.RECIPE_CACHE_TIMEOUT)
+    beta = settings.RECIPE_CACHE_EARLY_REFRESH_BETA
+
+    entry = cache.get(key)
+    if entry is not None and not should_refresh(entry, time.time(), beta):
+        return entry[0]
+
+    stripe = LOCK_STRIPES[zlib.crc32(key.encode()) % len(LOCK_STRIPES)]
+    with stripe:
+        fresh = cache.get(key)
+        if fresh is not None and fresh != entry:
+            # computed while we waited for the lock
+            return fresh[0]
+
+        lock_key = f'{key}:lock'
+        lock_timeout = settings.RECIPE_CACHE_LOCK_TIMEOUT
+        locked = cache.add(lock_key, 1, lock_timeout)
+        if not locked:
+            if entry is not None:
+                # another process is refreshing, the old entry is still valid
+                return entry[0]
+
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.01)
+                fresh = cache.get(key)
+                if fresh is not None:
+                    return fresh[0]
+
+        try:
+            start = time.monotonic()
+            value = compute()
+            delta = time.monotonic() - start
+            cache.set(key, (value, delta, time.time() + timeout), timeout)
+        finally:
+            if locked:
+                cache.delete(lock_key)
+
+    return value
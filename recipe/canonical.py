@@ -0,0 +1,41 @@
+from core import models
+
+
+def intern_names(names):
+    '''
+    Return {name key: canonical ingredient id} for names, adding the
+    missing ones to the dictionary with one insert
+    '''
+    spellings = {}
+    for name in names:
+        spellings.setdefault(
+            models.name_key(name), models.normalize_name(name)
+        )
+    if not spellings:
+        return {}
+
+    canonical = models.CanonicalIngredient.objects
+    ids = dict(
+        canonical.filter(key__in=spellings).values_list('key', 'id')
+    )
+    missing = [key for key in spellings if key not in ids]
+
+    if missing:
+        # a concurrent writer may intern the same names first
+        canonical.bulk_create(
+            (models.CanonicalIngredient(key=key, name=spellings[key])
+             for key in missing),
+            ignore_conflicts=True
+        )
+        ids.update(
+            canonical.filter(key__in=missing).values_list('key', 'id')
+        )
+
+    return ids
+
+
+def canonical_id(name):
+    '''
+    Return the canonical ingredient id of name, interning it if needed
+    '''
+    return intern_names([name])[models.name_key(name)]
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core import checks
+
+from recipe import cache
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    '''
+    Recipe cache versions and index generations are invalidated through
+    the cache, so several processes need a cache they all share
+    '''
+    if settings.WORKER_PROCESSES > 1 and cache.is_process_local():
+        return [checks.Error(
+            f'{settings.CACHES["default"]["BACKEND"]} is local to one '
+            f'process, but WORKER_PROCESSES is '
+            f'{settings.WORKER_PROCESSES}.',
+            hint='Use a shared cache backend (memcached, redis) so recipe '
+                 'cache and index invalidations reach every process.',
+            id='recipe.E001',
+        )]
+
+    return []
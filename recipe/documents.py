@@ -0,0 +1,115 @@
+from django.db.models import Prefetch
+
+from core import models, sharding
+from recipe.serializers import RecipeDetailSerializer
+
+
+def rebuild_documents(recipe_ids):
+    '''
+    Re-render the read documents of recipe_ids in one transaction,
+    documents of recipes that no longer exist are removed
+    '''
+    recipe_ids = set(recipe_ids)
+    recipes = models.Recipe.objects.filter(id__in=recipe_ids).prefetch_related(
+        Prefetch('tags', queryset=models.Tag.objects.order_by('id')),
+        Prefetch(
+            'ingredients', queryset=models.Ingredient.objects.order_by('id')
+        ),
+    )
+
+    with sharding.atomic(savepoint=False):
+        documents = [
+            models.RecipeDocument(
+                recipe_id=recipe.id,
+                user_id=recipe.user_id,
+                document=RecipeDetailSerializer(recipe).data,
+            )
+            for recipe in recipes
+        ]
+        models.RecipeDocument.objects.filter(recipe_id__in=recipe_ids).delete()
+        models.RecipeDocument.objects.bulk_create(documents)
+
+    return len(documents)
+
+
+def rebuild_recipes_changed(sender, recipe_ids, **kwargs):
+    rebuild_documents(recipe_ids)
+
+
+def list_document(document):
+    '''
+    List representation (RecipeSerializer) of a detail document,
+    tags and ingredients as ids
+    '''
+    return dict(
+        document,
+        ingredients=[item['id'] for item in document['ingredients']],
+        tags=[item['id'] for item in document['tags']],
+    )
+
+
+def get_document(recipe_id):
+    '''
+    Return (user id, document) of the recipe, building a missing document
+    first, None if there is no such recipe
+    '''
+    documents = models.RecipeDocument.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('user_id', 'document')
+
+    document = documents.first()
+    # recipes written before read documents existed have none yet
+    if document is None and rebuild_documents([recipe_id]):
+        document = documents.first()
+
+    return document
+
+
+def list_documents(rows):
+    '''
+    List representations of (recipe id, document or None) rows, building
+    the missing documents with one rebuild
+    '''
+    rows = list(rows)
+    missing = [recipe_id for recipe_id, document in rows if document is None]
+
+    if missing:
+        rebuild_documents(missing)
+        built = dict(models.RecipeDocument.objects.filter(
+            recipe_id__in=missing
+        ).values_list('recipe_id', 'document'))
+        rows = [
+            (recipe_id, built.get(recipe_id) if document is None
+             else document)
+            for recipe_id, document in rows
+        ]
+
+    # recipes deleted since the rows were read have no document
+    return [
+        list_document(document) for _, document in rows
+        if document is not None
+    ]
+
+
+def documents_by_id(user, recipe_ids):
+    '''
+    List representations of the user's recipes keyed by recipe id,
+    building the missing documents with one rebuild
+    '''
+    recipe_ids = set(recipe_ids)
+    documents = models.RecipeDocument.objects.filter(user=user)
+    docs = dict(documents.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'document'))
+
+    missing = recipe_ids - docs.keys()
+    if missing:
+        rebuild_documents(missing)
+        docs.update(documents.filter(
+            recipe_id__in=missing
+        ).values_list('recipe_id', 'document'))
+
+    return {
+        recipe_id: list_document(document)
+        for recipe_id, document in docs.items()
+    }
@@ -0,0 +1,251 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import connections, router
+
+from core import models, sharding
+from recipe.canonical import intern_names
+from recipe.serializers import RecipeImportSerializer
+from recipe.signals import send_recipes_changed
+
+
+IMPORT_FORMATS = ['ndjson', 'csv']
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportFormatError(ValueError):
+    '''
+    Raised when an import file can not be parsed at all
+    '''
+
+
+def _text_lines(stream):
+    '''
+    Wrap a binary or text stream into an iterator of text lines
+    '''
+    if isinstance(stream, io.TextIOBase):
+        return stream
+
+    return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+
+def parse_ndjson(stream):
+    '''
+    Yield (line number, row) for every non empty line of an ndjson stream,
+    row is None if the line is not a json object
+    '''
+    for line_number, line in enumerate(_text_lines(stream), start=1):
+        if not line.strip():
+            continue
+
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def _split_names(value):
+    return [name.strip() for name in (value or '').split(';')
+            if name.strip()]
+
+
+def parse_csv(stream):
+    '''
+    Yield (line number, row) for every record of a csv stream,
+    ingredients and tags are ";" separated names
+    '''
+    reader = csv.DictReader(_text_lines(stream))
+
+    if reader.fieldnames is None or 'title' not in reader.fieldnames:
+        raise ImportFormatError('CSV header must contain a "title" column.')
+
+    for row in reader:
+        row = {key: value for key, value in row.items()
+               if key is not None and value not in (None, '')}
+        row['ingredients'] = _split_names(row.get('ingredients'))
+        row['tags'] = _split_names(row.get('tags'))
+        yield reader.line_num, row
+
+
+PARSERS = {
+    'ndjson': parse_ndjson,
+    'csv': parse_csv,
+}
+
+
+class RecipeImporter:
+    '''
+    Import recipes for a user in fixed size transactional batches.
+
+    Tag and ingredient names are resolved against an in-memory name key
+    -> id map of the user's existing rows (see core.models.name_key),
+    missing ones are created once per batch with bulk_create, and recipes
+    plus their through table rows are written with bulk inserts.
+    '''
+
+    def __init__(self, user, batch_size=BATCH_SIZE):
+        self.user = user
+        self.batch_size = batch_size
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+        self.error_count = 0
+
+        self.tag_ids = self.name_ids(models.Tag, user=user)
+        self.ingredient_ids = self.name_ids(models.Ingredient, user=user)
+        self.titles = set(
+            models.Recipe.objects.filter(user=user).values_list(
+                'title', flat=True
+            )
+        )
+
+    def add_error(self, line_number, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line_number, 'errors': errors})
+
+    def validated_rows(self, rows):
+        '''
+        Validate rows and skip titles the user already has
+        '''
+        for line_number, row in rows:
+            if row is None:
+                self.add_error(line_number, ['Invalid row.'])
+                continue
+
+            serializer = RecipeImportSerializer(data=row)
+            if not serializer.is_valid():
+                self.add_error(line_number, serializer.errors)
+                continue
+
+            data = serializer.validated_data
+            if data['title'] in self.titles:
+                self.skipped += 1
+                continue
+
+            self.titles.add(data['title'])
+            yield data
+
+    @staticmethod
+    def name_ids(model, **filters):
+        return {
+            models.name_key(name): related_id
+            for name, related_id in model.objects.filter(
+                **filters
+            ).values_list('name', 'id')
+        }
+
+    def resolve_names(self, model, name_ids, names):
+        '''
+        Create the missing names of model for the user and update the
+        name key -> id map, the first spelling of a name is stored
+        '''
+        missing = {}
+        for name in names:
+            key = models.name_key(name)
+            if key not in name_ids:
+                missing.setdefault(key, models.normalize_name(name))
+        if not missing:
+            return
+
+        extra = {key: {} for key in missing}
+        if model is models.Ingredient:
+            canonical_ids = intern_names(missing.values())
+            extra = {
+                key: {'canonical_id': canonical_ids[key]} for key in missing
+            }
+
+        model.objects.bulk_create(
+            model(user=self.user, name=name, **extra[key])
+            for key, name in missing.items()
+        )
+        name_ids.update(self.name_ids(
+            model, user=self.user, name__in=missing.values()
+        ))
+
+    def create_recipes(self, batch):
+        recipes = [
+            models.Recipe(
+                user=self.user,
+                **{key: value for key, value in data.items()
+                   if key not in ('ingredients', 'tags')}
+            )
+            for data in batch
+        ]
+
+        connection = connections[router.db_for_write(models.Recipe)]
+        if connection.features.can_return_rows_from_bulk_insert:
+            return models.Recipe.objects.bulk_create(recipes)
+
+        for recipe in recipes:
+            recipe.save()
+
+        return recipes
+
+    def write_batch(self, batch):
+        with sharding.atomic():
+            self.resolve_names(
+                models.Tag, self.tag_ids,
+                [name for data in batch for name in data['tags']]
+            )
+            self.resolve_names(
+                models.Ingredient, self.ingredient_ids,
+                [name for data in batch for name in data['ingredients']]
+            )
+
+            recipes = self.create_recipes(batch)
+
+            recipe_tags = models.Recipe.tags.through
+            recipe_ingredients = models.Recipe.ingredients.through
+            recipe_tags.objects.bulk_create(
+                recipe_tags(recipe_id=recipe.id, tag_id=self.tag_ids[key])
+                for recipe, data in zip(recipes, batch)
+                for key in {models.name_key(name) for name in data['tags']}
+            )
+            recipe_ingredients.objects.bulk_create(
+                recipe_ingredients(
+                    recipe_id=recipe.id,
+                    ingredient_id=self.ingredient_ids[key]
+                )
+                for recipe, data in zip(recipes, batch)
+                for key in {
+                    models.name_key(name) for name in data['ingredients']
+                }
+            )
+            send_recipes_changed(
+                (recipe.id for recipe in recipes), [self.user.id]
+            )
+
+        self.created += len(recipes)
+
+    def run(self, rows):
+        '''
+        Import (line number, row) pairs and return a summary
+        '''
+        validated = self.validated_rows(rows)
+
+        while True:
+            batch = list(islice(validated, self.batch_size))
+            if not batch:
+                break
+            self.write_batch(batch)
+
+        return {
+            'created': self.created,
+            'skipped': self.skipped,
+            'failed': self.error_count,
+            'errors': self.errors,
+        }
+
+
+def import_recipes(user, stream, file_format, batch_size=BATCH_SIZE):
+    '''
+    Incrementally parse stream in file_format and import its recipes
+    '''
+    rows = PARSERS[file_format](stream)
+    return RecipeImporter(user, batch_size).run(rows)
@@ -0,0 +1,506 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count
+
+from core import models, sharding
+from recipe import similarity
+from recipe.cache import local_timeout
+
+
+class UserIndexes:
+    '''
+    Process local LRU of per-user in-memory indexes.
+
+    Every user has a generation number in the shared cache that is bumped
+    on each change of their recipes. A process applies its own changes to
+    its copy incrementally, copies whose generation is behind (changed by
+    another process, or evicted) are rebuilt on the next read. With a
+    process local cache generations expire after
+    RECIPE_LOCAL_CACHE_TIMEOUT, so copies are rebuilt at least that often.
+
+    index_class provides build(user_id), update(user_id, recipe_ids)
+    and discard(recipe_ids). An index is shared by the threads of the
+    process, so its queries and changes have to guard its own state.
+    '''
+
+    def __init__(self, name, index_class):
+        self.name = name
+        self.index_class = index_class
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def generation_key(self, user_id):
+        return f'{self.name}-generation:{user_id}'
+
+    def generation(self, user_id):
+        key = self.generation_key(user_id)
+        generation = cache.get(key)
+
+        if generation is None:
+            # a new unique start, copies built before an eviction are stale
+            cache.add(key, time.time_ns(), local_timeout(None))
+            generation = cache.get(key)
+
+        return generation
+
+    def get(self, user_id):
+        '''
+        Return the up to date index of the user, building it if needed
+        '''
+        generation = self.generation(user_id)
+
+        with self._lock:
+            entry = self._indexes.get(user_id)
+            if entry is not None and entry[0] == generation:
+                self._indexes.move_to_end(user_id)
+                return entry[1]
+
+        index = self.index_class.build(user_id)
+
+        with self._lock:
+            self._indexes[user_id] = (generation, index)
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > settings.RECIPE_INDEX_MAX_USERS:
+                self._indexes.popitem(last=False)
+
+        return index
+
+    def update(self, user_id, recipe_ids):
+        '''
+        Apply changed recipes of the user to the local copy and
+        bump the user's generation
+        '''
+        self.generation(user_id)
+        try:
+            generation = cache.incr(self.generation_key(user_id))
+        except ValueError:
+            # evicted in between, the next read rebuilds
+            generation = None
+
+        with self._lock:
+            entry = self._indexes.pop(user_id, None)
+            if entry is None or generation is None or \
+                    entry[0] != generation - 1:
+                return
+
+        entry[1].update(user_id, recipe_ids)
+        with self._lock:
+            self._indexes[user_id] = (generation, entry[1])
+
+    def invalidate(self, user_id):
+        '''
+        Make every process rebuild the user's index on its next read
+        '''
+        cache.delete(self.generation_key(user_id))
+
+    def discard(self, recipe_ids):
+        '''
+        Drop deleted recipes from the local copies, other processes filter
+        them out when reading the recipes of a result
+        '''
+        with self._lock:
+            entries = list(self._indexes.values())
+
+        for _, index in entries:
+            index.discard(recipe_ids)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+class PantryIndex:
+    '''
+    Inverted index from ingredient id to the ids of the user's recipes
+    using it, plus every recipe's ingredient set. Changes are applied in
+    place, so queries and changes hold the index lock.
+    '''
+
+    def __init__(self):
+        self.postings = defaultdict(set)
+        self.ingredients = {}
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def through_rows(**filters):
+        return models.Recipe.ingredients.through.objects.filter(
+            **filters
+        ).values_list('recipe_id', 'ingredient_id')
+
+    @classmethod
+    def build(cls, user_id):
+        index = cls()
+        index.add(cls.through_rows(recipe__user_id=user_id))
+        return index
+
+    def add(self, rows):
+        ingredients = defaultdict(set)
+        for recipe_id, ingredient_id in rows:
+            ingredients[recipe_id].add(ingredient_id)
+
+        for recipe_id, ingredient_ids in ingredients.items():
+            self.ingredients[recipe_id] = frozenset(ingredient_ids)
+            for ingredient_id in ingredient_ids:
+                self.postings[ingredient_id].add(recipe_id)
+
+    def discard(self, recipe_ids):
+        with self.lock:
+            for recipe_id in recipe_ids:
+                for ingredient_id in self.ingredients.pop(recipe_id, ()):
+                    self.postings[ingredient_id].discard(recipe_id)
+
+    def update(self, user_id, recipe_ids):
+        rows = list(self.through_rows(
+            recipe__user_id=user_id, recipe_id__in=recipe_ids
+        ))
+        with self.lock:
+            self.discard(recipe_ids)
+            self.add(rows)
+
+    def cookable(self, pantry, max_missing=0):
+        '''
+        Return (recipe id, missing ingredient ids, coverage) of the recipes
+        sharing an ingredient with the pantry that miss at most max_missing
+        ingredients, fully covered and best covered recipes first
+        '''
+        pantry = set(pantry)
+        covered = defaultdict(int)
+        results = []
+
+        with self.lock:
+            for ingredient_id in pantry:
+                for recipe_id in self.postings.get(ingredient_id, ()):
+                    covered[recipe_id] += 1
+
+            for recipe_id, count in covered.items():
+                ingredient_ids = self.ingredients[recipe_id]
+                if len(ingredient_ids) - count <= max_missing:
+                    results.append((
+                        recipe_id,
+                        sorted(ingredient_ids - pantry),
+                        count / len(ingredient_ids),
+                    ))
+
+        results.sort(key=lambda result: (len(result[1]), -result[2],
+                                         result[0]))
+        return results
+
+
+# odd 64 bit multipliers combining the values of a band into one hash
+BAND_WEIGHTS = np.random.RandomState(7).randint(
+    1, 2 ** 63, size=64, dtype=np.uint64
+) | np.uint64(1)
+
+
+class SimilarityIndex:
+    '''
+    LSH index over the MinHash signatures of the user's recipes.
+
+    Signatures are rows of one uint32 matrix (freed rows are reused),
+    each band of a signature is a bucket key, recipes sharing a bucket in
+    any band are candidates and are scored together with NumPy.
+    Changes are applied in place, so queries and changes hold the
+    index lock.
+    '''
+
+    def __init__(self):
+        self.bands = settings.RECIPE_LSH_BANDS
+        if settings.RECIPE_MINHASH_PERMUTATIONS % self.bands:
+            raise ImproperlyConfigured(
+                'RECIPE_MINHASH_PERMUTATIONS must be a multiple of '
+                'RECIPE_LSH_BANDS.'
+            )
+        self.matrix = np.empty(
+            (0, settings.RECIPE_MINHASH_PERMUTATIONS), dtype=np.uint32
+        )
+        self.row_ids = np.empty(0, dtype=np.int64)
+        self.rows = {}
+        self.free = []
+        # band hash -> recipe id, or a set of them once a bucket is shared
+        # (most buckets hold a single recipe)
+        self.buckets = [{} for _ in range(self.bands)]
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def signature_rows(**filters):
+        return models.RecipeSignature.objects.filter(**filters).values_list(
+            'recipe_id', 'signature'
+        )
+
+    @classmethod
+    def build(cls, user_id):
+        index = cls()
+        index.add(cls.signature_rows(user_id=user_id))
+        return index
+
+    def band_hashes(self, block):
+        '''
+        Hash every band of every signature of block into one uint64,
+        colliding bands only add candidates that score low
+        '''
+        bands = block.reshape(len(block), self.bands, -1).astype(np.uint64)
+        weights = BAND_WEIGHTS[:bands.shape[2]]
+        # wraps around on overflow, which is fine for a hash
+        return (bands * weights).sum(axis=2, dtype=np.uint64)
+
+    def band_keys(self, signature):
+        return self.band_hashes(signature[np.newaxis])[0].tolist()
+
+    def allocate(self, count):
+        '''
+        Return count free matrix rows, growing the matrix if needed
+        '''
+        missing = count - len(self.free)
+        if missing > 0:
+            size = len(self.row_ids)
+            capacity = max(2 * size, size + missing, 64)
+            self.matrix = np.resize(
+                self.matrix, (capacity, self.matrix.shape[1])
+            )
+            self.row_ids = np.resize(self.row_ids, capacity)
+            self.row_ids[size:] = -1
+            self.free.extend(range(capacity - 1, size - 1, -1))
+
+        return [self.free.pop() for _ in range(count)]
+
+    def add(self, rows):
+        width = self.matrix.shape[1]
+        recipe_ids, signatures = [], []
+        for recipe_id, signature in rows:
+            # skip signatures stored with other settings,
+            # rebuild_recipe_signatures recomputes them
+            if len(signature) == width * 4:
+                recipe_ids.append(recipe_id)
+                signatures.append(bytes(signature))
+
+        if not recipe_ids:
+            return
+
+        block = np.frombuffer(b''.join(signatures), dtype=np.uint32).reshape(
+            len(recipe_ids), width
+        )
+        allocated = self.allocate(len(recipe_ids))
+        self.matrix[allocated] = block
+        self.row_ids[allocated] = recipe_ids
+
+        self.rows.update(zip(recipe_ids, allocated))
+        keys = self.band_hashes(block).T.tolist()
+        for buckets, band_keys in zip(self.buckets, keys):
+            for recipe_id, key in zip(recipe_ids, band_keys):
+                bucket = buckets.get(key)
+                if bucket is None:
+                    buckets[key] = recipe_id
+                elif isinstance(bucket, set):
+                    bucket.add(recipe_id)
+                else:
+                    buckets[key] = {bucket, recipe_id}
+
+    def discard(self, recipe_ids):
+        with self.lock:
+            for recipe_id in recipe_ids:
+                row = self.rows.pop(recipe_id, None)
+                if row is None:
+                    continue
+
+                signature = self.matrix[row]
+                for band, key in enumerate(self.band_keys(signature)):
+                    bucket = self.buckets[band].get(key)
+                    if isinstance(bucket, set):
+                        bucket.discard(recipe_id)
+                    elif bucket == recipe_id:
+                        del self.buckets[band][key]
+                self.row_ids[row] = -1
+                self.free.append(row)
+
+    def update(self, user_id, recipe_ids):
+        rows = list(self.signature_rows(
+            user_id=user_id, recipe_id__in=recipe_ids
+        ))
+        with self.lock:
+            self.discard(recipe_ids)
+            self.add(rows)
+
+    def similar(self, recipe_id, limit=10):
+        '''
+        Return up to limit (recipe id, estimated Jaccard similarity) of the
+        recipes most similar to recipe_id, best first
+        '''
+        with self.lock:
+            row = self.rows.get(recipe_id)
+            if row is None:
+                return []
+
+            # copies, freed rows are reused once the lock is released
+            signature = self.matrix[row].copy()
+            candidates = set()
+            for band, key in enumerate(self.band_keys(signature)):
+                bucket = self.buckets[band].get(key)
+                if isinstance(bucket, set):
+                    candidates |= bucket
+                elif bucket is not None:
+                    candidates.add(bucket)
+            candidates.discard(recipe_id)
+            if not candidates:
+                return []
+
+            candidate_rows = np.fromiter(
+                (self.rows[candidate] for candidate in candidates),
+                dtype=np.int64, count=len(candidates)
+            )
+            signatures = self.matrix[candidate_rows]
+            recipe_ids = self.row_ids[candidate_rows]
+
+        scores = similarity.similarity(signatures, signature)
+
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit)[:limit]
+        else:
+            top = np.arange(len(scores))
+        recipe_ids = recipe_ids[top]
+        order = np.lexsort((recipe_ids, -scores[top]))
+
+        return [
+            (int(recipe_ids[i]), float(scores[top][i])) for i in order
+        ]
+
+
+def fold(name):
+    '''
+    Case folded name with collapsed whitespace, the autocomplete key
+    '''
+    return ' '.join(name.split()).casefold()
+
+
+class PrefixTrie:
+    '''
+    Trie over folded keys, every node keeps the size best ranked values
+    below it so a completion is one walk down the prefix
+    '''
+
+    def __init__(self, entries, size):
+        # node: (children by character, [(rank, value)])
+        self.root = ({}, [])
+        nodes = [self.root]
+
+        for key, rank, value in entries:
+            node = self.root
+            node[1].append((rank, value))
+            for char in key:
+                child = node[0].get(char)
+                if child is None:
+                    child = node[0][char] = ({}, [])
+                    nodes.append(child)
+                node = child
+                node[1].append((rank, value))
+
+        for _, top in nodes:
+            top.sort(key=lambda entry: entry[0])
+            del top[size:]
+
+    def complete(self, prefix, limit):
+        '''
+        Return up to limit values whose key starts with prefix, best first
+        '''
+        node = self.root
+        for char in prefix:
+            node = node[0].get(char)
+            if node is None:
+                return []
+
+        return [value for _, value in node[1][:limit]]
+
+
+class NameIndex:
+    '''
+    Autocomplete tries of the user's tag and ingredient names, ranked by
+    the number of recipes using them. Names change rarely and are few per
+    user, so updates rebuild the tries with one grouped query per model
+    and swap them in, queries never see a half built trie.
+    '''
+    name_models = (models.Tag, models.Ingredient)
+
+    def __init__(self):
+        self.tries = {}
+
+    @classmethod
+    def build(cls, user_id):
+        index = cls()
+        index.update(user_id, ())
+        return index
+
+    def update(self, user_id, recipe_ids):
+        size = settings.RECIPE_AUTOCOMPLETE_SIZE
+        tries = {}
+
+        for model in self.name_models:
+            rows = model.objects.filter(user_id=user_id).annotate(
+                uses=Count('recipes')
+            ).values_list('id', 'name', 'uses')
+            entries = []
+            for related_id, name, uses in rows:
+                key = fold(name)
+                entries.append((
+                    key, (-uses, key, related_id), (related_id, name, uses)
+                ))
+            tries[model] = PrefixTrie(entries, size)
+
+        self.tries = tries
+
+    def discard(self, recipe_ids):
+        # usage counts catch up on the owner's update
+        pass
+
+    def complete(self, model, prefix, limit):
+        '''
+        Return up to limit (id, name, uses) of model whose folded name
+        starts with the folded prefix, most used first
+        '''
+        return self.tries[model].complete(fold(prefix), limit)
+
+
+pantry_indexes = UserIndexes('pantry-index', PantryIndex)
+similarity_indexes = UserIndexes('similarity-index', SimilarityIndex)
+name_indexes = UserIndexes('name-index', NameIndex)
+
+REGISTRIES = [pantry_indexes, similarity_indexes, name_indexes]
+
+
+def apply_changes(recipe_ids, user_ids):
+    recipe_ids = set(recipe_ids)
+    by_user = {user_id: set() for user_id in user_ids}
+    for recipe_id, user_id in models.Recipe.objects.filter(
+        id__in=recipe_ids
+    ).values_list('id', 'user_id'):
+        by_user.setdefault(user_id, set()).add(recipe_id)
+
+    deleted = recipe_ids.difference(*by_user.values())
+    for registry in REGISTRIES:
+        if deleted:
+            registry.discard(deleted)
+        # users that only lost recipes still get a new generation
+        for user_id, user_recipe_ids in by_user.items():
+            registry.update(user_id, user_recipe_ids)
+
+
+def update_recipes_changed(sender, recipe_ids, user_ids, **kwargs):
+    '''
+    Apply changes once they are committed, so no index ever holds
+    rolled back writes
+    '''
+    recipe_ids, user_ids = set(recipe_ids), set(user_ids)
+    sharding.on_commit(lambda: apply_changes(recipe_ids, user_ids))
+
+
+def update_names_changed(sender, instance, **kwargs):
+    '''
+    Tag and ingredient post_save and post_delete receiver, names without
+    recipes change the user's name index without any recipes_changed
+    '''
+    user_id = instance.user_id
+    sharding.on_commit(lambda: name_indexes.update(user_id, set()))
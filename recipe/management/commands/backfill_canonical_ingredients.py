@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+
+from core import models, sharding
+from recipe.canonical import intern_names
+from recipe.signals import send_recipes_changed
+
+
+class Command(BaseCommand):
+    help = 'Point ingredients without a canonical ingredient at the ' \
+           'shared dictionary, interning their names'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of ingredients updated per transaction'
+        )
+
+    def backfill(self, batch_size):
+        ingredients = models.Ingredient.objects.filter(
+            canonical__isnull=True
+        ).order_by('id')
+        through = models.Recipe.ingredients.through
+
+        updated = 0
+        last_id = 0
+        while True:
+            rows = list(ingredients.filter(id__gt=last_id).values_list(
+                'id', 'name', 'user_id'
+            )[:batch_size])
+            if not rows:
+                break
+
+            canonical_ids = intern_names(name for _, name, _ in rows)
+            with sharding.atomic():
+                models.Ingredient.objects.bulk_update([
+                    models.Ingredient(
+                        id=ingredient_id,
+                        canonical_id=canonical_ids[models.name_key(name)]
+                    )
+                    for ingredient_id, name, _ in rows
+                ], ['canonical'])
+                # the canonical id is part of the recipe documents
+                send_recipes_changed(
+                    through.objects.filter(
+                        ingredient_id__in=[row[0] for row in rows]
+                    ).values_list('recipe_id', flat=True),
+                    {user_id for _, _, user_id in rows}
+                )
+
+            updated += len(rows)
+            last_id = rows[-1][0]
+
+        return updated
+
+    def handle(self, *args, **options):
+        updated = 0
+        for alias in sharding.shard_aliases():
+            with sharding.use_shard(alias):
+                updated += self.backfill(options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Linked {updated} ingredients to '
+            f'{models.CanonicalIngredient.objects.count()} canonical '
+            f'ingredients.'
+        ))
@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.sharding import use_shard, user_shard
+from recipe import importers
+
+
+class Command(BaseCommand):
+    help = 'Import recipes for a user from an ndjson or csv file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the owning user')
+        parser.add_argument('path', help='Path of the ndjson or csv file')
+        parser.add_argument(
+            '--type',
+            choices=importers.IMPORT_FORMATS,
+            help='File type, guessed from the file extension by default'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=importers.BATCH_SIZE,
+            help='Number of recipes written per transaction'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'User "{options["email"]}" does not exist.')
+
+        path = options['path']
+        file_format = options['type'] or path.rsplit('.', 1)[-1].lower()
+        if file_format not in importers.IMPORT_FORMATS:
+            raise CommandError(f'Unsupported import type "{file_format}".')
+
+        importer = importers.RecipeImporter(user, options['batch_size'])
+        with open(path, 'rb') as stream, use_shard(user_shard(user)):
+            try:
+                summary = importer.run(importers.PARSERS[file_format](stream))
+            except (importers.ImportFormatError, UnicodeDecodeError) as e:
+                # batches written before the error stay imported
+                raise CommandError(
+                    f'{e} ({importer.created} recipes were imported '
+                    f'before the error)'
+                )
+
+        for error in summary['errors']:
+            self.stderr.write(f'line {error["line"]}: {error["errors"]}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {summary["created"]}, skipped {summary["skipped"]}, '
+            f'failed {summary["failed"]} recipes.'
+        ))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from core.sharding import shard_aliases, use_shard
+from recipe.indexes import similarity_indexes
+from recipe.similarity import rebuild_signatures
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the MinHash signatures of the similar recipes index ' \
+           'from the recipe read documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of recipes rebuilt per transaction'
+        )
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Only build signatures for recipes that have none'
+        )
+
+    def rebuild(self, options):
+        recipes = Recipe.objects.order_by('id')
+        if options['missing']:
+            recipes = recipes.filter(signature__isnull=True)
+
+        rebuilt = 0
+        last_id = 0
+        while True:
+            ids = list(recipes.filter(id__gt=last_id).values_list(
+                'id', flat=True
+            )[:options['batch_size']])
+            if not ids:
+                break
+
+            rebuilt += rebuild_signatures(ids)
+            last_id = ids[-1]
+
+        # processes holding an index built from the old signatures
+        for user_id in recipes.values_list('user_id', flat=True).distinct():
+            similarity_indexes.invalidate(user_id)
+
+        return rebuilt
+
+    def handle(self, *args, **options):
+        rebuilt = 0
+        for alias in shard_aliases():
+            with use_shard(alias):
+                rebuilt += self.rebuild(options)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {rebuilt} recipe signatures.'
+        ))
@@ -1,3 +1,5 @@
+from collections import Counter
+from django.conf import settings
 from rest_framework import serializers
 from core import models
 
@@ -9,13 +11,19 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
         read_only_fields = ['id']
 
+    def validate_name(self, value):
+        return models.normalize_name(value)
+
 
 class IngredientSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = models.Ingredient
-        fields = ['id', 'name']
-        read_only_fields = ['id']
+        fields = ['id', 'name', 'canonical']
+        read_only_fields = ['id', 'canonical']
+
+    def validate_name(self, value):
+        return models.normalize_name(value)
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -53,4 +61,141 @@ class RecipeImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Recipe
         fields = ['id', 'image']
-        read_only_fields = ['id']
\ No newline at end of file
+        read_only_fields = ['id']
+
+
+class RecipeImportSerializer(serializers.ModelSerializer):
+    '''
+    Serializer for a single row of a recipe import file,
+    ingredients and tags are given by name
+    '''
+    ingredients = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        required=False,
+        default=list
+    )
+    tags = serializers.ListField(
+        child=serializers.CharField(max_length=30),
+        required=False,
+        default=list
+    )
+
+    class Meta:
+        model = models.Recipe
+        fields = ['title', 'ingredients', 'tags',
+                  'time_minutes', 'price', 'link']
+
+
+class RecipeBulkUpdateListSerializer(serializers.ListSerializer):
+    '''
+    Serializer for the list of a bulk recipe update,
+    every recipe can be changed by one item only
+    '''
+
+    def validate(self, attrs):
+        counts = Counter(item['id'] for item in attrs)
+        duplicates = sorted(id for id, count in counts.items() if count > 1)
+        if duplicates:
+            raise serializers.ValidationError(
+                f'Recipes can only be updated once per request, '
+                f'repeated ids: {duplicates}'
+            )
+
+        return attrs
+
+
+class RecipeBulkUpdateSerializer(serializers.ModelSerializer):
+    '''
+    Serializer for one item of a bulk recipe update,
+    tags and ingredients are changed by add/remove id lists
+    '''
+    id = serializers.IntegerField()
+    add_tags = serializers.ListField(child=serializers.IntegerField())
+    remove_tags = serializers.ListField(child=serializers.IntegerField())
+    add_ingredients = serializers.ListField(
+        child=serializers.IntegerField()
+    )
+    remove_ingredients = serializers.ListField(
+        child=serializers.IntegerField()
+    )
+
+    class Meta:
+        model = models.Recipe
+        fields = ['id', 'title', 'time_minutes', 'price', 'link',
+                  'add_tags', 'remove_tags',
+                  'add_ingredients', 'remove_ingredients']
+        list_serializer_class = RecipeBulkUpdateListSerializer
+
+    def validate(self, attrs):
+        # the update is partial for the fields, not for the recipe id
+        if 'id' not in attrs:
+            raise serializers.ValidationError(
+                {'id': self.fields['id'].error_messages['required']}
+            )
+
+        return attrs
+
+
+class RecipeTagIdsSerializer(serializers.Serializer):
+    '''
+    Serializer for the tag ids added to or removed from a recipe
+    '''
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False
+    )
+
+
+class RecipeIngredientIdsSerializer(serializers.Serializer):
+    '''
+    Serializer for the ingredient ids added to or removed from a recipe
+    '''
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False
+    )
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    '''
+    Serializer for a list of recipe ids
+    '''
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False
+    )
+
+
+class RecipePantrySerializer(serializers.Serializer):
+    '''
+    Serializer for the "what can I cook" query parameters,
+    ingredients are comma separated ids
+    '''
+    ingredients = serializers.CharField()
+    max_missing = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=500, default=50)
+
+    def validate_ingredients(self, value):
+        try:
+            return {int(id) for id in value.split(',') if id.strip()}
+        except ValueError:
+            raise serializers.ValidationError(
+                'Expected comma separated ingredient ids.'
+            )
+
+
+class NameAutocompleteSerializer(serializers.Serializer):
+    '''
+    Serializer for the tag and ingredient autocomplete query parameters
+    '''
+    prefix = serializers.CharField(max_length=255)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=settings.RECIPE_AUTOCOMPLETE_SIZE, default=10
+    )
+
+
+class RecipeSimilarSerializer(serializers.Serializer):
+    '''
+    Serializer for the similar recipes query parameters
+    '''
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
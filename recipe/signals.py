@@ -0,0 +1,83 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import Signal, receiver
+
+from core import models
+
+
+# Sent with recipe_ids, and the ids of the users owning them, whenever the
+# rendered form of those recipes may have changed (recipe fields,
+# tag/ingredient links or names, deletion). Model signals are translated
+# below, code writing with bulk queries (recipe.bulk, recipe.importers)
+# sends it itself.
+recipes_changed = Signal()
+
+
+def send_recipes_changed(recipe_ids, user_ids):
+    recipe_ids = set(recipe_ids)
+    if recipe_ids:
+        recipes_changed.send(
+            sender=models.Recipe,
+            recipe_ids=recipe_ids,
+            user_ids=set(user_ids),
+        )
+
+
+@receiver(post_save, sender=models.Recipe)
+@receiver(post_delete, sender=models.Recipe)
+def recipe_saved_or_deleted(sender, instance, **kwargs):
+    send_recipes_changed([instance.pk], [instance.user_id])
+
+
+def relation_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            send_recipes_changed([instance.pk], [instance.user_id])
+        return
+
+    # instance is the tag or ingredient, pk_set the recipe ids
+    if action == 'pre_clear':
+        instance._cleared_recipe_ids = list(
+            instance.recipes.values_list('id', flat=True)
+        )
+    elif action == 'post_clear':
+        send_recipes_changed(
+            instance.__dict__.pop('_cleared_recipe_ids', []),
+            [instance.user_id]
+        )
+    elif action in ('post_add', 'post_remove'):
+        send_recipes_changed(pk_set, [instance.user_id])
+
+
+m2m_changed.connect(relation_changed, sender=models.Recipe.tags.through)
+m2m_changed.connect(
+    relation_changed, sender=models.Recipe.ingredients.through
+)
+
+
+@receiver(post_save, sender=models.Tag)
+@receiver(post_save, sender=models.Ingredient)
+def related_saved(sender, instance, created, **kwargs):
+    if not created:
+        send_recipes_changed(
+            instance.recipes.values_list('id', flat=True),
+            [instance.user_id]
+        )
+
+
+@receiver(pre_delete, sender=models.Tag)
+@receiver(pre_delete, sender=models.Ingredient)
+def related_deleting(sender, instance, **kwargs):
+    # the links are gone by post_delete, remember the recipes
+    instance._deleted_recipe_ids = list(
+        instance.recipes.values_list('id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=models.Tag)
+@receiver(post_delete, sender=models.Ingredient)
+def related_deleted(sender, instance, **kwargs):
+    send_recipes_changed(
+        instance.__dict__.pop('_deleted_recipe_ids', []),
+        [instance.user_id]
+    )
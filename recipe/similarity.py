@@ -0,0 +1,93 @@
+import zlib
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+
+from core import models, sharding
+
+
+# 2 ** 32 - 5, keeps every hash value within uint32
+PRIME = np.uint64(4294967291)
+EMPTY = np.iinfo(np.uint32).max
+SEED = 42
+
+
+@lru_cache(maxsize=None)
+def permutations(count):
+    '''
+    The (a, b) coefficients of the count universal hash functions,
+    fixed by SEED so stored signatures stay comparable across processes
+    '''
+    state = np.random.RandomState(SEED)
+    a = state.randint(1, 2 ** 32 - 5, size=count, dtype=np.uint64)
+    b = state.randint(0, 2 ** 32 - 5, size=count, dtype=np.uint64)
+    return a, b
+
+
+def features(document):
+    '''
+    The set a recipe is compared by, its ingredient and tag ids
+    '''
+    return [f'i{item["id"]}' for item in document['ingredients']] + \
+        [f't{item["id"]}' for item in document['tags']]
+
+
+def minhash(tokens, count=None):
+    '''
+    Return the MinHash signature of tokens as a uint32 array,
+    None for an empty set
+    '''
+    if not tokens:
+        return None
+
+    a, b = permutations(count or settings.RECIPE_MINHASH_PERMUTATIONS)
+    values = np.array(
+        [zlib.crc32(token.encode()) for token in set(tokens)],
+        dtype=np.uint64
+    )
+    # a * x + b stays below 2 ** 64 for 32 bit a, b and x
+    hashes = (np.outer(values, a) + b) % PRIME
+
+    return hashes.min(axis=0).astype(np.uint32)
+
+
+def rebuild_signatures(recipe_ids):
+    '''
+    Recompute the signatures of recipe_ids from their read documents,
+    recipes without ingredients and tags get none
+    '''
+    recipe_ids = set(recipe_ids)
+    rows = models.RecipeDocument.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'user_id', 'document')
+
+    signatures = []
+    for recipe_id, user_id, document in rows:
+        signature = minhash(features(document))
+        if signature is not None:
+            signatures.append(models.RecipeSignature(
+                recipe_id=recipe_id,
+                user_id=user_id,
+                signature=signature.tobytes(),
+            ))
+
+    with sharding.atomic(savepoint=False):
+        models.RecipeSignature.objects.filter(
+            recipe_id__in=recipe_ids
+        ).delete()
+        models.RecipeSignature.objects.bulk_create(signatures)
+
+    return len(signatures)
+
+
+def rebuild_recipes_changed(sender, recipe_ids, **kwargs):
+    rebuild_signatures(recipe_ids)
+
+
+def similarity(matrix, signature):
+    '''
+    Estimated Jaccard similarity of every row of matrix to signature,
+    the share of equal MinHash values
+    '''
+    return (matrix == signature).mean(axis=1)
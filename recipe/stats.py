@@ -0,0 +1,114 @@
+import numpy as np
+from django.conf import settings
+
+from core import models
+from recipe import cache
+
+
+PERCENTILES = [25, 50, 75, 90, 99]
+
+
+def _round(values):
+    return np.round(values, 4).tolist()
+
+
+def distribution(values):
+    '''
+    Summary statistics and histogram of a 1d array
+    '''
+    if not len(values):
+        return {'count': 0}
+
+    counts, edges = np.histogram(values, bins=settings.RECIPE_STATS_BINS)
+    percentiles = np.percentile(values, PERCENTILES)
+
+    return {
+        'count': len(values),
+        'min': _round(values.min()),
+        'max': _round(values.max()),
+        'mean': _round(values.mean()),
+        'std': _round(values.std()),
+        'percentiles': dict(zip(
+            [f'p{p}' for p in PERCENTILES], _round(percentiles)
+        )),
+        'histogram': {'edges': _round(edges), 'counts': counts.tolist()},
+    }
+
+
+def breakdown(recipe_ids, prices, times, rows):
+    '''
+    Per related object (tag or ingredient) recipe count and mean price and
+    time, from (recipe id, related id, name) rows, most used first
+    '''
+    if not rows:
+        return []
+
+    row_recipes, related_ids, names = zip(*rows)
+    positions = np.searchsorted(recipe_ids, row_recipes)
+    ids, inverse = np.unique(related_ids, return_inverse=True)
+    counts = np.bincount(inverse)
+    mean_prices = np.bincount(inverse, weights=prices[positions]) / counts
+    mean_times = np.bincount(inverse, weights=times[positions]) / counts
+    names = dict(zip(related_ids, names))
+
+    order = np.lexsort((ids, -counts))[:settings.RECIPE_STATS_TOP]
+    return [
+        {
+            'id': int(ids[i]),
+            'name': names[ids[i]],
+            'recipes': int(counts[i]),
+            'mean_price': _round(mean_prices[i]),
+            'mean_time_minutes': _round(mean_times[i]),
+        }
+        for i in order
+    ]
+
+
+def compute_stats(user_id):
+    '''
+    Price, time and cost per minute distributions of the user's recipes
+    and their breakdown per tag and ingredient, computed on columnar
+    arrays with three queries
+    '''
+    columns = list(models.Recipe.objects.filter(user_id=user_id).order_by(
+        'id'
+    ).values_list('id', 'price', 'time_minutes'))
+
+    if columns:
+        recipe_ids, prices, times = (np.array(column) for column in zip(
+            *columns
+        ))
+        prices = prices.astype(np.float64)
+        times = times.astype(np.float64)
+    else:
+        recipe_ids, prices, times = (np.empty(0) for _ in range(3))
+
+    timed = times > 0
+    relations = {}
+    for relation, field in [('tags', 'tag'), ('ingredients', 'ingredient')]:
+        through = getattr(models.Recipe, relation).through
+        rows = list(
+            through.objects.filter(recipe__user_id=user_id).values_list(
+                'recipe_id', f'{field}_id', f'{field}__name'
+            )
+        )
+        relations[relation] = breakdown(recipe_ids, prices, times, rows)
+
+    return {
+        'count': len(recipe_ids),
+        'price': distribution(prices),
+        'time_minutes': distribution(times),
+        'cost_per_minute': distribution(prices[timed] / times[timed]),
+        **relations,
+    }
+
+
+def recipe_stats(user_id):
+    '''
+    Cached statistics of the user's recipes, invalidated by every
+    recipes_changed of the user (see recipe.cache)
+    '''
+    return cache.get_or_compute(
+        cache.stats_key(user_id, cache.get_stats_version(user_id)),
+        lambda: compute_stats(user_id)
+    )
@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+
+from core.jobs import job
+from core.storage import upload_storage
+from recipe import importers
+
+
+def remove_upload(user_id, path, file_format):
+    '''
+    Remove the upload of an import that failed its last attempt
+    '''
+    upload_storage().delete(path)
+
+
+@job('recipe.import_recipes', on_failure=remove_upload)
+def import_recipes_job(user_id, path, file_format):
+    '''
+    Import an uploaded file saved in the upload storage,
+    the file is removed once imported or failed for good
+    '''
+    user = get_user_model().objects.get(id=user_id)
+
+    with upload_storage().open(path, 'rb') as stream:
+        summary = importers.import_recipes(user, stream, file_format)
+
+    upload_storage().delete(path)
+
+    return summary
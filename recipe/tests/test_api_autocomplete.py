@@ -0,0 +1,112 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.indexes import PrefixTrie, name_indexes
+
+
+TAGS_AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
+INGREDIENTS_AUTOCOMPLETE_URL = reverse('recipe:ingredient-autocomplete')
+
+
+def sample_user(email='test@test.com'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password='test123',
+    )
+
+
+class PrefixTrieTests(TestCase):
+    databases = '__all__'
+
+    def test_complete(self):
+        '''Test completions are ranked and limited per prefix'''
+        trie = PrefixTrie([
+            ('salt', 2, 'salt'),
+            ('sage', 1, 'sage'),
+            ('sugar', 3, 'sugar'),
+            ('egg', 0, 'egg'),
+        ], size=2)
+
+        self.assertEqual(trie.complete('s', 10), ['sage', 'salt'])
+        self.assertEqual(trie.complete('su', 10), ['sugar'])
+        self.assertEqual(trie.complete('', 1), ['egg'])
+        self.assertEqual(trie.complete('x', 10), [])
+
+
+class AutocompleteAPITests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        name_indexes.clear()
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url=TAGS_AUTOCOMPLETE_URL, **params):
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [(item['name'], item['uses']) for item in res.data]
+
+    def test_ranked_by_usage(self):
+        '''
+        Test matching names are case insensitive and most used first
+        '''
+        vegan, vegetarian = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ['Vegan', 'vegetarian']
+        ]
+        Tag.objects.create(user=self.user, name='dessert')
+        for title in ['salad', 'soup']:
+            recipe = Recipe.objects.create(user=self.user, title=title)
+            recipe.tags.add(vegetarian)
+
+        self.assertEqual(
+            self.get(prefix='VEG'), [('vegetarian', 2), ('Vegan', 0)]
+        )
+        self.assertEqual(self.get(prefix='veg', limit=1), [('vegetarian', 2)])
+
+    def test_limited_to_user_and_model(self):
+        '''
+        Test other users' names and the other model are not completed
+        '''
+        Tag.objects.create(user=sample_user('other@test.com'), name='salty')
+        Ingredient.objects.create(user=self.user, name='salt')
+
+        self.assertEqual(self.get(prefix='sal'), [])
+        self.assertEqual(
+            self.get(INGREDIENTS_AUTOCOMPLETE_URL, prefix='sal'),
+            [('salt', 0)]
+        )
+
+    def test_index_updated_on_change(self):
+        '''
+        Test created, renamed and deleted names show up in the
+        next completion
+        '''
+        self.assertEqual(self.get(prefix='s'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag = Tag.objects.create(user=self.user, name='spicy')
+        self.assertEqual(self.get(prefix='s'), [('spicy', 0)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name = 'sweet'
+            tag.save()
+        self.assertEqual(self.get(prefix='sp'), [])
+        self.assertEqual(self.get(prefix='sw'), [('sweet', 0)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.delete()
+        self.assertEqual(self.get(prefix='s'), [])
+
+    def test_missing_prefix_fail(self):
+        '''Test the prefix is required'''
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,16 +1,21 @@
+from io import StringIO
+from unittest.mock import patch
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import QuerySet
 from django.test import TestCase
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Ingredient, Recipe
+from core.models import CanonicalIngredient, Ingredient, Recipe
 from recipe.serializers import IngredientSerializer
 
 from django.urls import reverse
 
 
 INGREDIENTS_URL = reverse('recipe:ingredient-list')
+RECIPE_URL = reverse('recipe:recipe-list')
 
 
 def sample_user(email='sample@test.com',
@@ -24,6 +29,7 @@ def sample_user(email='sample@test.com',
 
 
 class PublicIngredientAPITests(TestCase):
+    databases = '__all__'
 
     def setUp(self):
         self.client = APIClient()
@@ -39,6 +45,7 @@ class PublicIngredientAPITests(TestCase):
 
 
 class PrivateIngredientsAPITests(TestCase):
+    databases = '__all__'
 
     def setUp(self):
 
@@ -123,8 +130,24 @@ class PrivateIngredientsAPITests(TestCase):
         }
         Ingredient.objects.create(**payload)
 
-        with self.assertRaises(ValueError):
-            self.client.post(INGREDIENTS_URL, payload)
+        res = self.client.post(INGREDIENTS_URL, {'name': 'Ingredient 1'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            Ingredient.objects.filter(user=self.user).count(), 1
+        )
+
+    def test_creating_ingredient_losing_race_fail(self):
+        '''
+        Test a name created concurrently after the duplicate check
+        fails with a 400
+        '''
+        Ingredient.objects.create(name='salt', user=self.user)
+
+        with patch.object(QuerySet, 'exists', return_value=False):
+            res = self.client.post(INGREDIENTS_URL, {'name': 'Salt'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_return_assinged_ingredients_only(self):
         '''
@@ -162,3 +185,72 @@ class PrivateIngredientsAPITests(TestCase):
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+
+class CanonicalIngredientsTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_users_share_canonical_ingredient(self):
+        '''
+        Test each user's spelling of a name links to one canonical
+        ingredient
+        '''
+        other = APIClient()
+        other.force_authenticate(sample_user('other@test.com'))
+
+        res1 = self.client.post(INGREDIENTS_URL, {'name': 'Sea  Salt'})
+        res2 = other.post(INGREDIENTS_URL, {'name': 'sea salt'})
+
+        self.assertEqual(res1.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res2.status_code, status.HTTP_201_CREATED)
+        self.assertIsNotNone(res1.data['canonical'])
+        self.assertEqual(res1.data['canonical'], res2.data['canonical'])
+
+        canonical = CanonicalIngredient.objects.get()
+        self.assertEqual(canonical.key, 'sea salt')
+        self.assertEqual(canonical.name, 'Sea Salt')
+
+    def test_filter_recipes_by_canonical_ingredient(self):
+        '''
+        Test filtering recipes by canonical ingredient id
+        '''
+        salt = self.client.post(INGREDIENTS_URL, {'name': 'salt'}).data
+        flour = self.client.post(INGREDIENTS_URL, {'name': 'flour'}).data
+        recipe1 = Recipe.objects.create(title='recipe1', user=self.user)
+        recipe1.ingredients.add(salt['id'])
+        recipe2 = Recipe.objects.create(title='recipe2', user=self.user)
+        recipe2.ingredients.add(flour['id'])
+
+        res = self.client.get(
+            RECIPE_URL, {'canonical_ingredients': salt['canonical']}
+        )
+
+        self.assertEqual(
+            [recipe['title'] for recipe in res.data], ['recipe1']
+        )
+
+    def test_backfill_command(self):
+        '''
+        Test the backfill links ingredients created without a
+        canonical ingredient
+        '''
+        ingredient1 = Ingredient.objects.create(name='Salt', user=self.user)
+        ingredient2 = Ingredient.objects.create(
+            name='salt', user=sample_user('other@test.com')
+        )
+
+        call_command(
+            'backfill_canonical_ingredients', '--batch-size', '1',
+            stdout=StringIO()
+        )
+
+        ingredient1.refresh_from_db()
+        ingredient2.refresh_from_db()
+        self.assertIsNotNone(ingredient1.canonical_id)
+        self.assertEqual(ingredient1.canonical_id, ingredient2.canonical_id)
+        self.assertEqual(CanonicalIngredient.objects.get().name, 'Salt')
@@ -35,6 +35,7 @@ class PublicRecipeAPITests(TestCase):
     '''
     Tests for public api recipe
     '''
+    databases = '__all__'
     
     def setUp(self):
         self.client = APIClient()
@@ -66,6 +67,7 @@ class PublicRecipeAPITests(TestCase):
 
 
 class PrivateRecipeAPITests(TestCase):
+    databases = '__all__'
 
     def setUp(self):
         self.user = get_user_model().objects.create_user(
@@ -186,6 +188,17 @@ class PrivateRecipeAPITests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_recipe_duplicate_title_fail(self):
+        '''
+        Test creating a recipe with a title the user already used fail
+        '''
+        Recipe.objects.create(title='recipe 1', user=self.user)
+
+        res = self.client.post(RECIPE_URL, {'title': 'recipe 1'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 1)
+
     def test_create_recipe_with_ingredient(self):
         '''
         Test creating recipe with ingredients success
@@ -273,6 +286,8 @@ class RecipeImageTests(TestCase):
     '''
     Test recipe image field
     '''
+    databases = '__all__'
+
     def setUp(self):
         self.client = APIClient()
         self.user = sample_user()
@@ -321,7 +336,7 @@ class RecipeImageTests(TestCase):
         recipe3 = Recipe.objects.create(title='recipe 3', user=self.user)
 
         tag1 = Tag.objects.create(name='tag 1', user=self.user)
-        tag2 = Tag.objects.create(name='tag 1', user=self.user)
+        tag2 = Tag.objects.create(name='tag 2', user=self.user)
 
         recipe1.tags.add(tag1)
         recipe2.tags.add(tag2)
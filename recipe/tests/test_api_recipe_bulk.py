@@ -0,0 +1,317 @@
+from decimal import Decimal
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Recipe, Ingredient, Tag
+from recipe import bulk
+
+
+BULK_UPDATE_URL = reverse('recipe:recipe-bulk-update')
+
+
+def sample_user(email='test@test.com'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password='test123',
+    )
+
+
+class RecipeBulkUpdateTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.recipe_1 = Recipe.objects.create(title='recipe 1', user=self.user)
+        self.recipe_2 = Recipe.objects.create(title='recipe 2', user=self.user)
+        self.tag_1 = Tag.objects.create(name='tag 1', user=self.user)
+        self.tag_2 = Tag.objects.create(name='tag 2', user=self.user)
+        self.ingredient = Ingredient.objects.create(
+            name='salt', user=self.user
+        )
+
+    def test_bulk_update_scalar_fields(self):
+        '''
+        Test updating scalar fields of many recipes at once
+        '''
+        payload = [
+            {'id': self.recipe_1.id, 'price': '2.50'},
+            {'id': self.recipe_2.id, 'time_minutes': 42, 'title': 'new'},
+        ]
+
+        res = self.client.patch(BULK_UPDATE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': self.recipe_1.id, 'status': 'updated'},
+            {'id': self.recipe_2.id, 'status': 'updated'},
+        ])
+        self.recipe_1.refresh_from_db()
+        self.recipe_2.refresh_from_db()
+        self.assertEqual(self.recipe_1.price, Decimal('2.50'))
+        self.assertEqual(self.recipe_1.time_minutes, 10)
+        self.assertEqual(self.recipe_2.time_minutes, 42)
+        self.assertEqual(self.recipe_2.title, 'new')
+
+    def test_bulk_update_relation_deltas(self):
+        '''
+        Test adding and removing tags and ingredients by id
+        '''
+        self.recipe_1.tags.add(self.tag_1)
+        payload = [
+            {'id': self.recipe_1.id,
+             'add_tags': [self.tag_1.id, self.tag_2.id],
+             'add_ingredients': [self.ingredient.id]},
+            {'id': self.recipe_2.id, 'remove_tags': [self.tag_1.id]},
+        ]
+
+        res = self.client.patch(BULK_UPDATE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(self.recipe_1.tags.all()), {self.tag_1, self.tag_2}
+        )
+        self.assertEqual(
+            list(self.recipe_1.ingredients.all()), [self.ingredient]
+        )
+        self.assertEqual(self.recipe_2.tags.count(), 0)
+
+    def test_bulk_update_other_users_rows(self):
+        '''
+        Test recipes and tags of other users are not touched
+        '''
+        other = sample_user('other@test.com')
+        other_recipe = Recipe.objects.create(title='other', user=other)
+        other_tag = Tag.objects.create(name='other', user=other)
+        payload = [
+            {'id': other_recipe.id, 'title': 'hacked'},
+            {'id': self.recipe_1.id, 'add_tags': [other_tag.id]},
+        ]
+
+        res = self.client.patch(BULK_UPDATE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['status'], 'not_found')
+        self.assertEqual(res.data[1]['status'], 'invalid')
+        self.assertEqual(
+            res.data[1]['errors'], {'add_tags': [other_tag.id]}
+        )
+        other_recipe.refresh_from_db()
+        self.assertEqual(other_recipe.title, 'other')
+        self.assertEqual(self.recipe_1.tags.count(), 0)
+
+    def test_bulk_update_invalid_payload_fail(self):
+        '''
+        Test invalid items fail the whole request
+        '''
+        payload = [{'id': self.recipe_1.id, 'time_minutes': 'soon'}]
+
+        res = self.client.patch(BULK_UPDATE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update_missing_id_fail(self):
+        '''
+        Test every item needs the id of its recipe
+        '''
+        payload = [{'id': self.recipe_1.id}, {'title': 'new'}]
+
+        res = self.client.patch(BULK_UPDATE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data[1])
+
+    def test_bulk_update_repeated_id_fail(self):
+        '''
+        Test a recipe can not be updated by several items
+        '''
+        payload = [
+            {'id': self.recipe_1.id, 'title': 'new'},
+            {'id': self.recipe_1.id, 'title': 'newer'},
+        ]
+
+        res = self.client.patch(BULK_UPDATE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe_1.refresh_from_db()
+        self.assertEqual(self.recipe_1.title, 'recipe 1')
+
+    def test_bulk_update_query_count(self):
+        '''
+        Test the number of queries does not grow with the number of recipes
+        '''
+        def run(recipes):
+            payload = [
+                {'id': recipe.id, 'price': '1.00',
+                 'add_tags': [self.tag_1.id]}
+                for recipe in recipes
+            ]
+            with self.assertNumQueries(num_queries):
+                self.client.patch(BULK_UPDATE_URL, payload, format='json')
+
+        # ownership of recipes and tags, a savepoint pair, bulk_update,
+        # existing through rows, the through insert, the read document
+        # rebuild (recipes, tags, ingredients, delete, insert) and the
+        # signature rebuild (documents, delete, insert)
+        num_queries = 15
+        run([self.recipe_1])
+        run([
+            Recipe.objects.create(title=f'r{i}', user=self.user)
+            for i in range(10)
+        ])
+
+
+def relation_url(recipe, name):
+    return reverse(f'recipe:recipe-{name}', args=[recipe.id])
+
+
+class RecipeRelationDeltaTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.recipe = Recipe.objects.create(title='recipe', user=self.user)
+        self.tag_1 = Tag.objects.create(name='tag 1', user=self.user)
+        self.tag_2 = Tag.objects.create(name='tag 2', user=self.user)
+        self.ingredient_1 = Ingredient.objects.create(
+            name='salt', user=self.user
+        )
+        self.ingredient_2 = Ingredient.objects.create(
+            name='flour', user=self.user
+        )
+
+    def test_add_tags_returns_only_new_ids(self):
+        '''
+        Test adding tags inserts and returns only the missing ones
+        '''
+        self.recipe.tags.add(self.tag_1)
+        payload = {'tags': [self.tag_1.id, self.tag_2.id]}
+
+        res = self.client.post(
+            relation_url(self.recipe, 'add-tags'), payload, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'added': [self.tag_2.id]})
+        self.assertEqual(
+            set(self.recipe.tags.all()), {self.tag_1, self.tag_2}
+        )
+
+    def test_add_tags_concurrently_added(self):
+        '''
+        Test a tag linked by a concurrent request after the existing
+        links were read is not inserted twice
+        '''
+        self.recipe.tags.add(self.tag_1)
+        payload = {'tags': [self.tag_1.id]}
+
+        with patch.object(bulk, '_existing_pairs', return_value=set()):
+            res = self.client.post(
+                relation_url(self.recipe, 'add-tags'), payload, format='json'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(self.recipe.tags.all()), [self.tag_1])
+
+    def test_remove_ingredients_returns_only_removed_ids(self):
+        '''
+        Test removing ingredients deletes and returns only linked ones
+        '''
+        self.recipe.ingredients.add(self.ingredient_1)
+        payload = {'ingredients': [self.ingredient_1.id,
+                                   self.ingredient_2.id]}
+
+        res = self.client.post(
+            relation_url(self.recipe, 'remove-ingredients'),
+            payload,
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'removed': [self.ingredient_1.id]})
+        self.assertEqual(self.recipe.ingredients.count(), 0)
+
+    def test_add_other_users_tag_fail(self):
+        '''
+        Test adding tags of other users fail
+        '''
+        other_tag = Tag.objects.create(
+            name='other', user=sample_user('other@test.com')
+        )
+
+        res = self.client.post(
+            relation_url(self.recipe, 'add-tags'),
+            {'tags': [other_tag.id]},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.recipe.tags.count(), 0)
+
+    def test_change_other_users_recipe_not_found(self):
+        '''
+        Test changing relations of other users' recipes fail
+        '''
+        other = sample_user('other@test.com')
+        recipe = Recipe.objects.create(title='other', user=other)
+
+        res = self.client.post(
+            relation_url(recipe, 'add-tags'),
+            {'tags': [self.tag_1.id]},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+BULK_DELETE_URL = reverse('recipe:recipe-bulk-delete')
+
+
+class RecipeBulkDeleteTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_delete_recipes(self):
+        '''
+        Test deleting many recipes and their links at once
+        '''
+        tag = Tag.objects.create(name='tag', user=self.user)
+        recipes = [Recipe.objects.create(title=f'r{i}', user=self.user)
+                   for i in range(3)]
+        for recipe in recipes:
+            recipe.tags.add(tag)
+        other_recipe = Recipe.objects.create(
+            title='other', user=sample_user('other@test.com')
+        )
+        ids = [recipes[0].id, recipes[1].id, other_recipe.id]
+
+        res = self.client.post(BULK_DELETE_URL, {'ids': ids}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'deleted': [recipes[0].id,
+                                                recipes[1].id]})
+        self.assertEqual(
+            list(Recipe.objects.filter(user=self.user)), [recipes[2]]
+        )
+        self.assertTrue(Recipe.objects.filter(id=other_recipe.id).exists())
+        self.assertEqual(Recipe.tags.through.objects.count(), 1)
+
+    def test_bulk_delete_empty_ids_fail(self):
+        '''
+        Test bulk delete without ids fail
+        '''
+        res = self.client.post(BULK_DELETE_URL, {'ids': []}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,175 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache as default_cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe import bulk, cache, checks
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def sample_user(email='test@test.com'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password='test123',
+    )
+
+
+class RecipeDetailCacheTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        default_cache.clear()
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='vegan')
+        self.recipe = Recipe.objects.create(user=self.user, title='soup')
+        self.recipe.tags.add(self.tag)
+
+    def test_retrieve_cached(self):
+        '''Test a repeated retrieve is served without queries'''
+        res = self.client.get(detail_url(self.recipe.id))
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.data, res.data)
+
+    def test_update_invalidates(self):
+        '''Test updating the recipe refreshes the cached detail'''
+        self.client.get(detail_url(self.recipe.id))
+
+        self.client.patch(detail_url(self.recipe.id), {'title': 'stew'})
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.data['title'], 'stew')
+
+    def test_tag_rename_invalidates(self):
+        '''Test renaming a linked tag refreshes the cached detail'''
+        self.client.get(detail_url(self.recipe.id))
+
+        self.tag.name = 'vegetarian'
+        self.tag.save()
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.data['tags'][0]['name'], 'vegetarian')
+
+    def test_bulk_changes_invalidate(self):
+        '''Test writes bypassing model signals still invalidate'''
+        other = Tag.objects.create(user=self.user, name='quick')
+        self.client.get(detail_url(self.recipe.id))
+
+        bulk.bulk_update_recipes(self.user, [
+            {'id': self.recipe.id, 'title': 'stew', 'add_tags': [other.id]}
+        ])
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.data['title'], 'stew')
+        self.assertEqual(len(res.data['tags']), 2)
+
+        bulk.delete_recipes(Recipe.objects.filter(id=self.recipe.id))
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cached_detail_of_other_user(self):
+        '''Test a cached detail is not served to another user'''
+        self.client.get(detail_url(self.recipe.id))
+
+        client = APIClient()
+        client.force_authenticate(sample_user('other@test.com'))
+        res = client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class GetOrComputeTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        default_cache.clear()
+
+    def test_single_flight(self):
+        '''Test concurrent misses compute the value once'''
+        calls = []
+        barrier = threading.Barrier(8)
+        results = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'value'
+
+        def read():
+            barrier.wait()
+            results.append(cache.get_or_compute('key', compute))
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+
+    def test_early_refresh(self):
+        '''Test entries are refreshed more likely the closer they expire'''
+        now = time.time()
+
+        with mock.patch('recipe.cache.random.random', return_value=0.5):
+            far, close = ('v', 0.1, now + 60), ('v', 0.1, now + 0.01)
+
+            self.assertFalse(cache.should_refresh(far, now, 1))
+            self.assertTrue(cache.should_refresh(close, now, 1))
+            self.assertFalse(cache.should_refresh(close, now, 0))
+
+    def test_invalidate_changes_version(self):
+        '''Test invalidating gives the recipe a new cache version'''
+        version = cache.get_version(1)
+
+        self.assertEqual(cache.get_version(1), version)
+        cache.invalidate_recipes([1])
+        self.assertNotEqual(cache.get_version(1), version)
+
+
+class ProcessLocalCacheTests(TestCase):
+    databases = '__all__'
+
+    def test_local_timeout(self):
+        '''
+        Test timeouts are capped for process local backends only
+        '''
+        with override_settings(RECIPE_LOCAL_CACHE_TIMEOUT=5):
+            self.assertEqual(cache.local_timeout(300), 5)
+            self.assertEqual(cache.local_timeout(None), 5)
+
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': 'redis://localhost',
+            }}):
+                self.assertEqual(cache.local_timeout(300), 300)
+                self.assertIsNone(cache.local_timeout(None))
+
+    def test_shared_cache_check(self):
+        '''
+        Test several worker processes need a shared cache backend
+        '''
+        with override_settings(WORKER_PROCESSES=1):
+            self.assertEqual(checks.check_shared_cache(None), [])
+
+        with override_settings(WORKER_PROCESSES=4):
+            errors = checks.check_shared_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['recipe.E001'])
@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Recipe, Ingredient, Tag
+
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def streamed_content(res):
+    return b''.join(res.streaming_content).decode()
+
+
+class RecipeExportTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.recipe = Recipe.objects.create(
+            title='recipe 1',
+            user=self.user,
+            price=5.50,
+            time_minutes=3
+        )
+        self.recipe.ingredients.add(
+            Ingredient.objects.create(name='salt', user=self.user),
+            Ingredient.objects.create(name='flour', user=self.user),
+        )
+        self.recipe.tags.add(Tag.objects.create(name='vegan', user=self.user))
+        Recipe.objects.create(title='recipe 2', user=self.user)
+
+    def test_export_unauthorized_fail(self):
+        '''
+        Test exporting recipes without authentication fail
+        '''
+        res = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_ndjson(self):
+        '''
+        Test exporting recipes as ndjson streams one recipe per line
+        '''
+        other = get_user_model().objects.create_user(
+            email='other@test.com',
+            password='test123',
+        )
+        Recipe.objects.create(title='other recipe', user=other)
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+
+        rows = [json.loads(line)
+                for line in streamed_content(res).splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['title'], self.recipe.title)
+        self.assertEqual(rows[0]['price'], '5.50')
+        self.assertEqual(rows[0]['ingredients'], ['flour', 'salt'])
+        self.assertEqual(rows[0]['tags'], ['vegan'])
+        self.assertEqual(rows[1]['ingredients'], [])
+
+    def test_export_csv(self):
+        '''
+        Test exporting recipes as csv joins names with semicolons
+        '''
+        res = self.client.get(EXPORT_URL, {'type': 'csv'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'text/csv')
+
+        rows = list(csv.DictReader(io.StringIO(streamed_content(res))))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['ingredients'], 'flour;salt')
+        self.assertEqual(rows[0]['tags'], 'vegan')
+
+    def test_export_invalid_type_fail(self):
+        '''
+        Test exporting with an unsupported type fail
+        '''
+        res = self.client.get(EXPORT_URL, {'type': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,138 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Recipe
+from core.storage import recipe_image_storage
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def recipe_image_url(recipe):
+    return reverse('recipe:recipe-upload-image', args=[recipe.id])
+
+
+def image_file(color):
+    ntf = tempfile.NamedTemporaryFile(suffix='.jpg')
+    Image.new('RGB', (10, 10), color).save(ntf, format='JPEG')
+    ntf.seek(0)
+
+    return ntf
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeImageStorageTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe_1 = Recipe.objects.create(title='recipe 1', user=self.user)
+        self.recipe_2 = Recipe.objects.create(title='recipe 2', user=self.user)
+
+    def upload(self, recipe, color):
+        with image_file(color) as ntf:
+            res = self.client.post(
+                recipe_image_url(recipe), {'image': ntf}, format='multipart'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+
+        return recipe.image.name
+
+    def collect_images(self):
+        call_command('collect_images', '--min-age', '0', stdout=StringIO())
+
+    def test_identical_uploads_share_one_file(self):
+        '''
+        Test uploading the same image twice stores it once
+        '''
+        name_1 = self.upload(self.recipe_1, 'red')
+        name_2 = self.upload(self.recipe_2, 'red')
+
+        self.assertEqual(name_1, name_2)
+        _, files = recipe_image_storage.listdir('uploads/recipe/')
+        self.assertEqual(files, [os.path.basename(name_1)])
+
+    def test_replaced_image_is_reclaimed_when_unreferenced(self):
+        '''
+        Test replacing an image keeps the old file until it is
+        collected once no recipe references it
+        '''
+        red = self.upload(self.recipe_1, 'red')
+        self.upload(self.recipe_2, 'red')
+
+        self.upload(self.recipe_1, 'blue')
+        self.collect_images()
+        self.assertTrue(recipe_image_storage.exists(red))
+
+        self.upload(self.recipe_2, 'blue')
+        self.assertTrue(recipe_image_storage.exists(red))
+        self.collect_images()
+        self.assertFalse(recipe_image_storage.exists(red))
+
+    def test_deleting_recipe_reclaims_image(self):
+        '''
+        Test the image of a deleted recipe is collected
+        '''
+        name = self.upload(self.recipe_1, 'green')
+
+        res = self.client.delete(
+            reverse('recipe:recipe-detail', args=[self.recipe_1.id])
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.collect_images()
+        self.assertFalse(recipe_image_storage.exists(name))
+
+    def test_reused_image_is_not_collected(self):
+        '''
+        Test uploading an existing image renews it, so a collection
+        that already listed the file as old spares it
+        '''
+        name = self.upload(self.recipe_1, 'red')
+        path = recipe_image_storage.path(name)
+        os.utime(path, (0, 0))
+        cutoff = time.time() - 60
+
+        self.upload(self.recipe_2, 'red')
+
+        self.assertFalse(recipe_image_storage.collect(name, cutoff))
+        self.assertTrue(recipe_image_storage.exists(name))
+        os.utime(path, (0, 0))
+        self.assertTrue(recipe_image_storage.collect(name, cutoff))
+        self.assertFalse(recipe_image_storage.exists(name))
+
+    def test_collect_images_command(self):
+        '''
+        Test collect_images deletes orphaned files only
+        '''
+        kept = self.upload(self.recipe_1, 'red')
+        with recipe_image_storage.open(kept) as image:
+            orphan = recipe_image_storage.save(
+                'uploads/recipe/orphan.jpg', image
+            )
+
+        call_command('collect_images', '--min-age', '0', stdout=StringIO())
+
+        self.assertTrue(recipe_image_storage.exists(kept))
+        self.assertFalse(recipe_image_storage.exists(orphan))
@@ -0,0 +1,247 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.jobs import run_pending
+from core.models import Job, Recipe, Ingredient, Tag
+
+
+IMPORT_URL = reverse('recipe:recipe-import-recipes')
+
+
+def ndjson_file(rows, name='recipes.ndjson'):
+    content = '\n'.join(json.dumps(row) for row in rows)
+    return SimpleUploadedFile(name, content.encode())
+
+
+class RecipeImportTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_import_ndjson(self):
+        '''
+        Test importing ndjson creates recipes and resolves names
+        '''
+        salt = Ingredient.objects.create(name='salt', user=self.user)
+        rows = [
+            {'title': 'recipe 1', 'price': '5.00',
+             'ingredients': ['salt', 'flour'], 'tags': ['vegan']},
+            {'title': 'recipe 2', 'time_minutes': 5,
+             'ingredients': ['salt'], 'tags': ['vegan', 'quick']},
+        ]
+
+        res = self.client.post(
+            IMPORT_URL, {'file': ndjson_file(rows)}, format='multipart'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 2)
+
+        recipe = Recipe.objects.get(title='recipe 1', user=self.user)
+        self.assertIn(salt, recipe.ingredients.all())
+        self.assertEqual(recipe.ingredients.count(), 2)
+        self.assertEqual(
+            Ingredient.objects.filter(user=self.user).count(), 2
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertFalse(Ingredient.objects.filter(
+            user=self.user, name='flour', canonical__isnull=True
+        ).exists())
+
+    def test_import_names_any_case(self):
+        '''
+        Test names differing only in case or spacing resolve to one row
+        '''
+        salt = Ingredient.objects.create(name='Salt', user=self.user)
+        rows = [
+            {'title': 'recipe 1', 'ingredients': ['salt', 'SALT'],
+             'tags': ['Quick  Lunch']},
+            {'title': 'recipe 2', 'ingredients': [' salt'],
+             'tags': ['quick lunch']},
+        ]
+
+        res = self.client.post(
+            IMPORT_URL, {'file': ndjson_file(rows)}, format='multipart'
+        )
+
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(
+            list(Ingredient.objects.filter(user=self.user)), [salt]
+        )
+        self.assertEqual(
+            list(Tag.objects.filter(user=self.user).values_list(
+                'name', flat=True
+            )),
+            ['Quick Lunch']
+        )
+        for recipe in Recipe.objects.filter(user=self.user):
+            self.assertEqual(list(recipe.ingredients.all()), [salt])
+
+    def test_import_csv_small_batches(self):
+        '''
+        Test importing csv in several batches
+        '''
+        content = (
+            'title,time_minutes,price,ingredients,tags\n'
+            'recipe 1,5,1.00,salt;flour,vegan\n'
+            'recipe 2,5,1.00,salt,\n'
+            'recipe 3,5,1.00,,vegan\n'
+        )
+        upload = SimpleUploadedFile('recipes.csv', content.encode())
+
+        res = self.client.post(
+            IMPORT_URL, {'file': upload}, format='multipart'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 3)
+        recipe = Recipe.objects.get(title='recipe 2', user=self.user)
+        self.assertEqual(
+            [i.name for i in recipe.ingredients.all()], ['salt']
+        )
+        self.assertEqual(recipe.tags.count(), 0)
+
+    def test_import_reports_invalid_and_duplicate_rows(self):
+        '''
+        Test invalid rows are reported and duplicate titles skipped
+        '''
+        Recipe.objects.create(title='existing', user=self.user)
+        rows = [
+            {'title': 'existing'},
+            {'title': ''},
+            {'title': 'new'},
+            {'title': 'new'},
+        ]
+
+        res = self.client.post(
+            IMPORT_URL, {'file': ndjson_file(rows)}, format='multipart'
+        )
+
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual(res.data['skipped'], 2)
+        self.assertEqual(res.data['failed'], 1)
+        self.assertEqual(res.data['errors'][0]['line'], 2)
+
+    def test_import_without_file_fail(self):
+        '''
+        Test importing without a file fail
+        '''
+        res = self.client.post(IMPORT_URL, {}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_command(self):
+        '''
+        Test the import_recipes management command
+        '''
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as ntf:
+            ntf.write(json.dumps({'title': 'recipe 1', 'tags': ['a']}))
+            ntf.flush()
+
+            call_command(
+                'import_recipes', self.user.email, ntf.name,
+                '--batch-size', '1', stdout=StringIO()
+            )
+
+        self.assertTrue(
+            Recipe.objects.filter(title='recipe 1', user=self.user).exists()
+        )
+
+    def test_import_command_decode_error(self):
+        '''
+        Test the command reports how many recipes were imported before
+        an undecodable part of the file
+        '''
+        rows = ''.join(
+            json.dumps({'title': f'recipe {i}'}) + '\n' for i in range(1000)
+        )
+        with tempfile.NamedTemporaryFile('wb', suffix='.ndjson') as ntf:
+            ntf.write(rows.encode() + b'{"title": "\xff"}\n')
+            ntf.flush()
+
+            with self.assertRaisesRegex(
+                CommandError, r'(\d+) recipes were imported before the error'
+            ) as cm:
+                call_command(
+                    'import_recipes', self.user.email, ntf.name,
+                    '--batch-size', '100', stdout=StringIO()
+                )
+
+        # the file is decoded in chunks, so some batches were written
+        imported = Recipe.objects.filter(user=self.user).count()
+        self.assertGreater(imported, 0)
+        self.assertIn(
+            f'({imported} recipes were imported', str(cm.exception)
+        )
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp(),
+                       UPLOAD_ROOT=tempfile.mkdtemp())
+    def test_import_in_background(self):
+        '''
+        Test importing with background=1 queues a job, the upload is
+        kept out of the media root until imported
+        '''
+        rows = [{'title': 'recipe 1', 'tags': ['vegan']}]
+
+        res = self.client.post(
+            IMPORT_URL + '?background=1',
+            {'file': ndjson_file(rows)},
+            format='multipart'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+        run_pending()
+
+        job = Job.objects.get(id=res.data['id'])
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result['created'], 1)
+        self.assertTrue(
+            Recipe.objects.filter(title='recipe 1', user=self.user).exists()
+        )
+        self.assertEqual(os.listdir(settings.MEDIA_ROOT), [])
+        self.assertEqual(
+            os.listdir(os.path.join(settings.UPLOAD_ROOT, 'imports')), []
+        )
+
+    @override_settings(UPLOAD_ROOT=tempfile.mkdtemp(), JOB_MAX_ATTEMPTS=2)
+    def test_failed_background_import_removes_upload(self):
+        '''
+        Test the upload of a background import is removed once the job
+        failed its last attempt
+        '''
+        upload = SimpleUploadedFile('recipes.csv', b'name\nsoup\n')
+        res = self.client.post(
+            IMPORT_URL + '?background=1', {'file': upload},
+            format='multipart'
+        )
+        uploads = os.path.join(settings.UPLOAD_ROOT, 'imports')
+
+        run_pending()
+
+        job = Job.objects.get(id=res.data['id'])
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(len(os.listdir(uploads)), 1)
+
+        Job.objects.filter(id=job.id).update(run_at=job.created_at)
+        run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(os.listdir(uploads), [])
@@ -0,0 +1,140 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, RecipeDocument
+from recipe.indexes import PantryIndex, pantry_indexes
+
+
+COOKABLE_URL = reverse('recipe:recipe-cookable')
+
+
+def sample_user(email='test@test.com'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password='test123',
+    )
+
+
+class PantryIndexTests(TestCase):
+    databases = '__all__'
+
+    def test_cookable(self):
+        '''Test subset matching with missing items ranked by coverage'''
+        index = PantryIndex()
+        index.add([(1, 10), (1, 11), (2, 10), (3, 10), (3, 12), (3, 13),
+                   (4, 14)])
+
+        self.assertEqual(index.cookable({10, 11}), [
+            (1, [], 1.0), (2, [], 1.0),
+        ])
+        self.assertEqual(index.cookable({10, 11, 12}, max_missing=1), [
+            (1, [], 1.0), (2, [], 1.0), (3, [13], 2 / 3),
+        ])
+
+        index.discard([2])
+
+        self.assertEqual(index.cookable({10}), [])
+
+
+class CookableAPITests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        pantry_indexes.clear()
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.salt, self.egg, self.milk = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ['salt', 'egg', 'milk']
+        ]
+        self.omelette = Recipe.objects.create(user=self.user, title='omelette')
+        self.omelette.ingredients.add(self.salt, self.egg)
+        self.custard = Recipe.objects.create(user=self.user, title='custard')
+        self.custard.ingredients.add(self.egg, self.milk)
+
+    def get(self, pantry, **params):
+        return self.client.get(COOKABLE_URL, dict(
+            params, ingredients=','.join(str(i.id) for i in pantry)
+        ))
+
+    def test_cookable(self):
+        '''Test fully covered recipes come first, then near misses'''
+        res = self.get([self.salt, self.egg], max_missing=1)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item['recipe']['title'], item['missing']) for item in res.data],
+            [('omelette', []), ('custard', [self.milk.id])]
+        )
+        self.assertEqual(res.data[0]['recipe']['ingredients'],
+                         [self.salt.id, self.egg.id])
+
+    def test_cookable_without_documents(self):
+        '''Test recipes without a read document are built and listed'''
+        RecipeDocument.objects.all().delete()
+
+        res = self.get([self.salt, self.egg], max_missing=1)
+
+        self.assertEqual(
+            [item['recipe']['title'] for item in res.data],
+            ['omelette', 'custard']
+        )
+        self.assertEqual(RecipeDocument.objects.count(), 2)
+
+        res = self.get([self.salt, self.egg])
+
+        self.assertEqual(len(res.data), 1)
+
+    def test_index_follows_changes(self):
+        '''Test committed ingredient changes reach the built index'''
+        self.get([self.egg, self.milk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.custard.ingredients.add(self.salt)
+        res = self.get([self.egg, self.milk])
+
+        self.assertEqual(res.data, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.omelette.delete()
+        res = self.get([self.salt, self.egg, self.milk])
+
+        self.assertEqual(
+            [item['recipe']['title'] for item in res.data], ['custard']
+        )
+
+    def test_stale_copy_rebuilt(self):
+        '''Test a copy behind the shared generation is rebuilt'''
+        self.get([self.salt, self.egg])
+        # a write committed by another process
+        Recipe.objects.create(user=self.user, title='x').ingredients.add(
+            self.salt
+        )
+        cache.incr(pantry_indexes.generation_key(self.user.id))
+
+        res = self.get([self.salt, self.egg])
+
+        self.assertEqual(len(res.data), 2)
+
+    def test_foreign_ingredients_rejected(self):
+        '''Test ingredients of another user are rejected'''
+        other = Ingredient.objects.create(
+            user=sample_user('other@test.com'), name='salt'
+        )
+
+        res = self.get([self.salt, other])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_ingredients(self):
+        '''Test malformed ingredient ids are rejected'''
+        res = self.client.get(COOKABLE_URL, {'ingredients': 'a,b'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
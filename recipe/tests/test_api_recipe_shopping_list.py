@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe
+
+
+SHOPPING_LIST_URL = reverse('recipe:recipe-shopping-list')
+
+
+def sample_user(email='test@test.com'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password='test123',
+    )
+
+
+class ShoppingListTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.egg, self.milk, self.salt = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ['egg', 'milk', 'salt']
+        ]
+        self.omelette = Recipe.objects.create(user=self.user, title='omelette')
+        self.omelette.ingredients.add(self.egg, self.salt)
+        self.custard = Recipe.objects.create(user=self.user, title='custard')
+        self.custard.ingredients.add(self.egg, self.milk)
+
+    def test_shopping_list(self):
+        '''Test ingredients are merged with per ingredient recipe counts'''
+        payload = {'ids': [self.omelette.id, self.custard.id]}
+
+        with self.assertNumQueries(2):
+            res = self.client.post(SHOPPING_LIST_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': self.egg.id, 'name': 'egg', 'recipes': 2},
+            {'id': self.milk.id, 'name': 'milk', 'recipes': 1},
+            {'id': self.salt.id, 'name': 'salt', 'recipes': 1},
+        ])
+
+    def test_shopping_list_foreign_recipe(self):
+        '''Test recipes of other users are rejected'''
+        other = Recipe.objects.create(
+            user=sample_user('other@test.com'), title='soup'
+        )
+        payload = {'ids': [self.omelette.id, other.id]}
+
+        res = self.client.post(SHOPPING_LIST_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ids', res.data)
@@ -0,0 +1,135 @@
+import io
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (Ingredient, Recipe, RecipeDocument, RecipeSignature,
+                         Tag)
+from recipe import similarity
+from recipe.indexes import SimilarityIndex, similarity_indexes
+
+
+def similar_url(recipe):
+    return reverse('recipe:recipe-similar', args=[recipe.id])
+
+
+def sample_user(email='test@test.com'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password='test123',
+    )
+
+
+class MinHashTests(TestCase):
+    databases = '__all__'
+
+    def test_estimates_jaccard(self):
+        '''Test equal signature values estimate the Jaccard similarity'''
+        a = [f'i{i}' for i in range(100)]
+        b = [f'i{i}' for i in range(50, 150)]
+
+        signature_a = similarity.minhash(a, 256)
+        estimate = similarity.similarity(
+            similarity.minhash(b, 256)[np.newaxis], signature_a
+        )[0]
+
+        self.assertEqual(signature_a.dtype, np.uint32)
+        self.assertAlmostEqual(estimate, 1 / 3, delta=0.1)
+        self.assertIsNone(similarity.minhash([]))
+
+    def test_index_reuses_rows(self):
+        '''Test discarded rows are reused and leave the buckets'''
+        signature = similarity.minhash(['i1', 't2']).tobytes()
+        index = SimilarityIndex()
+        index.add([(1, signature), (2, signature)])
+
+        self.assertEqual(index.similar(1), [(2, 1.0)])
+
+        index.discard([2])
+        index.add([(3, signature)])
+
+        self.assertEqual(index.similar(1), [(3, 1.0)])
+        self.assertEqual(len(index.rows), 2)
+        self.assertEqual(index.rows[3], 1)
+
+
+class SimilarAPITests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        similarity_indexes.clear()
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=f'ingredient {i}')
+            for i in range(8)
+        ]
+        self.tag = Tag.objects.create(user=self.user, name='dinner')
+
+        def recipe(title, items):
+            recipe = Recipe.objects.create(user=self.user, title=title)
+            recipe.ingredients.add(*items)
+            recipe.tags.add(self.tag)
+            return recipe
+
+        self.base = recipe('base', ingredients[:6])
+        self.close = recipe('close', ingredients[:5])
+        self.far = recipe('far', ingredients[5:])
+
+    def test_similar(self):
+        '''Test the most similar recipes are returned best first'''
+        res = self.client.get(similar_url(self.base))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['recipe']['title'], 'close')
+        self.assertGreater(res.data[0]['similarity'], 0.5)
+
+    def test_similar_without_documents(self):
+        '''Test similar recipes without a read document are built'''
+        RecipeDocument.objects.all().delete()
+
+        res = self.client.get(similar_url(self.base))
+
+        self.assertEqual(res.data[0]['recipe']['title'], 'close')
+        self.assertTrue(
+            RecipeDocument.objects.filter(recipe=self.close).exists()
+        )
+
+    def test_similar_of_other_user(self):
+        '''Test recipes of other users are not found'''
+        client = APIClient()
+        client.force_authenticate(sample_user('other@test.com'))
+
+        res = client.get(similar_url(self.base))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_signatures_maintained(self):
+        '''Test signatures follow ingredient changes'''
+        before = RecipeSignature.objects.get(recipe=self.far).signature
+
+        self.far.ingredients.clear()
+        self.far.tags.clear()
+
+        self.assertFalse(
+            RecipeSignature.objects.filter(recipe=self.far).exists()
+        )
+        self.assertTrue(before)
+
+    def test_rebuild_command(self):
+        '''Test the command backfills missing signatures'''
+        RecipeSignature.objects.all().delete()
+
+        call_command('rebuild_recipe_signatures', '--missing',
+                     stdout=io.StringIO())
+
+        self.assertEqual(RecipeSignature.objects.count(), 3)
@@ -0,0 +1,103 @@
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe.stats import distribution
+
+
+STATS_URL = reverse('recipe:recipe-stats')
+
+
+def sample_user(email='test@test.com'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password='test123',
+    )
+
+
+class DistributionTests(TestCase):
+    databases = '__all__'
+
+    def test_distribution(self):
+        '''Test summary statistics and histogram of an array'''
+        result = distribution(np.arange(1, 101, dtype=np.float64))
+
+        self.assertEqual(result['count'], 100)
+        self.assertEqual(result['min'], 1)
+        self.assertEqual(result['max'], 100)
+        self.assertEqual(result['mean'], 50.5)
+        self.assertEqual(result['percentiles']['p50'], 50.5)
+        self.assertEqual(sum(result['histogram']['counts']), 100)
+        self.assertEqual(len(result['histogram']['edges']), 11)
+
+        self.assertEqual(distribution(np.empty(0)), {'count': 0})
+
+
+class RecipeStatsAPITests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.quick = Tag.objects.create(user=self.user, name='quick')
+        self.soup = Recipe.objects.create(
+            user=self.user, title='soup', price=Decimal('4.00'),
+            time_minutes=20
+        )
+        self.salad = Recipe.objects.create(
+            user=self.user, title='salad', price=Decimal('6.00'),
+            time_minutes=10
+        )
+        self.soup.tags.add(self.quick)
+        self.salad.tags.add(self.quick)
+        Recipe.objects.create(user=sample_user('other@test.com'), title='x')
+
+    def test_stats(self):
+        '''Test distributions and breakdowns of the user's recipes'''
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 2)
+        self.assertEqual(res.data['price']['mean'], 5)
+        self.assertEqual(res.data['time_minutes']['max'], 20)
+        self.assertEqual(res.data['cost_per_minute']['min'], 0.2)
+        self.assertEqual(res.data['cost_per_minute']['max'], 0.6)
+        self.assertEqual(res.data['tags'], [{
+            'id': self.quick.id, 'name': 'quick', 'recipes': 2,
+            'mean_price': 5, 'mean_time_minutes': 15,
+        }])
+        self.assertEqual(res.data['ingredients'], [])
+
+    def test_stats_cached_and_invalidated(self):
+        '''Test stats are cached until a recipe of the user changes'''
+        self.client.get(STATS_URL)
+
+        with self.assertNumQueries(0):
+            self.client.get(STATS_URL)
+
+        self.salad.delete()
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['count'], 1)
+        self.assertEqual(res.data['tags'][0]['recipes'], 1)
+
+    def test_stats_empty(self):
+        '''Test a user without recipes gets empty statistics'''
+        client = APIClient()
+        client.force_authenticate(sample_user('new@test.com'))
+
+        res = client.get(STATS_URL)
+
+        self.assertEqual(res.data['count'], 0)
+        self.assertEqual(res.data['price'], {'count': 0})
+        self.assertEqual(res.data['tags'], [])
@@ -11,6 +11,7 @@ TAGS_URL = reverse('recipe:tag-list')
 
 
 class PublicTagsTests(TestCase):
+    databases = '__all__'
 
     def setUp(self):
         '''
@@ -35,6 +36,7 @@ class PublicTagsTests(TestCase):
 
 
 class PrivateTagsTests(TestCase):
+    databases = '__all__'
 
     def setUp(self):
         '''
@@ -126,8 +128,10 @@ class PrivateTagsTests(TestCase):
             'name': 'tag1'
         }
 
-        with self.assertRaises(ValueError):
-            self.client.post(TAGS_URL, payload)
+        res = self.client.post(TAGS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
 
     def test_return_assinged_tags_only(self):
         '''
@@ -178,4 +182,15 @@ class PrivateTagsTests(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
\ No newline at end of file
+        self.assertEqual(len(res.data), 1)
+
+    def test_create_tags_duplicate_name_other_case_fail(self):
+        '''
+        Test names differing only in case or spacing are duplicates
+        and stored with collapsed whitespace
+        '''
+        res = self.client.post(TAGS_URL, {'name': '  Quick   Lunch '})
+
+        self.assertEqual(res.data['name'], 'Quick Lunch')
+        res = self.client.post(TAGS_URL, {'name': 'quick lunch'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
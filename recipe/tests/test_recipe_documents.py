@@ -0,0 +1,131 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, RecipeDocument, Tag
+from recipe.serializers import RecipeDetailSerializer, RecipeSerializer
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def sample_user(email='test@test.com'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password='test123',
+    )
+
+
+class RecipeDocumentTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='vegan')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='salt'
+        )
+        self.recipe = Recipe.objects.create(user=self.user, title='soup')
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+
+    def document(self, recipe):
+        return RecipeDocument.objects.get(recipe=recipe).document
+
+    def test_document_built_on_write(self):
+        '''Test the document holds the rendered detail'''
+        self.assertEqual(
+            self.document(self.recipe),
+            RecipeDetailSerializer(self.recipe).data
+        )
+
+    def test_document_follows_related_changes(self):
+        '''Test renames, unlinking and deleting update the document'''
+        self.tag.name = 'vegetarian'
+        self.tag.save()
+
+        self.assertEqual(
+            self.document(self.recipe)['tags'][0]['name'], 'vegetarian'
+        )
+
+        self.ingredient.recipes.remove(self.recipe)
+
+        self.assertEqual(self.document(self.recipe)['ingredients'], [])
+
+        self.tag.delete()
+
+        self.assertEqual(self.document(self.recipe)['tags'], [])
+
+        self.recipe.delete()
+
+        self.assertFalse(RecipeDocument.objects.exists())
+
+    def test_list_from_documents(self):
+        '''Test the list is read with one query from the documents'''
+        other = Recipe.objects.create(user=self.user, title='stew')
+        Recipe.objects.create(user=sample_user('other@test.com'), title='x')
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data, RecipeSerializer([self.recipe, other], many=True).data
+        )
+
+    def test_filtered_list_from_documents(self):
+        '''Test filtering the list still returns each recipe once'''
+        other_tag = Tag.objects.create(user=self.user, name='quick')
+        self.recipe.tags.add(other_tag)
+        Recipe.objects.create(user=self.user, title='stew')
+
+        res = self.client.get(
+            RECIPE_URL, {'tags': f'{self.tag.id},{other_tag.id}'}
+        )
+
+        self.assertEqual(res.data, [RecipeSerializer(self.recipe).data])
+
+    def test_recipes_without_document_served(self):
+        '''
+        Test recipes written before documents existed are listed and
+        retrieved, building their documents
+        '''
+        other = Recipe.objects.create(user=self.user, title='stew')
+        RecipeDocument.objects.all().delete()
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(
+            res.data, RecipeSerializer([self.recipe, other], many=True).data
+        )
+        self.assertEqual(RecipeDocument.objects.count(), 2)
+
+        RecipeDocument.objects.all().delete()
+        res = self.client.get(
+            reverse('recipe:recipe-detail', args=[self.recipe.id])
+        )
+
+        self.assertEqual(res.data, RecipeDetailSerializer(self.recipe).data)
+        self.assertEqual(
+            self.document(self.recipe),
+            RecipeDetailSerializer(self.recipe).data
+        )
+
+    def test_rebuild_command(self):
+        '''Test the command backfills missing documents'''
+        RecipeDocument.objects.all().delete()
+
+        call_command('rebuild_recipe_documents', '--missing',
+                     stdout=io.StringIO())
+
+        self.assertEqual(
+            self.document(self.recipe),
+            RecipeDetailSerializer(self.recipe).data
+        )
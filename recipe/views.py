@@ -1,18 +1,36 @@
+import uuid
+from django.db import IntegrityError
+from django.db.models import Exists, OuterRef, Value
+from django.db.models.functions import Lower
+from django.http import StreamingHttpResponse
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
-from rest_framework import (mixins, viewsets, authentication, 
-                            permissions, status)
-from core import models
-from recipe.serializers import (IngredientSerializer, RecipeDetailSerializer, 
+from rest_framework import mixins, viewsets, permissions, status
+from core import jobs, models, sharding
+from core.authentication import ShardTokenAuthentication, UserShardMixin
+from core.idempotency import IdempotentCreateMixin
+from core.serializers import JobSerializer
+from core.storage import upload_storage
+from recipe import (bulk, cache, canonical, documents, exporters, importers,
+                    indexes, stats)
+from recipe.signals import send_recipes_changed
+from recipe.serializers import (IngredientSerializer, RecipeDetailSerializer,
+                                NameAutocompleteSerializer,
                                 RecipeImageSerializer, TagSerializer,
-                                RecipeSerializer)
+                                RecipeSerializer, RecipeBulkUpdateSerializer,
+                                RecipeTagIdsSerializer,
+                                RecipeIngredientIdsSerializer,
+                                RecipeIdsSerializer, RecipePantrySerializer,
+                                RecipeSimilarSerializer)
 
 
-class RecipeAttributesViewSets(viewsets.GenericViewSet,
+class RecipeAttributesViewSets(UserShardMixin, IdempotentCreateMixin,
+                               viewsets.GenericViewSet,
                                mixins.ListModelMixin,
                                mixins.CreateModelMixin):
 
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [ShardTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]    
 
     def get_queryset(self):
@@ -23,9 +41,69 @@ class RecipeAttributesViewSets(viewsets.GenericViewSet,
         )
 
         if assigned_only:
-            queryset = queryset.filter(recipes__isnull=False)
+            # EXISTS semi-join against the indexed through table column,
+            # so no row multiplication and no DISTINCT is needed
+            model = queryset.model
+            through = model.recipes.through
+            assigned = through.objects.filter(
+                **{model._meta.model_name: OuterRef('pk')}
+            )
+            queryset = queryset.filter(Exists(assigned))
+
+        return queryset.filter(user=self.request.user)
+
+    def get_serializer_class(self):
 
-        return queryset.filter(user=self.request.user).distinct()
+        if self.action == 'autocomplete':
+            return NameAutocompleteSerializer
+
+        return self.serializer_class
+
+    def save_unique_name(self, serializer, msg, **kwargs):
+        '''
+        Save a new name of the user, names already used in any case are
+        rejected with a 400
+        '''
+        name = serializer.validated_data['name']
+        # one probe of the unique Lower(name) index
+        if not self.queryset.filter(
+            user=self.request.user, name__lower=Lower(Value(name))
+        ).exists():
+            try:
+                with sharding.atomic():
+                    serializer.save(user=self.request.user, **kwargs)
+                return
+            except IntegrityError:
+                # a concurrent create won the unique constraint
+                pass
+
+        raise ValidationError({'name': [msg]})
+
+    @action(methods=['GET'], detail=False)
+    def autocomplete(self, request):
+        '''
+        Names of the user starting with prefix (case insensitive), most
+        used first, answered from the user's in-memory name index
+        (see recipe.indexes)
+        '''
+        serializer = self.get_serializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        index = indexes.name_indexes.get(request.user.id)
+        results = index.complete(
+            self.queryset.model,
+            serializer.validated_data['prefix'],
+            serializer.validated_data['limit']
+        )
+
+        return Response([
+            {'id': related_id, 'name': name, 'uses': uses}
+            for related_id, name, uses in results
+        ])
 
 
 class TagAPIViewSets(RecipeAttributesViewSets):
@@ -37,13 +115,8 @@ class TagAPIViewSets(RecipeAttributesViewSets):
 
     def perform_create(self, serializer):
 
-        tag_names = [tag.name for tag in self.request.user.tags.all()]
-
-        if serializer.validated_data['name'] in tag_names:
-            msg = 'Duplicate Tags can not be created by the same user'
-            raise ValueError(msg)
-
-        serializer.save(user=self.request.user)
+        msg = 'Duplicate Tags can not be created by the same user'
+        self.save_unique_name(serializer, msg)
 
 
 class IngredientsAPIViewSets(RecipeAttributesViewSets):
@@ -55,29 +128,36 @@ class IngredientsAPIViewSets(RecipeAttributesViewSets):
 
     def perform_create(self, serializer):
 
-        ingrd_related_qs = self.request.user.ingredients.all()
-        ingrd_names = [ingrd.name for ingrd in ingrd_related_qs]
-
-        if serializer.validated_data['name'] in ingrd_names:
-            msg = 'Duplicate Ingredients can not be created by the same user'
-            raise ValueError(msg)
-
-        serializer.save(user=self.request.user)
+        msg = 'Duplicate Ingredients can not be created by the same user'
+        self.save_unique_name(
+            serializer, msg,
+            canonical_id=canonical.canonical_id(
+                serializer.validated_data['name']
+            )
+        )
 
 
-class RecipeViewSets(viewsets.ModelViewSet):
+class RecipeViewSets(UserShardMixin, IdempotentCreateMixin,
+                     viewsets.ModelViewSet):
     '''
     Recipe API ViewSets for Listing and CRUS Operations
     '''
     queryset = models.Recipe.objects.all()
     serializer_class = RecipeSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [ShardTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    # set per action, see core.throttling.TokenBucketThrottle
+    throttle_scope = None
+    # query parameters get_queryset filters by
+    filter_params = {'tags', 'ingredients', 'canonical_ingredients'}
 
     def get_queryset(self):
         
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        canonical_ingredients = self.request.query_params.get(
+            'canonical_ingredients'
+        )
         queryset = self.queryset
 
         if tags:
@@ -88,6 +168,14 @@ class RecipeViewSets(viewsets.ModelViewSet):
             ingredient_ids = [int(id) for id in ingredients.split(',')]
             queryset = queryset.filter(ingredients__id__in=ingredient_ids)
 
+        if canonical_ingredients:
+            canonical_ids = [
+                int(id) for id in canonical_ingredients.split(',')
+            ]
+            queryset = queryset.filter(
+                ingredients__canonical_id__in=canonical_ids
+            )
+
         return queryset.filter(user=self.request.user)
     
     def get_serializer_class(self):
@@ -98,20 +186,87 @@ class RecipeViewSets(viewsets.ModelViewSet):
         elif self.action == 'upload_image':
             return RecipeImageSerializer
 
+        elif self.action == 'bulk_update':
+            return RecipeBulkUpdateSerializer
+
+        elif self.action in ('add_tags', 'remove_tags'):
+            return RecipeTagIdsSerializer
+
+        elif self.action in ('add_ingredients', 'remove_ingredients'):
+            return RecipeIngredientIdsSerializer
+
+        elif self.action in ('bulk_delete', 'shopping_list'):
+            return RecipeIdsSerializer
+
+        elif self.action == 'cookable':
+            return RecipePantrySerializer
+
+        elif self.action == 'similar':
+            return RecipeSimilarSerializer
+
         return self.serializer_class
 
-    def perform_create(self, serializer):
+    def list(self, request, *args, **kwargs):
+        '''
+        Serve the list from the precomputed read documents
+        (see recipe.documents) instead of joining tags and ingredients,
+        recipes without a document yet get one built on the way
+        '''
+        recipes = models.Recipe.objects.filter(user=request.user)
+        if self.filter_params.intersection(request.query_params):
+            recipes = recipes.filter(id__in=self.get_queryset().values('id'))
+        rows = recipes.order_by('id').values_list('id', 'document__document')
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(
+                documents.list_documents(page)
+            )
+
+        return Response(documents.list_documents(rows))
+
+    def retrieve(self, request, *args, **kwargs):
+        '''
+        Serve the recipe detail from the read through cache, keyed by
+        recipe id and version (bumped on every change, see recipe.signals),
+        misses are read from the precomputed read document
+        '''
+        if self.filter_params.intersection(request.query_params):
+            return super().retrieve(request, *args, **kwargs)
 
-        recipe_related_qs = self.request.user.recipes.all()
-        recipe_titles = [recipe.title for recipe in recipe_related_qs]
+        try:
+            recipe_id = int(kwargs['pk'])
+        except ValueError:
+            raise NotFound()
 
-        if serializer.validated_data['title'] in recipe_titles:
+        def compute():
+            document = documents.get_document(recipe_id)
+            if document is None:
+                raise NotFound()
+
+            return {'user_id': document[0], 'data': document[1]}
+
+        entry = cache.get_or_compute(
+            cache.detail_key(recipe_id, cache.get_version(recipe_id)),
+            compute
+        )
+        if entry['user_id'] != request.user.id:
+            raise NotFound()
+
+        return Response(entry['data'])
+
+    def perform_create(self, serializer):
+
+        if self.request.user.recipes.filter(
+            title=serializer.validated_data['title']
+        ).exists():
             msg = 'Duplicate Recipes can not be created by the same user'
-            raise ValueError(msg)
+            raise ValidationError({'title': [msg]})
 
         serializer.save(user=self.request.user)
 
-    @action(methods=['POST'], detail=True, url_path='upload-image')
+    @action(methods=['POST'], detail=True, url_path='upload-image',
+            throttle_scope='upload')
     def upload_image(self, request, pk=None):
 
         recipe = self.get_object()
@@ -130,4 +285,293 @@ class RecipeViewSets(viewsets.ModelViewSet):
         return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
-        )
\ No newline at end of file
+        )
+
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        '''
+        Stream all recipes of the user as ndjson (default) or csv
+        '''
+        file_format = request.query_params.get('type', 'ndjson')
+
+        if file_format not in exporters.EXPORT_CONTENT_TYPES:
+            return Response(
+                {'type': [f'Unsupported export type "{file_format}".']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        response = StreamingHttpResponse(
+            exporters.export_recipes(request.user, file_format),
+            content_type=exporters.EXPORT_CONTENT_TYPES[file_format]
+        )
+        response['Content-Disposition'] = \
+            f'attachment; filename="recipes.{file_format}"'
+
+        return response
+
+    @action(methods=['POST'], detail=False, url_path='import')
+    def import_recipes(self, request):
+        '''
+        Import recipes from an uploaded ndjson (default) or csv file,
+        with ?background=1 the import is queued as a job
+        '''
+        upload = request.FILES.get('file')
+
+        if upload is None:
+            return Response(
+                {'file': ['No file was submitted.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        file_format = request.query_params.get(
+            'type', upload.name.rsplit('.', 1)[-1].lower()
+        )
+
+        if file_format not in importers.IMPORT_FORMATS:
+            return Response(
+                {'type': [f'Unsupported import type "{file_format}".']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if request.query_params.get('background'):
+            path = upload_storage().save(
+                f'imports/{uuid.uuid4().hex}.{file_format}', upload
+            )
+            job = jobs.enqueue(
+                'recipe.import_recipes',
+                user=request.user,
+                user_id=request.user.id,
+                path=path,
+                file_format=file_format
+            )
+            return Response(
+                JobSerializer(job).data,
+                status=status.HTTP_202_ACCEPTED
+            )
+
+        try:
+            summary = importers.import_recipes(
+                request.user, upload.file, file_format
+            )
+        except (importers.ImportFormatError, UnicodeDecodeError) as e:
+            return Response(
+                {'file': [str(e)]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(summary, status=status.HTTP_201_CREATED)
+
+    @action(methods=['POST'], detail=False, url_path='bulk-delete')
+    def bulk_delete(self, request):
+        '''
+        Delete many recipes of the user by id in bounded batches
+        '''
+        serializer = self.get_serializer(data=request.data)
+
+        if serializer.is_valid():
+            deleted = bulk.delete_recipes(
+                self.get_queryset().filter(
+                    id__in=serializer.validated_data['ids']
+                )
+            )
+            return Response(
+                {'deleted': sorted(deleted)},
+                status=status.HTTP_200_OK
+            )
+
+        return Response(
+            serializer.errors,
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    @action(methods=['GET'], detail=False)
+    def stats(self, request):
+        '''
+        Price, time and cost per minute distributions of the user's recipes
+        with per tag and per ingredient breakdowns (see recipe.stats)
+        '''
+        return Response(stats.recipe_stats(request.user.id))
+
+    @action(methods=['POST'], detail=False, url_path='shopping-list')
+    def shopping_list(self, request):
+        '''
+        Merge the ingredients of many recipes of the user into one
+        de-duplicated list with the number of recipes needing each
+        '''
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ids = set(serializer.validated_data['ids'])
+        foreign = ids - bulk.owned_ids(models.Recipe, request.user, ids)
+        if foreign:
+            msg = f'Invalid pk "{min(foreign)}" - object does not exist.'
+            return Response(
+                {'ids': [msg]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response([
+            {'id': ingredient_id, 'name': name, 'recipes': recipes}
+            for ingredient_id, name, recipes in bulk.shopping_list(ids)
+        ])
+
+    @action(methods=['PATCH'], detail=False, url_path='bulk-update')
+    def bulk_update(self, request):
+        '''
+        Partially update many recipes from a list of {id, ...fields}
+        '''
+        serializer = self.get_serializer(
+            data=request.data,
+            many=True,
+            partial=True
+        )
+
+        if serializer.is_valid():
+            results = bulk.bulk_update_recipes(
+                request.user, serializer.validated_data
+            )
+            return Response(results, status=status.HTTP_200_OK)
+
+        return Response(
+            serializer.errors,
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    @action(methods=['GET'], detail=False)
+    def cookable(self, request):
+        '''
+        Recipes the given pantry of ingredient ids covers, missing at most
+        max_missing ingredients, answered from the user's in-memory
+        ingredient index (see recipe.indexes)
+        '''
+        serializer = self.get_serializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        pantry = serializer.validated_data['ingredients']
+        foreign = pantry - bulk.owned_ids(models.Ingredient, request.user,
+                                          pantry)
+        if foreign:
+            msg = f'Invalid pk "{min(foreign)}" - object does not exist.'
+            return Response(
+                {'ingredients': [msg]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        index = indexes.pantry_indexes.get(request.user.id)
+        results = index.cookable(
+            pantry, serializer.validated_data['max_missing']
+        )[:serializer.validated_data['limit']]
+
+        docs = documents.documents_by_id(
+            request.user, [recipe_id for recipe_id, _, _ in results]
+        )
+
+        return Response([
+            {
+                'recipe': docs[recipe_id],
+                'missing': missing,
+                'coverage': round(coverage, 4),
+            }
+            for recipe_id, missing, coverage in results
+            if recipe_id in docs
+        ])
+
+    @action(methods=['GET'], detail=True)
+    def similar(self, request, pk=None):
+        '''
+        Recipes of the user with the most similar ingredient and tag sets,
+        found through the MinHash LSH index (see recipe.indexes)
+        '''
+        recipe = self.get_object()
+        serializer = self.get_serializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        index = indexes.similarity_indexes.get(request.user.id)
+        results = index.similar(
+            recipe.id, serializer.validated_data['limit']
+        )
+
+        docs = documents.documents_by_id(
+            request.user, [recipe_id for recipe_id, _ in results]
+        )
+
+        return Response([
+            {
+                'recipe': docs[recipe_id],
+                'similarity': round(score, 4),
+            }
+            for recipe_id, score in results
+            if recipe_id in docs
+        ])
+
+    def change_relation(self, request, relation, add):
+        '''
+        Add or remove only the given tag/ingredient ids of the recipe
+        and return the ids that actually changed
+        '''
+        recipe = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ids = set(serializer.validated_data[relation])
+        model = bulk.RELATIONS[relation][0]
+        foreign = ids - bulk.owned_ids(model, request.user, ids)
+
+        if foreign:
+            msg = f'Invalid pk "{min(foreign)}" - object does not exist.'
+            return Response(
+                {relation: [msg]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        pairs = [(recipe.id, related_id) for related_id in sorted(ids)]
+        with sharding.atomic():
+            if add:
+                changed = bulk.add_relations(relation, pairs)
+            else:
+                changed = bulk.remove_relations(relation, pairs)
+            if changed:
+                send_recipes_changed([recipe.id], [recipe.user_id])
+
+        key = 'added' if add else 'removed'
+        return Response(
+            {key: sorted(related_id for _, related_id in changed)},
+            status=status.HTTP_200_OK
+        )
+
+    @action(methods=['POST'], detail=True, url_path='add-tags')
+    def add_tags(self, request, pk=None):
+
+        return self.change_relation(request, 'tags', add=True)
+
+    @action(methods=['POST'], detail=True, url_path='remove-tags')
+    def remove_tags(self, request, pk=None):
+
+        return self.change_relation(request, 'tags', add=False)
+
+    @action(methods=['POST'], detail=True, url_path='add-ingredients')
+    def add_ingredients(self, request, pk=None):
+
+        return self.change_relation(request, 'ingredients', add=True)
+
+    @action(methods=['POST'], detail=True, url_path='remove-ingredients')
+    def remove_ingredients(self, request, pk=None):
+
+        return self.change_relation(request, 'ingredients', add=False)
@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
+
+from core import jobs, models
+from recipe import bulk
+
+
+def delete_user_data(user_id, batch_size=bulk.DELETE_BATCH_SIZE):
+    '''
+    Delete a user and everything they own in bounded batches.
+
+    Recipes, tags and ingredients are removed chunk by chunk with plain
+    DELETE statements, so the final user delete has nothing left to
+    cascade through the collector. Runs against the current shard
+    (core.sharding), the user's one when called from the job.
+    '''
+    bulk.delete_recipes(
+        models.Recipe.objects.filter(user_id=user_id), batch_size
+    )
+    for model in (models.Tag, models.Ingredient):
+        bulk.delete_related(
+            model, model.objects.filter(user_id=user_id), batch_size
+        )
+    models.IdempotencyKey.objects.filter(user_id=user_id).delete()
+
+    get_user_model().objects.filter(id=user_id).delete()
+
+
+def schedule_user_deletion(user):
+    '''
+    Deactivate the user and their token right away and queue a job
+    deleting their data, returns the Job
+    '''
+    user.is_active = False
+    user.save(update_fields=['is_active'])
+    Token.objects.filter(user=user).delete()
+
+    return jobs.enqueue('user.delete_user_data', user=user, user_id=user.id)
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.sharding import use_shard, user_shard
+from recipe.bulk import DELETE_BATCH_SIZE
+from user.deletion import delete_user_data
+
+
+class Command(BaseCommand):
+    help = 'Delete a user and all their data in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the user to delete')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DELETE_BATCH_SIZE,
+            help='Number of rows deleted per transaction'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'User "{options["email"]}" does not exist.')
+
+        with use_shard(user_shard(user)):
+            delete_user_data(user.id, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {user.email}.'))
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 
 from django.contrib.auth import get_user_model, authenticate
+from django.db.models import Value
+from django.db.models.functions import Lower
 from django.utils.translation import gettext_lazy as _
 
 
@@ -15,6 +17,23 @@ class UserSerializer(serializers.ModelSerializer):
             'password': {'min_length': 5, 'write_only': True}
         }
 
+    def validate_email(self, value):
+        '''
+        Emails are unique regardless of case
+        '''
+        users = get_user_model().objects.filter(
+            email__lower=Lower(Value(value))
+        )
+        if self.instance is not None:
+            users = users.exclude(pk=self.instance.pk)
+
+        if users.exists():
+            raise serializers.ValidationError(
+                _('user with this email already exists.'), code='unique'
+            )
+
+        return value
+
     def create(self, validated_data):
         '''
         Create & return user with valid credentials and encrypted password''' 
@@ -62,4 +81,3 @@ class TokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
-        
\ No newline at end of file
@@ -0,0 +1,9 @@
+from core.jobs import job
+from user.deletion import delete_user_data
+
+
+@job('user.delete_user_data')
+def delete_user_data_job(user_id):
+    delete_user_data(user_id)
+
+    return {'user_id': user_id}
@@ -1,5 +1,8 @@
 from django.test import TestCase
 from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+from core.jobs import enqueue, run_pending
+from core.models import Job
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework import status 
@@ -17,6 +20,7 @@ EDIT_USER_URL = reverse('user:edit')
 
 
 class PublicUserAPITest(TestCase):
+    databases = '__all__'
 
     def setUp(self):
         self.client = APIClient()
@@ -54,6 +58,21 @@ class PublicUserAPITest(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_duplicate_user_other_case_fail(self):
+        '''
+        Test emails differing only in case can't be registered twice
+        '''
+        create_user(email='test@test.com', password='test123')
+
+        res = self.client.post(CREATE_USER_URL, {
+            'email': 'Test@Test.com',
+            'password': 'test123',
+            'name': 'Test User'
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', res.data)
+
     def test_password_too_short(self):
         '''
         Test to see if the password is more than 8 characters.
@@ -88,6 +107,20 @@ class PublicUserAPITest(TestCase):
         self.assertIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
+    def test_token_email_any_case(self):
+        '''
+        Test logging in works with the email in any case
+        '''
+        create_user(email='test@test.com', password='test123')
+
+        res = self.client.post(
+            CREATE_TOKEN_URL,
+            {'email': 'TEST@test.com', 'password': 'test123'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('token', res.data)
+
     def test_token_no_user(self):
         '''
         Test to obtain token for non-existing user
@@ -152,6 +185,8 @@ class PrivateAPIUserTest(TestCase):
     '''
     Tests for authorized users
     '''
+    databases = '__all__'
+
     def setUp(self):
 
         self.client = APIClient()
@@ -198,4 +233,48 @@ class PrivateAPIUserTest(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(self.user.name, payload['name'])
-        self.assertTrue(self.user.check_password(payload['password']))
\ No newline at end of file
+        self.assertTrue(self.user.check_password(payload['password']))
+
+    def test_delete_profile_deactivates_and_queues_job(self):
+        '''
+        Test deleting the profile deactivates the user right away
+        and leaves the data deletion to a background job
+        '''
+        Token.objects.create(user=self.user)
+
+        res = self.client.delete(EDIT_USER_URL)
+
+        self.user.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+
+        job = Job.objects.get(user=self.user)
+        self.assertEqual(job.name, 'user.delete_user_data')
+
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists()
+        )
+
+    def test_retrieve_job_status(self):
+        '''
+        Test users can only see their own jobs
+        '''
+        job = enqueue('user.delete_user_data', user=self.user, user_id=0)
+        other_job = enqueue(
+            'user.delete_user_data',
+            user=create_user(email='other@test.com', password='test123'),
+            user_id=0
+        )
+
+        res = self.client.get(reverse('user:job', args=[job.id]))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], Job.QUEUED)
+
+        res = self.client.get(reverse('user:job', args=[other_job.id]))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,71 @@
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from core.models import Recipe, Ingredient, Tag
+from user.deletion import delete_user_data
+
+
+def create_user(email):
+    return get_user_model().objects.create_user(
+        email=email,
+        password='test123',
+    )
+
+
+class UserDeletionTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = create_user('test@test.com')
+        self.other = create_user('other@test.com')
+
+        tags = [Tag.objects.create(name=f'tag {i}', user=self.user)
+                for i in range(3)]
+        ingredients = [
+            Ingredient.objects.create(name=f'ingredient {i}', user=self.user)
+            for i in range(3)
+        ]
+        for i in range(5):
+            recipe = Recipe.objects.create(title=f'recipe {i}', user=self.user)
+            recipe.tags.add(*tags)
+            recipe.ingredients.add(*ingredients)
+
+        # recipes of other users may link to tags of the deleted user
+        self.other_recipe = Recipe.objects.create(
+            title='other', user=self.other
+        )
+        self.other_recipe.tags.add(tags[0])
+        Tag.objects.create(name='other tag', user=self.other)
+
+    def test_delete_user_data_in_batches(self):
+        '''
+        Test deleting a user removes all their rows in small batches
+        and leaves other users alone
+        '''
+        delete_user_data(self.user.id, batch_size=2)
+
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists()
+        )
+        self.assertFalse(Recipe.objects.filter(user=self.user.id).exists())
+        self.assertFalse(Tag.objects.filter(user=self.user.id).exists())
+        self.assertFalse(
+            Ingredient.objects.filter(user=self.user.id).exists()
+        )
+        self.assertEqual(Recipe.tags.through.objects.count(), 0)
+        self.assertEqual(Recipe.ingredients.through.objects.count(), 0)
+        self.assertTrue(
+            Recipe.objects.filter(id=self.other_recipe.id).exists()
+        )
+        self.assertEqual(Tag.objects.filter(user=self.other).count(), 1)
+
+    def test_delete_user_command(self):
+        '''
+        Test the delete_user management command
+        '''
+        call_command('delete_user', self.user.email, stdout=StringIO())
+
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists()
+        )
@@ -7,4 +7,5 @@ urlpatterns = [
     path('create/', views.CreateUserAPIView.as_view(), name='create'),
     path('token/', views.CreateTokenAPIView.as_view(), name='token'),
     path('edit/', views.ManageUserAPIView.as_view(), name='edit'),
+    path('jobs/<int:pk>/', views.JobAPIView.as_view(), name='job'),
 ]
\ No newline at end of file
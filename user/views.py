@@ -1,5 +1,8 @@
-from rest_framework import generics, permissions, authentication
+from rest_framework import generics, permissions
+from core.authentication import ShardTokenAuthentication, UserShardMixin
+from core.serializers import JobSerializer
 from .serializers import UserSerializer, TokenSerializer
+from .deletion import schedule_user_deletion
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
@@ -13,16 +16,40 @@ class CreateTokenAPIView(ObtainAuthToken):
 
     serializer_class = TokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES
+    # ObtainAuthToken disables throttling
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    throttle_scope = 'token'
 
 
-class ManageUserAPIView(generics.RetrieveUpdateAPIView):
+class ManageUserAPIView(UserShardMixin,
+                        generics.RetrieveUpdateDestroyAPIView):
 
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (ShardTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         '''
         Retrieve authenticated user
         '''
-        return self.request.user
\ No newline at end of file
+        return self.request.user
+
+    def perform_destroy(self, instance):
+        '''
+        Deactivate the user and delete their data in the background
+        '''
+        schedule_user_deletion(instance)
+
+
+class JobAPIView(generics.RetrieveAPIView):
+
+    serializer_class = JobSerializer
+    authentication_classes = (ShardTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_queryset(self):
+        '''
+        Limit jobs to the ones started by the authenticated user
+        '''
+        return self.request.user.jobs.all()